@@ -0,0 +1,240 @@
+"""
+Batch Generator for MusicVis
+
+Headless parameter sweep generation of piano music using the Random Sequence note generator
+
+Usage:
+    python BatchGenerator.py <sweep_spec.json> --workers 4
+
+Sweep Spec (JSON):
+    {
+        "output_dir": "Data/Sweeps/Example/",
+        "notes_count": 100,
+        "tempo": 60,
+        "env_update_func": "Constant Random Distribution",
+        "env_params": [{}],
+        "seeds": [0, 1, 2],
+        "prob_dists": [{"C": 1, "E": 1, "G": 1}, {"_C": 1, "_Am": 2}],
+        "params_gen_data": {},
+        "common_params": {},
+        "outputs": ["midi", "wav", "mp4"]
+    }
+- Jobs are all combinations of "seeds", "prob_dists" and "env_params" ("seeds" can also be given as {"start": 0, "stop": 100})
+- "params_gen_data" and "common_params" are optional (defaults are used for missing parameters)
+- "outputs" can have "midi", "wav" and "mp4" ("mp4" needs "wav" for audio and will also generate it)
+- Outputs of a job are named by the hash of its inputs, so jobs with existing outputs are skipped when a sweep is rerun
+- A manifest of all jobs is written to "manifest.json" in the output directory
+"""
+
+# Imports
+import os
+import json
+import time
+import hashlib
+import argparse
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from MusicVis import *
+from Libraries.Utils import ArtifactUtils
+
+# Main Vars
+PATHS = {
+    "chords": "Data/SoundCodes/chords.json",
+    "tracks": "Data/SoundCodes/tracks.json",
+    "manifest": "manifest.json"
+}
+DEFAULT_PARAMS_GEN_DATA = {
+    "delay": {
+        "type": "number",
+        "range": [0.0, 2.0]
+    },
+    "duration": {
+        "type": "number",
+        "range": [0.01, 2.0]
+    },
+    "octave": {
+        "type": "selection",
+        "options": LIBRARIES["MusicGenerator"]["Piano"].OCTAVES
+    }
+}
+OUTPUT_EXTENSIONS = {
+    "midi": ".mid",
+    "wav": ".wav",
+    "mp4": ".mp4"
+}
+VISUALISATION_PARAMS = {
+    "frame_size": (512, 512),
+    "mode": "line_sequence",
+    "frames_per_notesec": 24
+}
+
+# Util Functions
+def BatchGenerator_HashJob(JOB):
+    '''
+    Batch Generator - Get hash of the inputs of a job
+    '''
+    JOB_INPUTS = {k: JOB[k] for k in JOB.keys() if k not in ["output_dir", "outputs"]}
+    return hashlib.sha256(json.dumps(JOB_INPUTS, sort_keys=True).encode()).hexdigest()[:16]
+
+def BatchGenerator_GetOutputPaths(JOB):
+    '''
+    Batch Generator - Get paths of the outputs of a job
+    '''
+    OUTPUTS = list(JOB["outputs"])
+    if "mp4" in OUTPUTS and "wav" not in OUTPUTS: OUTPUTS.append("wav")
+    if "midi" not in OUTPUTS: OUTPUTS.append("midi")
+    return {
+        k: os.path.join(JOB["output_dir"], JOB["hash"] + OUTPUT_EXTENSIONS[k])
+        for k in OUTPUTS
+    }
+
+# Main Functions
+def BatchGenerator_FormJobs(SPEC):
+    '''
+    Batch Generator - Form jobs from sweep spec
+    '''
+    # Init
+    SEEDS = SPEC["seeds"]
+    if isinstance(SEEDS, dict): SEEDS = list(range(SEEDS["start"], SEEDS["stop"]))
+    ENV_PARAMS_LIST = SPEC.get("env_params", [{}])
+    PARAMS_GEN_DATA = dict(DEFAULT_PARAMS_GEN_DATA)
+    PARAMS_GEN_DATA.update(SPEC.get("params_gen_data", {}))
+    # Form jobs
+    JOBS = []
+    for seed, prob_dist, env_params in itertools.product(SEEDS, SPEC["prob_dists"], ENV_PARAMS_LIST):
+        JOB = {
+            "output_dir": SPEC["output_dir"],
+            "outputs": SPEC.get("outputs", ["midi"]),
+            "notes_count": SPEC["notes_count"],
+            "tempo": SPEC.get("tempo", 60),
+            "env_update_func": SPEC.get("env_update_func", "Constant Random Distribution"),
+            "env_params": env_params,
+            "seed": seed,
+            "prob_dist": prob_dist,
+            "params_gen_data": PARAMS_GEN_DATA,
+            "common_params": SPEC.get("common_params", {})
+        }
+        JOB["hash"] = BatchGenerator_HashJob(JOB)
+        JOB["paths"] = BatchGenerator_GetOutputPaths(JOB)
+        JOBS.append(JOB)
+
+    return JOBS
+
+def BatchGenerator_RunJob(JOB):
+    '''
+    Batch Generator - Run a job (generate notes, decompose, write MIDI and optionally WAV and MP4)
+    '''
+    # Init
+    START_TIME = time.time()
+    PIANO = LIBRARIES["MusicGenerator"]["Piano"]
+    PIANO.CHORDS = json.load(open(PATHS["chords"], "r"))
+    PIANO.TRACKS = json.load(open(PATHS["tracks"], "r"))
+    PATHS_OUT = JOB["paths"]
+    os.makedirs(JOB["output_dir"], exist_ok=True)
+    ## Possible Notes and Maps
+    POSSIBLE_NOTES = list(PIANO.AVAILABLE_NOTES)
+    POSSIBLE_NOTES += ["_" + c for c in PIANO.CHORDS.keys()]
+    POSSIBLE_NOTES += list(PIANO.TRACKS.keys())
+    MAPS = {
+        "name_value": {POSSIBLE_NOTES[i]: i for i in range(len(POSSIBLE_NOTES))},
+        "value_name": {i: POSSIBLE_NOTES[i] for i in range(len(POSSIBLE_NOTES))}
+    }
+    # Generate Notes
+    VALUE_GEN_MAP = {
+        MAPS["name_value"][n]: {
+            "prob": JOB["prob_dist"][n],
+            "params": JOB["params_gen_data"]
+        }
+        for n in JOB["prob_dist"].keys()
+    }
+    ENV_UPDATE_FUNC = functools.partial(
+        LIBRARIES["NoteGenerator"]["RandomSequence"].NOTEGENENV_UPDATE_FUNCS[JOB["env_update_func"]],
+        VALUE_GEN_MAP=VALUE_GEN_MAP, **JOB["env_params"]
+    )
+    NOTES_DATA = LIBRARIES["NoteGenerator"]["RandomSequence"].RandomSequence_GenerateNotes(
+        JOB["notes_count"], ENV_UPDATE_FUNC, MAPS, seed=JOB["seed"]
+    )
+    # Decompose Notes
+    COMMON_PARAMS = dict(PIANO.TRACKS["default"]["common_params"])
+    COMMON_PARAMS.update(JOB["common_params"])
+    NOTES = PIANO.Note_DecomposeNotesToKeys(NOTES_DATA["notes"], common_params=COMMON_PARAMS)
+    # MIDI
+    MIDIAudio = PIANO.MIDI_AddTrack(NOTES, track=0, start_time=0, tempo=JOB["tempo"])
+    ArtifactUtils.ArtifactUtils_WriteAtomic(PATHS_OUT["midi"], lambda temp_path: PIANO.AudioGen_SaveMIDI(MIDIAudio, save_path=temp_path))
+    # WAV
+    if "wav" in PATHS_OUT.keys():
+        ArtifactUtils.ArtifactUtils_WriteAtomic(PATHS_OUT["wav"], lambda temp_path: Utils_MIDI2WAV(PATHS_OUT["midi"], temp_path))
+    # MP4
+    if "mp4" in PATHS_OUT.keys():
+        ## Clean chords (notes with delay 0 causing visualisation jumps)
+        NOTES_CLEANED = [note for ni, note in enumerate(NOTES) if ni == 0 or note["delay"] != 0]
+        NOTES_FRAMES = LIBRARIES["Visualisers"]["CircleBouncer"].CircleBouncer_VisualiseNotes(
+            NOTES_CLEANED, PIANO.AVAILABLE_NOTES, **VISUALISATION_PARAMS
+        )
+        ArtifactUtils.ArtifactUtils_WriteAtomic(PATHS_OUT["mp4"], lambda temp_path: LIBRARIES["Visualisers"]["CircleBouncer"].VideoUtils_SaveVisualisationVideo(
+            NOTES_CLEANED, NOTES_FRAMES, PATHS_OUT["wav"], temp_path
+        ))
+
+    return {
+        "hash": JOB["hash"],
+        "status": "done",
+        "notes": len(NOTES),
+        "time": round(time.time() - START_TIME, 3)
+    }
+
+def BatchGenerator_RunSweep(SPEC, n_workers=1):
+    '''
+    Batch Generator - Run all jobs of a sweep spec over a process pool (skipping jobs whose outputs exist)
+    '''
+    # Init
+    JOBS = BatchGenerator_FormJobs(SPEC)
+    MANIFEST_PATH = os.path.join(SPEC["output_dir"], PATHS["manifest"])
+    MANIFEST = {
+        "spec": SPEC,
+        "jobs": {}
+    }
+    os.makedirs(SPEC["output_dir"], exist_ok=True)
+    # Skip existing jobs
+    JOBS_PENDING = []
+    for JOB in JOBS:
+        MANIFEST["jobs"][JOB["hash"]] = {
+            "seed": JOB["seed"],
+            "prob_dist": JOB["prob_dist"],
+            "env_params": JOB["env_params"],
+            "paths": JOB["paths"],
+            "status": "pending"
+        }
+        if all([os.path.exists(p) for p in JOB["paths"].values()]):
+            MANIFEST["jobs"][JOB["hash"]]["status"] = "skipped"
+        else:
+            JOBS_PENDING.append(JOB)
+    print(f"Jobs: {len(JOBS)} ({len(JOBS) - len(JOBS_PENDING)} already done)")
+    # Run jobs
+    with ProcessPoolExecutor(max(1, n_workers)) as EXECUTOR:
+        FUTURES = {EXECUTOR.submit(BatchGenerator_RunJob, JOB): JOB for JOB in JOBS_PENDING}
+        for i, future in enumerate(as_completed(FUTURES)):
+            JOB = FUTURES[future]
+            try:
+                MANIFEST["jobs"][JOB["hash"]].update(future.result())
+            except Exception as e:
+                MANIFEST["jobs"][JOB["hash"]].update({"status": "failed", "error": str(e)})
+            print(f"[{i+1}/{len(JOBS_PENDING)}] {JOB['hash']}: {MANIFEST['jobs'][JOB['hash']]['status']}")
+            ## Save manifest after every job so that interrupted sweeps still have it
+            ArtifactUtils.ArtifactUtils_WriteAtomic(MANIFEST_PATH, lambda temp_path: json.dump(MANIFEST, open(temp_path, "w"), indent=4))
+    if len(JOBS_PENDING) == 0:
+        json.dump(MANIFEST, open(MANIFEST_PATH, "w"), indent=4)
+
+    return MANIFEST
+
+# RunCode
+if __name__ == "__main__":
+    # Parse Args
+    parser = argparse.ArgumentParser(description="Batch generate piano music over a parameter sweep")
+    parser.add_argument("spec", help="Path to sweep spec JSON")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    args = parser.parse_args()
+    # Run
+    SPEC = json.load(open(args.spec, "r"))
+    BatchGenerator_RunSweep(SPEC, n_workers=args.workers)
@@ -0,0 +1,109 @@
+"""
+Import Benchmark for MusicVis
+
+Measures cold start time of importing MusicVis (or other modules) in fresh Python processes
+
+Usage:
+    python ImportBenchmark.py --runs 5 --top 10 --max-time 0.5 --history Data/Benchmarks/import_time.jsonl
+
+- Each run imports the modules in a new interpreter, so nothing is cached in memory between runs
+- "--top" lists the slowest imported modules (cumulative time from python -X importtime) of the last run
+- "--max-time" makes the benchmark exit with an error if the median import time is above it (seconds)
+- "--history" appends the result as a JSON line to the given file to track import time across changes
+"""
+
+# Imports
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+
+# Main Vars
+BENCHMARK_DEFAULT_MODULES = ["MusicVis"]
+
+# Util Functions
+def ImportBenchmark_ParseImportTimes(stderr):
+    '''
+    Import Benchmark - Parse output of python -X importtime to a list of (module, self time, cumulative time) in seconds
+    '''
+    IMPORT_TIMES = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"): continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit(): continue
+        IMPORT_TIMES.append((parts[2].strip(), int(parts[0]) / 1e6, int(parts[1]) / 1e6))
+
+    return IMPORT_TIMES
+
+# Main Functions
+def ImportBenchmark_RunOnce(modules):
+    '''
+    Import Benchmark - Import modules in a fresh process and get the import time (seconds) and import times of all modules
+    '''
+    CODE = "import time; t = time.perf_counter(); import " + ", ".join(modules) + "; print(time.perf_counter() - t)"
+    RESULT = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODE],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if RESULT.returncode != 0: raise RuntimeError(RESULT.stderr)
+
+    return float(RESULT.stdout.strip().splitlines()[-1]), ImportBenchmark_ParseImportTimes(RESULT.stderr)
+
+def ImportBenchmark_Run(modules=BENCHMARK_DEFAULT_MODULES, runs=5, top=10):
+    '''
+    Import Benchmark - Run benchmark and get summary of import times
+
+    Parameters,
+    - modules : Modules to import
+    - runs : Number of fresh processes to import in
+    - top : Number of slowest imported modules to list
+    '''
+    # Run
+    TIMES = []
+    for i in range(runs):
+        import_time, IMPORT_TIMES = ImportBenchmark_RunOnce(modules)
+        TIMES.append(import_time)
+    # Summary
+    TOP_IMPORTS = sorted(IMPORT_TIMES, key=lambda x: x[2], reverse=True)
+    TOP_IMPORTS = [m for m in TOP_IMPORTS if m[0] not in modules][:top]
+    SUMMARY = {
+        "modules": modules,
+        "runs": runs,
+        "min": float(np.min(TIMES)),
+        "median": float(np.median(TIMES)),
+        "max": float(np.max(TIMES)),
+        "n_imported_modules": len(IMPORT_TIMES),
+        "top_imports": [{"module": m[0], "self": m[1], "cumulative": m[2]} for m in TOP_IMPORTS],
+        "time": time.time()
+    }
+
+    return SUMMARY
+
+# RunCode
+if __name__ == "__main__":
+    # Parse Args
+    parser = argparse.ArgumentParser(description="Benchmark cold start import time of MusicVis")
+    parser.add_argument("modules", nargs="*", default=BENCHMARK_DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh processes to import in")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imported modules to list")
+    parser.add_argument("--max-time", type=float, default=None, help="Fail if median import time (seconds) is above this")
+    parser.add_argument("--history", default=None, help="JSON lines file to append the result to")
+    args = parser.parse_args()
+    # Run
+    SUMMARY = ImportBenchmark_Run(args.modules, runs=args.runs, top=args.top)
+    print(f"Import {', '.join(SUMMARY['modules'])}: median {SUMMARY['median']:.3f}s (min {SUMMARY['min']:.3f}s, max {SUMMARY['max']:.3f}s, {SUMMARY['runs']} runs)")
+    print(f"Imported modules: {SUMMARY['n_imported_modules']}")
+    for m in SUMMARY["top_imports"]:
+        print(f"    {m['cumulative']:.3f}s | {m['module']}")
+    # Save
+    if args.history is not None:
+        if os.path.dirname(args.history) != "": os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, "a") as f:
+            f.write(json.dumps(SUMMARY) + "\n")
+    # Check
+    if args.max_time is not None and SUMMARY["median"] > args.max_time:
+        print(f"Median import time {SUMMARY['median']:.3f}s is above {args.max_time:.3f}s")
+        sys.exit(1)
@@ -6,11 +6,17 @@ References:
 """
 
 # Imports
+import io
 import os
+import numpy as np
+from collections import Counter
+from collections.abc import MutableMapping, Sequence
 from midiutil import MIDIFile
 from mido import MidiFile as MidiFile_Read, Message, MetaMessage
 from mingus.core import chords as LIBRARY_CHORDS, notes as LIBRARY_NOTES, keys as LIBRARY_KEYS
 
+from Libraries.Utils import TraceUtils
+
 # Main Vars
 NOTE_VALUE_RANGE = [0, 127]
 AVAILABLE_NOTES = ["C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B"]
@@ -31,6 +37,103 @@ OCTAVES = list(range(NOTE_VALUE_RANGE[1]//NOTES_IN_OCTAVE - NOTE_VALUE_RANGE[0]/
 CHORDS = {}
 TRACKS = {}
 
+# Main Classes
+class ResolvedNotes(Sequence):
+    def __init__(self, notes, common_params={}):
+        '''
+        Resolved Notes
+
+        Lazy sequence of notes resolved with common parameters, nothing is allocated per note on resolution
+        - Notes are given as NoteView objects created on access
+        - Writes made to the notes are kept per note in overrides (the input notes are never modified)
+        - Common params are one defaults layer shared by all the notes
+        - iter_dicts gives plain dicts for fast read only passes over all the notes
+        '''
+        self.notes = notes
+        self.common_params = common_params
+        self.overrides = {}
+
+    def __len__(self):
+        return len(self.notes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice): return [NoteView(self, i) for i in range(*index.indices(len(self.notes)))]
+        if index < 0: index += len(self.notes)
+        if index < 0 or index >= len(self.notes): raise IndexError(index)
+        return NoteView(self, index)
+
+    def __iter__(self):
+        for i in range(len(self.notes)):
+            yield NoteView(self, i)
+
+    def iter_dicts(self):
+        '''
+        Iterate notes as plain resolved dicts (new dicts which are only for reading, writes to them are not kept)
+        '''
+        COMMON_PARAMS, OVERRIDES = self.common_params, self.overrides
+        for i in range(len(self.notes)):
+            if i in OVERRIDES: yield {**COMMON_PARAMS, **self.notes[i], **OVERRIDES[i]}
+            else: yield {**COMMON_PARAMS, **self.notes[i]}
+
+    def __repr__(self):
+        return f"ResolvedNotes({self.notes!r}, {self.common_params!r}, overrides={self.overrides!r})"
+
+class NoteView(MutableMapping):
+    '''
+    Note View - Note of ResolvedNotes (lookups check the overrides, the note and the common params in order, writes go to the overrides)
+    '''
+    __slots__ = ("parent", "index")
+
+    def __init__(self, parent, index):
+        self.parent = parent
+        self.index = index
+
+    def __getitem__(self, key):
+        PARENT = self.parent
+        if PARENT.overrides:
+            OVERRIDES = PARENT.overrides.get(self.index, None)
+            if OVERRIDES is not None and key in OVERRIDES: return OVERRIDES[key]
+        NOTE = PARENT.notes[self.index]
+        if key in NOTE: return NOTE[key]
+        return PARENT.common_params[key]
+
+    def get(self, key, default=None):
+        # Same lookup as __getitem__ without raising (faster than the MutableMapping default)
+        PARENT = self.parent
+        if PARENT.overrides:
+            OVERRIDES = PARENT.overrides.get(self.index, None)
+            if OVERRIDES is not None and key in OVERRIDES: return OVERRIDES[key]
+        NOTE = PARENT.notes[self.index]
+        if key in NOTE: return NOTE[key]
+        return PARENT.common_params.get(key, default)
+
+    def __setitem__(self, key, value):
+        OVERRIDES = self.parent.overrides.get(self.index, None)
+        if OVERRIDES is None: OVERRIDES = self.parent.overrides[self.index] = {}
+        OVERRIDES[key] = value
+
+    def __delitem__(self, key):
+        OVERRIDES = self.parent.overrides.get(self.index, None)
+        if OVERRIDES is None or key not in OVERRIDES: raise KeyError(f"Key {key!r} is not overridden in the note view")
+        del OVERRIDES[key]
+
+    def __contains__(self, key):
+        PARENT = self.parent
+        return key in PARENT.notes[self.index] or key in PARENT.common_params or key in PARENT.overrides.get(self.index, ())
+
+    def __iter__(self):
+        # Same order as a dict filled from the common params, then the note, then the overrides
+        KEYS = dict.fromkeys(self.parent.common_params)
+        KEYS.update(dict.fromkeys(self.parent.notes[self.index]))
+        KEYS.update(dict.fromkeys(self.parent.overrides.get(self.index, {})))
+        return iter(KEYS)
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def __repr__(self):
+        return repr(dict(self))
+
 # Main Functions
 ## Chord Functions
 def Chord_GetNotes_FromShorthand(chord_shorthand):
@@ -73,32 +176,78 @@ def Note_FromNumber(number):
 def Note_ResolveNotesWithCommonParams(notes, common_params={}):
     '''
     Note - Resolve notes data with common parameters
+
+    Notes are not copied, they are resolved lazily as a ResolvedNotes sequence with 3 layers,
+    - Overrides : Per note dict (only created on the first write to the note) which receives all writes made to the resolved note
+    - Note : The input note (never modified through the view)
+    - Common Params : One defaults layer shared by all the notes, used when a key is missing in the note
+    Hence the cost of resolution is proportional to the overrides, not to the number of notes
+    Use Note_MaterializeNotes to get plain dicts when needed (Eg. for JSON)
+    '''
+    return ResolvedNotes(notes, dict(common_params))
+
+def Note_GetNoteViews(notes):
+    '''
+    Note - Get writable views of notes without copying them (writes go to a new overrides layer)
+    '''
+    return ResolvedNotes(notes)
+
+def Note_MaterializeNotes(notes):
+    '''
+    Note - Materialize resolved note views into plain dicts
+    '''
+    return [dict(note) for note in notes]
+
+def Note_GetNotesStats(notes, params=["delay", "duration", "volume", "octave", "value"], top_notes=12):
+    '''
+    Note - Get summary statistics of notes (without converting the notes to JSON)
+
+    Notes can be note names (str) or note dicts (missing or non numeric parameters are skipped)
+    Returns,
+    - count : Number of notes
+    - length : End time of the last ending note (if all notes have delay and duration)
+    - params : min, mean and max of each numeric parameter over the notes which have it
+    - notes : Counts of the most common note names
     '''
     # Init
-    notes_resolved = []
-    # Resolve
-    for i in range(len(notes)):
-        note_resolved = dict(notes[i])
-        for cpk in common_params.keys():
-            if cpk not in notes[i].keys():
-                note_resolved[cpk] = common_params[cpk]
-        notes_resolved.append(note_resolved)
-    
-    return notes_resolved
+    NOTES_DICTS = [{"note": note} if isinstance(note, str) else note for note in notes]
+    STATS = {
+        "count": len(NOTES_DICTS),
+        "length": None,
+        "params": {},
+        "notes": {}
+    }
+    # Params
+    PARAM_VALUES = {}
+    for p in params:
+        VALUES = [note[p] for note in NOTES_DICTS if isinstance(note.get(p, None), (int, float)) and not isinstance(note.get(p, None), bool)]
+        PARAM_VALUES[p] = VALUES
+        if len(VALUES) == 0: continue
+        VALUES = np.array(VALUES, dtype=float)
+        STATS["params"][p] = {"min": float(VALUES.min()), "mean": float(VALUES.mean()), "max": float(VALUES.max()), "count": len(VALUES)}
+    # Length
+    if len(NOTES_DICTS) > 0 and len(PARAM_VALUES.get("delay", [])) == len(NOTES_DICTS) and len(PARAM_VALUES.get("duration", [])) == len(NOTES_DICTS):
+        STARTS = np.cumsum(np.array(PARAM_VALUES["delay"], dtype=float))
+        STATS["length"] = float((STARTS + np.array(PARAM_VALUES["duration"], dtype=float)).max())
+    # Notes
+    NOTE_COUNTS = Counter([str(note["note"]) for note in NOTES_DICTS if "note" in note.keys()])
+    STATS["notes"] = dict(NOTE_COUNTS.most_common(top_notes))
+
+    return STATS
 
+@TraceUtils.TraceUtils_Trace()
 def Note_DecomposeNotesToKeys(notes, common_params={}):
     '''
     Note - Decompose notes with tracks, chords and keys to keys
+
+    The input notes are not modified, each key is a shallow copy of its note with the cleaned note name and the note number as "value"
     '''
     # Init
     KEYS = []
-    # Reformat notes if needed
-    for i in range(len(notes)):
-        if type(notes[i]) == str: notes[i] = {"note": notes[i]}
     # Decompose notes
     for i in range(len(notes)):
         keys_decomposed_current = []
-        note = notes[i]
+        note = {"note": notes[i]} if type(notes[i]) == str else notes[i]
         ## Check if track
         if note["note"] in TRACKS.keys():
             ### Recursively decompose the track
@@ -109,11 +258,12 @@ def Note_DecomposeNotesToKeys(notes, common_params={}):
             keys_stack = []
             chord_check = False
             chord_marker = "_"
-            if note["note"].startswith(chord_marker):
-                note["note"] = note["note"][len(chord_marker):]
+            note_name = note["note"]
+            if note_name.startswith(chord_marker):
+                note_name = note_name[len(chord_marker):]
                 try:
                     ### Get Notes for the Chord
-                    ChordNotes = Chord_GetNotes_FromShorthand(note["note"])
+                    ChordNotes = Chord_GetNotes_FromShorthand(note_name)
                     for cni in range(len(ChordNotes)):
                         cnd = dict(note)
                         cnd["note"] = ChordNotes[cni] # Set the current note in the chord
@@ -125,8 +275,8 @@ def Note_DecomposeNotesToKeys(notes, common_params={}):
                     pass
             ### If nothing, it is a key
             if not chord_check:
-                keys_stack = [note]
-            ### Add Keys Stack
+                keys_stack = [dict(note, note=note_name)]
+            ### Add Keys Stack (keys are copies, so they are cleaned in place)
             for cur_note in keys_stack:
                 #### All keys should have first letter in upper case and all other letters in lower case
                 if len(cur_note["note"]) > 1:
@@ -135,20 +285,21 @@ def Note_DecomposeNotesToKeys(notes, common_params={}):
                 cur_note["note"] = LIBRARY_NOTES.remove_redundant_accidentals(cur_note["note"])
                 cur_note["note"] = LIBRARY_NOTES.reduce_accidentals(cur_note["note"])
                 cur_note["note"] = Note_SwapAccidentals(cur_note["note"])
+                #### Add note number as value parameter
+                cur_note["value"] = Note_ToNumber(cur_note["note"], cur_note["octave"] if "octave" in cur_note else common_params["octave"])
                 #### Append
                 keys_decomposed_current.append(cur_note)
         
         KEYS.extend(keys_decomposed_current)
 
-    # Resolve Notes with Common Params
+    # Resolve Notes with Common Params (no overrides are created, as "value" is set on the keys)
     KEYS = Note_ResolveNotesWithCommonParams(KEYS, common_params)
-    # Add note number as value parameter for all notes
-    for i in range(len(KEYS)):
-        KEYS[i]["value"] = Note_ToNumber(KEYS[i]["note"], KEYS[i]["octave"])
+    TraceUtils.TraceUtils_SetAttributes(notes=len(KEYS))
 
     return KEYS
 
 # MIDI Functions
+@TraceUtils.TraceUtils_Trace()
 def MIDI_AddTrack(notes, MIDIAudio=None, track=0, start_time=0, tempo=60):
     '''
     MIDI - Add a new track to the MIDI audio
@@ -166,6 +317,7 @@ def MIDI_AddTrack(notes, MIDIAudio=None, track=0, start_time=0, tempo=60):
      - "delay" : Delay between the current note and previous note (Must be include duration of previous note to avoid overlapping)
      - "duration" : MIDI note duration (taken as 1 beat if missing)
      - "volume" (0 - 127) : MIDI volume value (taken as 100 if missing)
+    Notes are only read, missing and invalid parameters are normalised into locals (notes can be read only views)
     '''
     # Init
     # Create MIDI if not present
@@ -174,26 +326,26 @@ def MIDI_AddTrack(notes, MIDIAudio=None, track=0, start_time=0, tempo=60):
     MIDIAudio.addTempo(track, start_time, tempo)
     # Add notes
     cur_time = start_time
+    n_notes = 0 # Counted in the loop, as notes can be any iterable (eg. lazy streams)
+    if isinstance(notes, ResolvedNotes): notes = notes.iter_dicts() # Plain dicts are faster to read than views
     for i, note in enumerate(notes):
+        n_notes += 1
         ## Update current time (done regardless of whether note is valid or not)
         cur_time += note["delay"]
         ## Check for missing / invalid note parameters
-        if "octave" not in note.keys(): note["octave"] = 4
-        else: note["octave"] = int(note["octave"])
-        if "pitch" not in note.keys():
-            if "value" in note.keys(): note["pitch"] = note["value"]
-            elif "note" in note.keys(): note["pitch"] = Note_ToNumber(note["note"], note["octave"])
-            else: note["pitch"] = -1
-        if note["pitch"] < 0 and note["pitch"] > 127: continue
-        if "channel" not in note.keys(): note["channel"] = 0
-        else: note["channel"] = int(note["channel"])
-        if "duration" not in note.keys(): note["duration"] = 1
-        else: note["duration"] = float(note["duration"])
-        if "volume" not in note.keys(): note["volume"] = 100
-        else: note["volume"] = int(note["volume"])
+        octave = int(note.get("octave", 4))
+        if "pitch" in note: pitch = note["pitch"]
+        elif "value" in note: pitch = note["value"]
+        elif "note" in note: pitch = Note_ToNumber(note["note"], octave)
+        else: pitch = -1
+        if pitch < 0 and pitch > 127: continue
+        channel = int(note.get("channel", 0))
+        duration = float(note.get("duration", 1))
+        volume = int(note.get("volume", 100))
         ## Add note if valid pitch (If not valid, make pitch as 0)
-        if note["pitch"] < 0 or note["pitch"] > 255: note["pitch"] = 0
-        MIDIAudio.addNote(track, note["channel"], note["pitch"], cur_time, note["duration"], note["volume"])
+        if pitch < 0 or pitch > 255: pitch = 0
+        MIDIAudio.addNote(track, channel, pitch, cur_time, duration, volume)
+    TraceUtils.TraceUtils_SetAttributes(notes=n_notes, track=track)
 
     return MIDIAudio
 
@@ -259,6 +411,15 @@ def AudioGen_LoadMIDI(path="Data/GeneratedAudio/generated_midi.mid"):
 
     return MIDIAudio
 
+def AudioGen_LoadMIDIBytes(midi_bytes):
+    '''
+    Audio Generator - Load MIDI file from its bytes (without writing it to disk)
+    '''
+    MIDIAudio = MidiFile_Read(file=io.BytesIO(midi_bytes))
+
+    return MIDIAudio
+
+@TraceUtils.TraceUtils_Trace()
 def AudioGen_SaveMIDI(MIDIAudio, save_path="Data/GeneratedAudio/generated_midi.mid"):
     '''
     Audio Generator - Save MIDI file
@@ -266,6 +427,7 @@ def AudioGen_SaveMIDI(MIDIAudio, save_path="Data/GeneratedAudio/generated_midi.m
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
     with open(save_path, "wb") as output_file:
         MIDIAudio.writeFile(output_file)
+    TraceUtils.TraceUtils_SetAttributes(bytes=os.path.getsize(save_path))
 
 # RunCode
 # print(Chord_GetNotes_FromShorthand("Dk"))
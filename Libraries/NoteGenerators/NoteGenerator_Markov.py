@@ -0,0 +1,207 @@
+"""
+Note Generator Library - Markov
+
+Generation Logic:
+- Each note is reduced to a token of (value, duration, delay) with duration and delay quantized to a time step
+- A model of order n learns how often each token follows each context of n previous tokens
+    - Trained from the notes extracted from a directory of MIDI files
+    - Transition counts are stored as a sparse matrix (contexts x tokens) with cumulative counts for each context
+- Notes are generated by sampling the next token from the cumulative counts of the current context
+    - If a context was never seen in training, generation restarts from a random context
+"""
+
+# Imports
+import os
+import json
+import numpy as np
+## scipy is imported inside the functions that use it (slow to import)
+from concurrent.futures import ProcessPoolExecutor
+
+from Libraries.MusicGenerators import MusicGenerator_Piano
+
+# Main Vars
+MARKOV_MODEL_ARRAYS = [
+    "vocab_values", "vocab_durations", "vocab_delays",
+    "state_keys", "indptr", "indices", "cumcounts", "start_cumcounts"
+]
+MARKOV_MIDI_EXTENSIONS = [".mid", ".midi"]
+
+# Main Functions
+## Token Functions
+def Markov_QuantizeTimes(times, step=0.05, max_time=8.0):
+    '''
+    Markov - Quantize times (in seconds) to bin indices of the time step
+    '''
+    return np.clip(np.round(np.array(times, dtype=float) / step), 0, int(round(max_time / step))).astype(np.int64)
+
+def Markov_ExtractTracks(path, clip_time=(-1, -1), speed=1.0):
+    '''
+    Markov - Extract (value, duration, delay) arrays for each track of a MIDI file
+    '''
+    # Init
+    TRACKS = []
+    # Extract
+    MIDIAudio = MusicGenerator_Piano.AudioGen_LoadMIDI(path)
+    TRACKS_NOTES = MusicGenerator_Piano.MIDI_ExtractNotes(MIDIAudio, clip_time=clip_time, speed=speed)
+    for notes in TRACKS_NOTES:
+        TRACKS.append(np.array([[note["value"], note["duration"], note["delay"]] for note in notes], dtype=float))
+
+    return TRACKS
+
+## Train Functions
+def Markov_TrainModel(midi_dir, order=1, step=0.05, max_time=8.0, n_workers=1):
+    '''
+    Markov - Train a model from all MIDI files in a directory (searched recursively)
+
+    Parameters,
+    - midi_dir : Directory of MIDI files
+    - order : Number of previous notes the next note depends on
+    - step : Time step (in seconds) to quantize durations and delays to
+    - max_time : Durations and delays longer than this are clipped
+    - n_workers : Number of worker processes used to parse the MIDI files
+    '''
+    from scipy import sparse
+
+    # Init
+    MIDI_PATHS = sorted([
+        os.path.join(root, f)
+        for root, dirs, files in os.walk(midi_dir) for f in files
+        if os.path.splitext(f)[1].lower() in MARKOV_MIDI_EXTENSIONS
+    ])
+    # Parse MIDI files
+    if n_workers > 1 and len(MIDI_PATHS) > 1:
+        with ProcessPoolExecutor(n_workers) as EXECUTOR:
+            FILES_TRACKS = list(EXECUTOR.map(Markov_ExtractTracks, MIDI_PATHS, chunksize=16))
+    else:
+        FILES_TRACKS = [Markov_ExtractTracks(path) for path in MIDI_PATHS]
+    TRACKS = [track for tracks in FILES_TRACKS for track in tracks if len(track) > order]
+    if len(TRACKS) == 0: raise ValueError(f"No tracks with more than {order} notes found in {midi_dir}")
+    NOTES = np.concatenate(TRACKS, axis=0)
+    TRACK_IDS = np.repeat(np.arange(len(TRACKS)), [len(track) for track in TRACKS])
+    # Form tokens
+    TIME_BINS = int(round(max_time / step)) + 1
+    RAW_TOKENS = (
+        NOTES[:, 0].astype(np.int64) * TIME_BINS * TIME_BINS
+        + Markov_QuantizeTimes(NOTES[:, 1], step, max_time) * TIME_BINS
+        + Markov_QuantizeTimes(NOTES[:, 2], step, max_time)
+    )
+    RAW_VOCAB, TOKENS = np.unique(RAW_TOKENS, return_inverse=True)
+    V = len(RAW_VOCAB)
+    if float(V) ** order >= 2 ** 62: raise ValueError(f"Vocabulary of {V} tokens is too large for order {order}")
+    # Form contexts (keys of the previous order tokens) for all positions with enough history in the same track
+    POSITIONS = np.arange(order, len(TOKENS))
+    POSITIONS = POSITIONS[TRACK_IDS[POSITIONS - order] == TRACK_IDS[POSITIONS]]
+    CONTEXT_KEYS = np.zeros(len(POSITIONS), dtype=np.int64)
+    for j in range(order):
+        CONTEXT_KEYS = CONTEXT_KEYS * V + TOKENS[POSITIONS - order + j]
+    STATE_KEYS, STATES = np.unique(CONTEXT_KEYS, return_inverse=True)
+    # Count transitions
+    TRANSITIONS = sparse.coo_matrix(
+        (np.ones(len(POSITIONS), dtype=np.int64), (STATES, TOKENS[POSITIONS])),
+        shape=(len(STATE_KEYS), V)
+    ).tocsr()
+    TRANSITIONS.sum_duplicates()
+    TRANSITIONS.sort_indices()
+    # Form cumulative counts for each state
+    CUMCOUNTS = np.cumsum(TRANSITIONS.data)
+    ROW_OFFSETS = np.concatenate([[0], CUMCOUNTS])[TRANSITIONS.indptr[:-1]]
+    CUMCOUNTS = CUMCOUNTS - np.repeat(ROW_OFFSETS, np.diff(TRANSITIONS.indptr))
+    START_CUMCOUNTS = np.cumsum(np.bincount(STATES, minlength=len(STATE_KEYS)))
+    # Form model
+    MODEL = {
+        "order": order,
+        "step": step,
+        "max_time": max_time,
+        "n_files": len(MIDI_PATHS),
+        "vocab_values": (RAW_VOCAB // (TIME_BINS * TIME_BINS)).astype(np.int64),
+        "vocab_durations": np.round(((RAW_VOCAB // TIME_BINS) % TIME_BINS) * step, 6),
+        "vocab_delays": np.round((RAW_VOCAB % TIME_BINS) * step, 6),
+        "state_keys": STATE_KEYS,
+        "indptr": TRANSITIONS.indptr.astype(np.int64),
+        "indices": TRANSITIONS.indices.astype(np.int64),
+        "cumcounts": CUMCOUNTS.astype(np.int64),
+        "start_cumcounts": START_CUMCOUNTS.astype(np.int64)
+    }
+
+    return MODEL
+
+## Model Functions
+def Markov_SaveModel(MODEL, save_dir="Data/Models/Markov/"):
+    '''
+    Markov - Save model as a directory of arrays (.npy) and a metadata file
+    '''
+    os.makedirs(save_dir, exist_ok=True)
+    for k in MARKOV_MODEL_ARRAYS:
+        np.save(os.path.join(save_dir, k + ".npy"), np.asarray(MODEL[k]))
+    META = {k: MODEL[k] for k in MODEL.keys() if k not in MARKOV_MODEL_ARRAYS}
+    json.dump(META, open(os.path.join(save_dir, "meta.json"), "w"), indent=4)
+
+def Markov_LoadModel(load_dir="Data/Models/Markov/"):
+    '''
+    Markov - Load model saved with Markov_SaveModel (arrays are memory-mapped, not read into memory)
+    '''
+    MODEL = json.load(open(os.path.join(load_dir, "meta.json"), "r"))
+    for k in MARKOV_MODEL_ARRAYS:
+        MODEL[k] = np.load(os.path.join(load_dir, k + ".npy"), mmap_mode="r")
+
+    return MODEL
+
+## Note Generator Functions
+def Markov_SampleStartState(MODEL, RNG):
+    '''
+    Markov - Sample a starting state with probability proportional to how often it was seen in training
+    '''
+    START_CUMCOUNTS = MODEL["start_cumcounts"]
+    return int(np.searchsorted(START_CUMCOUNTS, RNG.integers(START_CUMCOUNTS[-1]), side="right"))
+
+def Markov_GenerateNotes(N, MODEL, seed=0, rng=None):
+    '''
+    Markov - Generate Notes
+
+    Parameters,
+    - N : Number of notes to generate
+    - MODEL : Model trained with Markov_TrainModel or loaded with Markov_LoadModel
+    - seed : Seed for the random generator, ignored if rng is given
+    - rng : Random generator (numpy.random.Generator) to use
+    '''
+    # Init
+    RNG = rng if rng is not None else np.random.default_rng(seed)
+    ORDER = MODEL["order"]
+    V = len(MODEL["vocab_values"])
+    KEY_MOD = V ** (ORDER - 1)
+    STATE_KEYS = MODEL["state_keys"]
+    INDPTR = MODEL["indptr"]
+    INDICES = MODEL["indices"]
+    CUMCOUNTS = MODEL["cumcounts"]
+    NOTES_DATA = {
+        "notes": [],
+        "env_data": {
+            "rng": RNG
+        }
+    }
+    # Generate
+    state = Markov_SampleStartState(MODEL, RNG)
+    for i in range(N):
+        ## Sample next token from the cumulative counts of the state
+        row_start, row_end = int(INDPTR[state]), int(INDPTR[state+1])
+        ROW_CUMCOUNTS = CUMCOUNTS[row_start:row_end]
+        token = int(INDICES[row_start + int(np.searchsorted(ROW_CUMCOUNTS, RNG.integers(ROW_CUMCOUNTS[-1]), side="right"))])
+        ## Form note
+        value = int(MODEL["vocab_values"][token])
+        note = MusicGenerator_Piano.Note_FromNumber(value)
+        NOTES_DATA["notes"].append({
+            "note": note["note"],
+            "octave": note["octave"],
+            "value": value,
+            "duration": max(float(MODEL["vocab_durations"][token]), MODEL["step"]),
+            "delay": float(MODEL["vocab_delays"][token])
+        })
+        ## Move to next state (restart if the next context was never seen)
+        key = (int(STATE_KEYS[state]) % KEY_MOD) * V + token
+        state = int(np.searchsorted(STATE_KEYS, key))
+        if state >= len(STATE_KEYS) or int(STATE_KEYS[state]) != key:
+            state = Markov_SampleStartState(MODEL, RNG)
+
+    return NOTES_DATA
+
+# RunCode
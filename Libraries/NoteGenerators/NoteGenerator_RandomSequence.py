@@ -13,13 +13,51 @@ Generation Logic:
 """
 
 # Imports
+import copy
+import functools
 import numpy as np
 from tqdm import tqdm
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from Libraries.Utils.SamplingUtils import FenwickSampler
 
 # Main Vars
+RANDOMSEQUENCE_CHUNK_SIZE = 4096
 
 
 # Main Functions
+## Note Generation Environment Util Functions
+def NoteGenEnv_GenerateParams(PARAMS_GEN_DATA, RNG):
+    '''
+    Note Generator Environment - Generate parameters of a note from the parameters generation data
+    '''
+    # Init
+    PARAMS = {}
+    # Generate
+    for pk in PARAMS_GEN_DATA.keys():
+        ### Constant
+        if PARAMS_GEN_DATA[pk]["type"] == "constant":
+            PARAMS[pk] = PARAMS_GEN_DATA[pk]["value"]
+        ### Number
+        elif PARAMS_GEN_DATA[pk]["type"] == "number":
+            PARAMS[pk] = round(
+                PARAMS_GEN_DATA[pk]["range"][0] + RNG.random() * (PARAMS_GEN_DATA[pk]["range"][1] - PARAMS_GEN_DATA[pk]["range"][0]), 
+                ndigits=2
+            )
+        ### Selection
+        elif PARAMS_GEN_DATA[pk]["type"] == "selection":
+            param_options = PARAMS_GEN_DATA[pk]["options"]
+            if "prob" not in PARAMS_GEN_DATA[pk].keys(): PARAMS_GEN_DATA[pk]["prob"] = [1.0/len(param_options)] * len(param_options)
+            OPTIONS_PROB_DIST = np.array(PARAMS_GEN_DATA[pk]["prob"])
+            OPTIONS_PROB_DIST = OPTIONS_PROB_DIST / np.sum(OPTIONS_PROB_DIST)
+            PARAMS[pk] = param_options[RNG.choice(len(param_options), p=OPTIONS_PROB_DIST)]
+        ### Else
+        else:
+            pass
+
+    return PARAMS
+
 ## Note Generation Environment Functions
 def NoteGenEnv_Update_ConstantRandomDistribution(NOTES_DATA, VALUE_GEN_MAP={}):
     '''
@@ -29,6 +67,7 @@ def NoteGenEnv_Update_ConstantRandomDistribution(NOTES_DATA, VALUE_GEN_MAP={}):
     - NOTES_DATA : All data about the generated notes
         - "notes": List of generated notes
         - "env_data": Environment data used by the function
+            - "rng": Random generator (numpy.random.Generator) to draw all random values from
         - "map_value_name": Map to get the name of a note for each possible value
     - VALUE_GEN_MAP : Map to get the generation data for value and parameters for each possible note value
         - "prob": Probability of selection of the note (Constant)
@@ -39,44 +78,204 @@ def NoteGenEnv_Update_ConstantRandomDistribution(NOTES_DATA, VALUE_GEN_MAP={}):
                 - "selection": Selects a random option from "options" key data list and assigns to the parameter (can give probability distribution in "prob" key data as a list)
     '''
     # Init
-    if NOTES_DATA["env_data"]["seed"] is not None: np.random.seed(NOTES_DATA["env_data"]["seed"])
+    RNG = NOTES_DATA["env_data"]["rng"]
     POSSIBLE_NOTE_VALUES = list(VALUE_GEN_MAP.keys())
     # Generate next note
     NOTE_NEXT = {}
     ## Select value
     PROB_DIST = np.array([VALUE_GEN_MAP[v]["prob"] for v in POSSIBLE_NOTE_VALUES])
     PROB_DIST = PROB_DIST / np.sum(PROB_DIST)
-    NOTE_NEXT["value"] = np.random.choice(POSSIBLE_NOTE_VALUES, p=PROB_DIST)
+    NOTE_NEXT["value"] = POSSIBLE_NOTE_VALUES[RNG.choice(len(POSSIBLE_NOTE_VALUES), p=PROB_DIST)]
     NOTE_NEXT["note"] = NOTES_DATA["map_value_name"][NOTE_NEXT["value"]]
     ## Generate parameters
-    PARAMS_GEN_DATA = VALUE_GEN_MAP[NOTE_NEXT["value"]]["params"]
-    for pk in PARAMS_GEN_DATA.keys():
-        ### Constant
-        if PARAMS_GEN_DATA[pk]["type"] == "constant":
-            NOTE_NEXT[pk] = PARAMS_GEN_DATA[pk]["value"]
-        ### Number
-        elif PARAMS_GEN_DATA[pk]["type"] == "number":
-            NOTE_NEXT[pk] = round(
-                PARAMS_GEN_DATA[pk]["range"][0] + np.random.rand() * (PARAMS_GEN_DATA[pk]["range"][1] - PARAMS_GEN_DATA[pk]["range"][0]), 
-                ndigits=2
-            )
-        ### Selection
-        elif PARAMS_GEN_DATA[pk]["type"] == "selection":
-            param_options = PARAMS_GEN_DATA[pk]["options"]
-            if "prob" not in PARAMS_GEN_DATA[pk].keys(): PARAMS_GEN_DATA[pk]["prob"] = [1.0/len(param_options)] * len(param_options)
-            OPTIONS_PROB_DIST = np.array(PARAMS_GEN_DATA[pk]["prob"])
-            OPTIONS_PROB_DIST = OPTIONS_PROB_DIST / np.sum(OPTIONS_PROB_DIST)
-            NOTE_NEXT[pk] = np.random.choice(param_options, p=OPTIONS_PROB_DIST)
-        ### Else
-        else:
-            pass
+    NOTE_NEXT.update(NoteGenEnv_GenerateParams(VALUE_GEN_MAP[NOTE_NEXT["value"]]["params"], RNG))
 
     NOTES_DATA["notes"].append(NOTE_NEXT)
     return NOTES_DATA
 
+def NoteGenEnv_Update_AdaptiveRandomDistribution(NOTES_DATA, VALUE_GEN_MAP={}, repeat_penalty=0.5, memory=4):
+    '''
+    Note Generator Environment - Update - Adaptive Random Distribution
+
+    Reference function for history dependent distributions using a Fenwick tree sampler
+    - Probability of a note is its "prob" multiplied by repeat_penalty for each time it occurs in the last memory notes
+    - Each note only changes the weights of the note entering and the note leaving the memory window, so a step is O(log k) for k possible notes
+
+    Parameters,
+    - NOTES_DATA, VALUE_GEN_MAP : Same as NoteGenEnv_Update_ConstantRandomDistribution
+        - NOTES_DATA["env_data"] also stores the sampler state in "values", "base_weights", "sampler", "history" and "counts"
+    - repeat_penalty : Multiplier applied to the probability of a note for each occurrence in the memory window
+    - memory : Number of previous notes affecting the distribution
+    '''
+    # Init
+    RNG = NOTES_DATA["env_data"]["rng"]
+    ## Build sampler only once (O(k)), all further steps reuse it
+    if "sampler" not in NOTES_DATA["env_data"].keys():
+        POSSIBLE_NOTE_VALUES = list(VALUE_GEN_MAP.keys())
+        BASE_WEIGHTS = [VALUE_GEN_MAP[v]["prob"] for v in POSSIBLE_NOTE_VALUES]
+        NOTES_DATA["env_data"].update({
+            "values": POSSIBLE_NOTE_VALUES,
+            "base_weights": BASE_WEIGHTS,
+            "sampler": FenwickSampler(BASE_WEIGHTS),
+            "history": deque(),
+            "counts": [0] * len(POSSIBLE_NOTE_VALUES)
+        })
+    POSSIBLE_NOTE_VALUES = NOTES_DATA["env_data"]["values"]
+    BASE_WEIGHTS = NOTES_DATA["env_data"]["base_weights"]
+    SAMPLER = NOTES_DATA["env_data"]["sampler"]
+    HISTORY = NOTES_DATA["env_data"]["history"]
+    COUNTS = NOTES_DATA["env_data"]["counts"]
+    # Generate next note
+    NOTE_NEXT = {}
+    ## Select value
+    value_index = SAMPLER.sample(RNG)
+    NOTE_NEXT["value"] = POSSIBLE_NOTE_VALUES[value_index]
+    NOTE_NEXT["note"] = NOTES_DATA["map_value_name"][NOTE_NEXT["value"]]
+    ## Generate parameters
+    NOTE_NEXT.update(NoteGenEnv_GenerateParams(VALUE_GEN_MAP[NOTE_NEXT["value"]]["params"], RNG))
+    ## Update distribution
+    HISTORY.append(value_index)
+    COUNTS[value_index] += 1
+    SAMPLER.update(value_index, BASE_WEIGHTS[value_index] * (repeat_penalty ** COUNTS[value_index]))
+    if len(HISTORY) > memory:
+        old_index = HISTORY.popleft()
+        COUNTS[old_index] -= 1
+        SAMPLER.update(old_index, BASE_WEIGHTS[old_index] * (repeat_penalty ** COUNTS[old_index]))
+
+    NOTES_DATA["notes"].append(NOTE_NEXT)
+    return NOTES_DATA
+
+## Note Generation Environment Batch Functions
+def NoteGenEnv_Batch_GenerateParamColumn(PARAM_GEN_DATA, n, RNG):
+    '''
+    Note Generator Environment - Batch - Generate a column of n values for a parameter (None if type is unknown)
+    '''
+    ### Constant
+    if PARAM_GEN_DATA["type"] == "constant":
+        COLUMN = np.empty(n, dtype=object)
+        COLUMN[:] = [PARAM_GEN_DATA["value"]]
+        return COLUMN
+    ### Number
+    elif PARAM_GEN_DATA["type"] == "number":
+        val_range = PARAM_GEN_DATA["range"]
+        return np.round(val_range[0] + RNG.random(n) * (val_range[1] - val_range[0]), 2)
+    ### Selection
+    elif PARAM_GEN_DATA["type"] == "selection":
+        param_options = PARAM_GEN_DATA["options"]
+        OPTIONS_PROB_DIST = np.array(PARAM_GEN_DATA["prob"]) if "prob" in PARAM_GEN_DATA.keys() else np.ones(len(param_options))
+        OPTIONS_PROB_DIST = OPTIONS_PROB_DIST / np.sum(OPTIONS_PROB_DIST)
+        OPTIONS = np.empty(len(param_options), dtype=object)
+        OPTIONS[:] = list(param_options)
+        return OPTIONS[RNG.choice(len(param_options), size=n, p=OPTIONS_PROB_DIST)]
+    ### Else
+    return None
+
+def NoteGenEnv_Batch_ConstantRandomDistribution(NOTES_DATA, N, VALUE_GEN_MAP={}):
+    '''
+    Note Generator Environment - Batch - Constant Random Distribution
+
+    Generates N notes as columns in a few vectorized calls, as the distribution does not depend on the generated notes
+    - Parameters are same as NoteGenEnv_Update_ConstantRandomDistribution
+    - Notes follow the same distribution as the update function, but not the same sequence for a given seed
+    - Columns are stored in NOTES_DATA["columns"] (None where a note does not have the parameter)
+    '''
+    # Init
+    RNG = NOTES_DATA["env_data"]["rng"]
+    POSSIBLE_NOTE_VALUES = np.empty(len(VALUE_GEN_MAP), dtype=object)
+    POSSIBLE_NOTE_VALUES[:] = list(VALUE_GEN_MAP.keys())
+    POSSIBLE_NOTE_NAMES = np.empty(len(VALUE_GEN_MAP), dtype=object)
+    POSSIBLE_NOTE_NAMES[:] = [NOTES_DATA["map_value_name"][v] for v in POSSIBLE_NOTE_VALUES]
+    # Select values
+    PROB_DIST = np.array([VALUE_GEN_MAP[v]["prob"] for v in POSSIBLE_NOTE_VALUES])
+    PROB_DIST = PROB_DIST / np.sum(PROB_DIST)
+    VALUE_INDICES = RNG.choice(len(POSSIBLE_NOTE_VALUES), size=N, p=PROB_DIST)
+    COLUMNS = {
+        "value": POSSIBLE_NOTE_VALUES[VALUE_INDICES],
+        "note": POSSIBLE_NOTE_NAMES[VALUE_INDICES]
+    }
+    # Generate parameters (once for each group of values sharing the same parameters generation data)
+    PARAMS_GROUPS = {}
+    for i, v in enumerate(POSSIBLE_NOTE_VALUES):
+        PARAMS_GROUPS.setdefault(id(VALUE_GEN_MAP[v]["params"]), []).append(i)
+    for group_indices in PARAMS_GROUPS.values():
+        PARAMS_GEN_DATA = VALUE_GEN_MAP[POSSIBLE_NOTE_VALUES[group_indices[0]]]["params"]
+        ROWS = None if len(PARAMS_GROUPS) == 1 else np.nonzero(np.isin(VALUE_INDICES, group_indices))[0]
+        n = N if ROWS is None else len(ROWS)
+        for pk in PARAMS_GEN_DATA.keys():
+            param_column = NoteGenEnv_Batch_GenerateParamColumn(PARAMS_GEN_DATA[pk], n, RNG)
+            if param_column is None: continue
+            if ROWS is None:
+                COLUMNS[pk] = param_column
+            else:
+                if pk not in COLUMNS.keys(): COLUMNS[pk] = np.full(N, None, dtype=object)
+                COLUMNS[pk][ROWS] = param_column
+
+    NOTES_DATA["columns"] = COLUMNS
+    return NOTES_DATA
 
 ## Note Generator Functions
-def RandomSequence_GenerateNotes(N, ENV_UPDATE_FUNC, MAPS, seed=0, PREV_NOTES=[]):
+def RandomSequence_GetBatchFunc(ENV_UPDATE_FUNC):
+    '''
+    Random Sequence - Get the batch function equivalent to the env update function (None if it has no batch function)
+    '''
+    # Unwrap partial functions to get the base update function and its params
+    BASE_FUNC = ENV_UPDATE_FUNC
+    FUNC_PARAMS = {}
+    if isinstance(ENV_UPDATE_FUNC, functools.partial):
+        BASE_FUNC = ENV_UPDATE_FUNC.func
+        FUNC_PARAMS = ENV_UPDATE_FUNC.keywords
+    if BASE_FUNC not in NOTEGENENV_BATCH_FUNCS.keys(): return None
+
+    return functools.partial(NOTEGENENV_BATCH_FUNCS[BASE_FUNC], **FUNC_PARAMS)
+
+def RandomSequence_MaterializeColumns(COLUMNS):
+    '''
+    Random Sequence - Materialize note columns generated by batch functions into a list of notes
+    '''
+    # Init
+    KEYS = list(COLUMNS.keys())
+    COLUMNS_LIST = [COLUMNS[k].tolist() for k in KEYS]
+    # Form notes
+    notes = [dict(zip(KEYS, row)) for row in zip(*COLUMNS_LIST)]
+    ## Remove missing parameters
+    if any([COLUMNS[k].dtype == object and None in COLUMNS_LIST[i] for i, k in enumerate(KEYS)]):
+        notes = [{k: v for k, v in note.items() if v is not None} for note in notes]
+
+    return notes
+
+def RandomSequence_ConcatenateColumns(COLUMNS_LIST):
+    '''
+    Random Sequence - Concatenate note columns of multiple batches (None where a batch does not have the parameter)
+    '''
+    # Init
+    KEYS = []
+    for COLUMNS in COLUMNS_LIST:
+        KEYS.extend([k for k in COLUMNS.keys() if k not in KEYS])
+    # Concatenate
+    COLUMNS_CONCATENATED = {}
+    for k in KEYS:
+        COLUMNS_CONCATENATED[k] = np.concatenate([
+            COLUMNS[k] if k in COLUMNS.keys() else np.full(len(COLUMNS["value"]), None, dtype=object)
+            for COLUMNS in COLUMNS_LIST
+        ])
+
+    return COLUMNS_CONCATENATED
+
+def RandomSequence_SpawnSeeds(seed, n, start=0):
+    '''
+    Random Sequence - Spawn n independent seed sequences from a seed (int or numpy.random.SeedSequence)
+
+    Spawned seeds are always the same for the same seed (spawning does not depend on previous spawns)
+    - Seeds start - start+n-1 are same as the ones returned by numpy.random.SeedSequence.spawn
+    '''
+    SEED_SEQUENCE = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+    return [
+        np.random.SeedSequence(SEED_SEQUENCE.entropy, spawn_key=tuple(SEED_SEQUENCE.spawn_key) + (i,), pool_size=SEED_SEQUENCE.pool_size)
+        for i in range(start, start+n)
+    ]
+
+def RandomSequence_GenerateNotes(N, ENV_UPDATE_FUNC, MAPS, seed=0, PREV_NOTES=None, batch=False, materialize=True, rng=None):
     '''
     Random Sequence - Generate Notes
 
@@ -86,29 +285,255 @@ def RandomSequence_GenerateNotes(N, ENV_UPDATE_FUNC, MAPS, seed=0, PREV_NOTES=[]
     - "maps": Mapping dictionaries
         - "value_name": Maps note value to its name
         - "name_value": Maps note name to its value
+    - "seed": Seed for the random generator (int or numpy.random.SeedSequence), ignored if rng is given
+    - "PREV_NOTES": Notes to continue from (copied, not modified)
+    - "batch": Whether to generate all notes in one vectorized call if the update function has a batch function
+      (Opt-in, as the random generator is used in a different order, so the same seed gives different notes)
+    - "materialize": Whether to add the batch generated notes to "notes" (If False, they are only available as "columns")
+    - "rng": Random generator (numpy.random.Generator) to use, global random state is never used
     '''
     # Init
-    np.random.seed(seed)
     NOTES_DATA = {
-        "notes": PREV_NOTES,
+        "notes": list(PREV_NOTES) if PREV_NOTES is not None else [],
         "env_data": {
-            "seed": None
+            "rng": rng if rng is not None else np.random.default_rng(seed)
         },
         "map_value_name": MAPS["value_name"]
     }
-    np.random.seed(seed)
+    # Batch
+    BATCH_FUNC = RandomSequence_GetBatchFunc(ENV_UPDATE_FUNC) if batch else None
+    if BATCH_FUNC is not None:
+        NOTES_DATA = BATCH_FUNC(NOTES_DATA, N)
+        if materialize: NOTES_DATA["notes"].extend(RandomSequence_MaterializeColumns(NOTES_DATA["columns"]))
+        return NOTES_DATA
     # Iterate
     for i in tqdm(range(N), disable=True):
-        ## Set new seed
-        # NOTES_DATA["env_data"]["seed"] = np.random.randint(0, 101)
         ## Generate Note
         NOTES_DATA = ENV_UPDATE_FUNC(NOTES_DATA)
 
     return NOTES_DATA
 
+def RandomSequence_GenerateChunkColumns(BATCH_FUNC, MAPS, chunk_seed, chunk_size=RANDOMSEQUENCE_CHUNK_SIZE):
+    '''
+    Random Sequence - Generate the note columns of one chunk using the batch function and the chunk's own random stream
+    '''
+    NOTES_DATA = {
+        "notes": [],
+        "env_data": {
+            "rng": np.random.default_rng(chunk_seed)
+        },
+        "map_value_name": MAPS["value_name"]
+    }
+    NOTES_DATA = BATCH_FUNC(NOTES_DATA, chunk_size)
+
+    return NOTES_DATA["columns"]
+
+def RandomSequence_GenerateNotes_Chunked(N, ENV_UPDATE_FUNC, MAPS, seed=0, PREV_NOTES=None, batch=False, materialize=True,
+    chunk_size=RANDOMSEQUENCE_CHUNK_SIZE, n_workers=1
+    ):
+    '''
+    Random Sequence - Generate Notes in chunks, each chunk using its own random stream spawned from the seed
+
+    Parameters are same as RandomSequence_GenerateNotes, and,
+    - "chunk_size": Number of notes generated from each random stream
+    - "n_workers": Number of worker processes to generate chunks in parallel
+
+    Generated notes only depend on the seed and chunk_size (not on n_workers), and for any larger N the notes generated for N are a prefix.
+    Chunks are generated in parallel only if the update function has a batch function (i.e. notes do not depend on history),
+    else they are generated one after the other with the environment data and notes passed on to the next chunk.
+    '''
+    # Init
+    N_CHUNKS = int(np.ceil(N / chunk_size))
+    CHUNK_SEEDS = RandomSequence_SpawnSeeds(seed, N_CHUNKS)
+    NOTES_DATA = {
+        "notes": list(PREV_NOTES) if PREV_NOTES is not None else [],
+        "env_data": {
+            "rng": None
+        },
+        "map_value_name": MAPS["value_name"]
+    }
+    # Batch (Full chunks are generated and the last one is clipped, so that results do not depend on N)
+    BATCH_FUNC = RandomSequence_GetBatchFunc(ENV_UPDATE_FUNC) if batch else None
+    if BATCH_FUNC is not None:
+        CHUNK_FUNC = functools.partial(RandomSequence_GenerateChunkColumns, BATCH_FUNC, MAPS, chunk_size=chunk_size)
+        if n_workers > 1 and N_CHUNKS > 1:
+            with ProcessPoolExecutor(min(n_workers, N_CHUNKS)) as EXECUTOR:
+                CHUNKS_COLUMNS = list(EXECUTOR.map(CHUNK_FUNC, CHUNK_SEEDS))
+        else:
+            CHUNKS_COLUMNS = [CHUNK_FUNC(chunk_seed) for chunk_seed in CHUNK_SEEDS]
+        COLUMNS = RandomSequence_ConcatenateColumns(CHUNKS_COLUMNS) if N_CHUNKS > 0 else {"value": np.empty(0, dtype=object)}
+        NOTES_DATA["columns"] = {k: COLUMNS[k][:N] for k in COLUMNS.keys()}
+        if materialize: NOTES_DATA["notes"].extend(RandomSequence_MaterializeColumns(NOTES_DATA["columns"]))
+        return NOTES_DATA
+    # Iterate over chunks
+    for c in range(N_CHUNKS):
+        NOTES_DATA["env_data"]["rng"] = np.random.default_rng(CHUNK_SEEDS[c])
+        for i in range(min(chunk_size, N - c*chunk_size)):
+            NOTES_DATA = ENV_UPDATE_FUNC(NOTES_DATA)
+
+    return NOTES_DATA
+
+def RandomSequence_GenerateTracks(TRACKS_N, ENV_UPDATE_FUNC, MAPS, seed=0, n_workers=1, **params):
+    '''
+    Random Sequence - Generate Notes for multiple tracks, each track using its own random streams spawned from the seed
+
+    Parameters,
+    - "TRACKS_N": Number of notes to generate for each track
+    - "n_workers": Number of worker processes to generate tracks in parallel
+    - Other parameters are same as RandomSequence_GenerateNotes_Chunked
+    '''
+    # Init
+    TRACK_SEEDS = RandomSequence_SpawnSeeds(seed, len(TRACKS_N))
+    # Generate
+    if n_workers > 1 and len(TRACKS_N) > 1:
+        with ProcessPoolExecutor(min(n_workers, len(TRACKS_N))) as EXECUTOR:
+            FUTURES = [
+                EXECUTOR.submit(RandomSequence_GenerateNotes_Chunked, TRACKS_N[t], ENV_UPDATE_FUNC, MAPS, seed=TRACK_SEEDS[t], **params)
+                for t in range(len(TRACKS_N))
+            ]
+            TRACKS_NOTES_DATA = [future.result() for future in FUTURES]
+    else:
+        TRACKS_NOTES_DATA = [
+            RandomSequence_GenerateNotes_Chunked(TRACKS_N[t], ENV_UPDATE_FUNC, MAPS, seed=TRACK_SEEDS[t], **params)
+            for t in range(len(TRACKS_N))
+        ]
+    # Remove random generators which are not needed after generation
+    for NOTES_DATA in TRACKS_NOTES_DATA: NOTES_DATA["env_data"]["rng"] = None
+
+    return TRACKS_NOTES_DATA
+
+def RandomSequence_ResumeNotes(N, ENV_UPDATE_FUNC, MAPS, seed=0, CHECKPOINT=None, batch=False, chunk_size=RANDOMSEQUENCE_CHUNK_SIZE):
+    '''
+    Random Sequence - Generate Notes resuming from a checkpoint of an earlier call with the same parameters
+
+    Generated notes are same as the ones generated by RandomSequence_GenerateNotes_Chunked for the same seed and chunk_size,
+    or by RandomSequence_GenerateNotes for the same seed if chunk_size is None (single random stream, batch is not used).
+    Returns NOTES_DATA with a "checkpoint" to pass to the next call, which has,
+    - "notes": All notes generated till now (can be more than N, as batch generation always generates full chunks)
+    - "rng_state": State of the random generator of the current chunk (None at chunk boundaries)
+    - "env_data": Environment data of the update function (without the random generator)
+    Only the notes after the checkpoint are generated, and no notes are generated if the checkpoint already has N notes.
+    Checkpoint data is never modified, so it can be cached and reused.
+    '''
+    # Init
+    if CHECKPOINT is None: CHECKPOINT = {"notes": [], "rng_state": None, "env_data": {}}
+    NOTES = list(CHECKPOINT["notes"])
+    RNG_STATE = CHECKPOINT["rng_state"]
+    ENV_DATA = copy.deepcopy(CHECKPOINT["env_data"])
+    BATCH_FUNC = RandomSequence_GetBatchFunc(ENV_UPDATE_FUNC) if batch and chunk_size is not None else None
+    # Batch (Cached notes always end at a chunk boundary)
+    if BATCH_FUNC is not None:
+        c_start = len(NOTES) // chunk_size
+        N_CHUNKS = int(np.ceil(N / chunk_size))
+        for c, chunk_seed in enumerate(RandomSequence_SpawnSeeds(seed, max(0, N_CHUNKS - c_start), start=c_start)):
+            COLUMNS = RandomSequence_GenerateChunkColumns(BATCH_FUNC, MAPS, chunk_seed, chunk_size=chunk_size)
+            NOTES.extend(RandomSequence_MaterializeColumns(COLUMNS))
+    # Iterate (Resume the random generator of the current chunk from its saved state)
+    else:
+        NOTES_DATA = {
+            "notes": NOTES,
+            "env_data": ENV_DATA,
+            "map_value_name": MAPS["value_name"]
+        }
+        ## Single random stream
+        if chunk_size is None and len(NOTES) < N:
+            RNG = np.random.default_rng(seed)
+            if RNG_STATE is not None: RNG.bit_generator.state = RNG_STATE
+            NOTES_DATA["env_data"]["rng"] = RNG
+            for i in range(N - len(NOTES)):
+                NOTES_DATA = ENV_UPDATE_FUNC(NOTES_DATA)
+            RNG_STATE = RNG.bit_generator.state
+        ## Chunked random streams
+        while chunk_size is not None and len(NOTES) < N:
+            c = len(NOTES) // chunk_size
+            RNG = np.random.default_rng(RandomSequence_SpawnSeeds(seed, 1, start=c)[0])
+            if len(NOTES) % chunk_size > 0 and RNG_STATE is not None: RNG.bit_generator.state = RNG_STATE
+            NOTES_DATA["env_data"]["rng"] = RNG
+            for i in range(min(chunk_size - len(NOTES) % chunk_size, N - len(NOTES))):
+                NOTES_DATA = ENV_UPDATE_FUNC(NOTES_DATA)
+            RNG_STATE = RNG.bit_generator.state if len(NOTES) % chunk_size > 0 else None
+        ENV_DATA = {k: v for k, v in NOTES_DATA["env_data"].items() if k != "rng"}
+    # Form checkpoint
+    NOTES_DATA = {
+        "notes": NOTES[:N],
+        "env_data": {
+            "rng": None
+        },
+        "map_value_name": MAPS["value_name"],
+        "checkpoint": {
+            "notes": NOTES,
+            "rng_state": RNG_STATE,
+            "env_data": copy.deepcopy(ENV_DATA)
+        }
+    }
+
+    return NOTES_DATA
+
+def RandomSequence_GetHistorySize(ENV_UPDATE_FUNC):
+    '''
+    Random Sequence - Get the number of previous notes the env update function needs (None if not declared, i.e. all notes)
+    '''
+    BASE_FUNC = ENV_UPDATE_FUNC.func if isinstance(ENV_UPDATE_FUNC, functools.partial) else ENV_UPDATE_FUNC
+    return NOTEGENENV_HISTORY_SIZES.get(BASE_FUNC, None)
+
+def RandomSequence_IterateNotes(ENV_UPDATE_FUNC, MAPS, N=None, seed=0, PREV_NOTES=None, batch=False,
+    batch_size=None, chunk_size=RANDOMSEQUENCE_CHUNK_SIZE
+    ):
+    '''
+    Random Sequence - Iterate Notes
+
+    Lazily yields generated notes (or lists of batch_size notes), endlessly if N is None.
+    - Notes are same as the ones generated by RandomSequence_GenerateNotes_Chunked for the same seed and chunk_size
+    - Only the previous notes declared as needed by the env update function (NOTEGENENV_HISTORY_SIZES) are kept,
+      so memory stays constant for endless generation
+    - Other parameters are same as RandomSequence_GenerateNotes_Chunked
+    '''
+    # Init
+    HISTORY_SIZE = RandomSequence_GetHistorySize(ENV_UPDATE_FUNC)
+    NOTES_DATA = {
+        "notes": deque(PREV_NOTES if PREV_NOTES is not None else [], maxlen=None if HISTORY_SIZE is None else max(1, HISTORY_SIZE)),
+        "env_data": {
+            "rng": None
+        },
+        "map_value_name": MAPS["value_name"]
+    }
+    BATCH_FUNC = RandomSequence_GetBatchFunc(ENV_UPDATE_FUNC) if batch else None
+    BATCH = []
+    c = 0
+    # Iterate over chunks
+    while N is None or c*chunk_size < N:
+        chunk_seed = RandomSequence_SpawnSeeds(seed, 1, start=c)[0]
+        chunk_n = chunk_size if N is None else min(chunk_size, N - c*chunk_size)
+        ## Generate chunk notes
+        if BATCH_FUNC is not None:
+            COLUMNS = RandomSequence_GenerateChunkColumns(BATCH_FUNC, MAPS, chunk_seed, chunk_size=chunk_size)
+            chunk_notes = RandomSequence_MaterializeColumns({k: COLUMNS[k][:chunk_n] for k in COLUMNS.keys()})
+        else:
+            NOTES_DATA["env_data"]["rng"] = np.random.default_rng(chunk_seed)
+            chunk_notes = (ENV_UPDATE_FUNC(NOTES_DATA)["notes"][-1] for i in range(chunk_n))
+        ## Yield
+        for note in chunk_notes:
+            if batch_size is None:
+                yield note
+                continue
+            BATCH.append(note)
+            if len(BATCH) == batch_size:
+                yield BATCH
+                BATCH = []
+        c += 1
+    if len(BATCH) > 0: yield BATCH
+
 # Main Vars
 NOTEGENENV_UPDATE_FUNCS = {
-    "Constant Random Distribution": NoteGenEnv_Update_ConstantRandomDistribution
+    "Constant Random Distribution": NoteGenEnv_Update_ConstantRandomDistribution,
+    "Adaptive Random Distribution": NoteGenEnv_Update_AdaptiveRandomDistribution
+}
+NOTEGENENV_BATCH_FUNCS = {
+    NoteGenEnv_Update_ConstantRandomDistribution: NoteGenEnv_Batch_ConstantRandomDistribution
+}
+NOTEGENENV_HISTORY_SIZES = {
+    NoteGenEnv_Update_ConstantRandomDistribution: 0,
+    NoteGenEnv_Update_AdaptiveRandomDistribution: 0 # Keeps its own bounded window in env_data
 }
 
 # RunCode
@@ -0,0 +1,117 @@
+"""
+Artifact Utils
+
+Content addressed store for generated files (MIDI, WAV, frames, videos)
+- Each artifact is named by the hash of the inputs it is generated from
+    - Same inputs from any session give the same path, so existing artifacts are reused without regenerating
+    - Different inputs never share a path, so concurrent sessions do not overwrite each other's files
+- Artifacts are written to a temporary path and renamed into place, so a path either does not exist or has the complete file
+- A small index (one JSON line per created artifact) records what each artifact is
+"""
+
+# Imports
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from collections.abc import Mapping
+
+# Main Vars
+ARTIFACT_STORE_DIR = "Data/Artifacts/"
+ARTIFACT_INDEX_NAME = "index.jsonl"
+ARTIFACT_INDEX_LOCK = threading.Lock()
+
+# Util Functions
+def ArtifactUtils_JSONDefault(o):
+    '''
+    Artifact Utils - Convert objects which are not JSON serializable (note views, numpy values and arrays)
+    '''
+    if isinstance(o, Mapping): return dict(o)
+    if isinstance(o, np.ndarray): return o.tolist()
+    if isinstance(o, np.generic): return o.item()
+    if isinstance(o, (set, tuple)): return list(o)
+    return repr(o)
+
+def ArtifactUtils_HashInputs(kind, inputs):
+    '''
+    Artifact Utils - Get hash of the kind and inputs of an artifact
+    '''
+    DATA = json.dumps({"kind": kind, "inputs": inputs}, sort_keys=True, default=ArtifactUtils_JSONDefault)
+    return hashlib.sha256(DATA.encode()).hexdigest()
+
+def ArtifactUtils_GetPath(key, ext, store_dir=ARTIFACT_STORE_DIR):
+    '''
+    Artifact Utils - Get path of artifact in store (artifacts are split into subdirectories by the first 2 characters of the key)
+    '''
+    return os.path.join(store_dir, key[:2], key + ext)
+
+def ArtifactUtils_GetTempPath(path):
+    '''
+    Artifact Utils - Get temporary path to write an artifact to before renaming it to its path (keeps the extension)
+    '''
+    name, ext = os.path.splitext(path)
+    return f"{name}.{os.getpid()}.{threading.get_ident()}.tmp{ext}"
+
+def ArtifactUtils_WriteAtomic(path, write_func, **write_params):
+    '''
+    Artifact Utils - Write a file by calling write_func on a temporary path and renaming it into place (partial files are removed on failure)
+    '''
+    temp_path = ArtifactUtils_GetTempPath(path)
+    try:
+        write_func(temp_path, **write_params)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path): os.remove(temp_path)
+
+# Main Functions
+def ArtifactUtils_GetArtifact(kind, inputs, ext, build_func, store_dir=ARTIFACT_STORE_DIR, **build_params):
+    '''
+    Artifact Utils - Get path of artifact for the given inputs, building it if it is not in the store
+
+    Parameters,
+    - kind : Kind of artifact (eg. "midi", "wav", "video")
+    - inputs : JSON serializable inputs the artifact is generated from (paths of other artifacts can be used as inputs)
+    - ext : Extension of artifact file
+    - build_func : Function which takes a path and writes the artifact to it
+    - store_dir : Directory of the store
+    - build_params : Other parameters passed to build_func (eg. progress bar)
+    '''
+    # Init
+    key = ArtifactUtils_HashInputs(kind, inputs)
+    path = ArtifactUtils_GetPath(key, ext, store_dir)
+    # Check store
+    if os.path.exists(path): return path
+    # Build
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ArtifactUtils_WriteAtomic(path, build_func, **build_params)
+    # Update index
+    INDEX_ENTRY = {
+        "key": key,
+        "kind": kind,
+        "path": os.path.relpath(path, store_dir),
+        "size": os.path.getsize(path),
+        "time": time.time()
+    }
+    with ARTIFACT_INDEX_LOCK:
+        with open(os.path.join(store_dir, ARTIFACT_INDEX_NAME), "a") as f:
+            f.write(json.dumps(INDEX_ENTRY) + "\n")
+
+    return path
+
+def ArtifactUtils_LoadIndex(store_dir=ARTIFACT_STORE_DIR):
+    '''
+    Artifact Utils - Load index of store as a dict of key to index entry (only artifacts still in the store)
+    '''
+    INDEX = {}
+    index_path = os.path.join(store_dir, ARTIFACT_INDEX_NAME)
+    if not os.path.exists(index_path): return INDEX
+    for line in open(index_path, "r"):
+        try:
+            ENTRY = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if os.path.exists(os.path.join(store_dir, ENTRY["path"])): INDEX[ENTRY["key"]] = ENTRY
+
+    return INDEX
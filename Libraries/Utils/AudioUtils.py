@@ -5,17 +5,23 @@ Audio Utils
 # Imports
 import io
 import os
-import pretty_midi
 import numpy as np
-from scipy.io import wavfile
+## pretty_midi and scipy are imported inside the functions that use them (slow to import)
+
+from Libraries.Utils import TraceUtils
 
 # Main Functions
-def Utils_MIDI2WAV(midi_path, save_path):
+@TraceUtils.TraceUtils_Trace()
+def Utils_MIDI2WAV(midi_path, save_path, PROGRESS_BAR=None):
     '''
-    Utils - Convert MIDI to WAV format
+    Utils - Convert MIDI to WAV format (progress is updated after synthesis and after writing)
 
     Reference: https://github.com/andfanilo/streamlit-midi-to-wav/blob/main/app.py
     '''
+    import pretty_midi
+    from scipy.io import wavfile
+
+    if PROGRESS_BAR is not None: PROGRESS_BAR.setTotal(2)
     # Read MIDI file
     midi_bytes = io.BytesIO(open(midi_path, "rb").read())
     # Convert MIDI data to WAV format
@@ -24,9 +30,12 @@ def Utils_MIDI2WAV(midi_path, save_path):
     audio_data = np.int16(
         audio_data / np.max(np.abs(audio_data)) * 32767 * 0.9
     )  # -- Normalize for 16 bit audio https://github.com/jkanner/streamlit-audio/blob/main/helper.py
+    if PROGRESS_BAR is not None: PROGRESS_BAR.next()
     virtual_file = io.BytesIO()
     wavfile.write(virtual_file, 44100, audio_data)
     virtual_file = virtual_file.read()
     # Write WAV file
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    open(save_path, "wb").write(virtual_file)
\ No newline at end of file
+    open(save_path, "wb").write(virtual_file)
+    TraceUtils.TraceUtils_SetAttributes(bytes=len(virtual_file), duration=len(audio_data) / 44100)
+    if PROGRESS_BAR is not None: PROGRESS_BAR.next()
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+GIF Utils
+
+GIF export of frame sequences with a fixed palette
+- Palette is built from the known colors of the visualisation (plus the most common other colors of a sample frame, eg. anti-aliased text)
+- Frames are quantized by lookup in a 15-bit table (RGB555 to palette index) built once per palette, instead of searching the palette
+- Each frame only encodes the bounding box of the pixels changed from the previous frame
+    - Items of the sequence giving the rect of their changed region are only quantized and compared inside that rect
+    - Unchanged pixels inside the box are written as the transparent index, so they compress into long runs
+    - Frames without changes are merged into the previous frame by extending its delay
+- Item durations of the sequence are kept as frame delays (in centiseconds), so held frames cost nothing
+"""
+
+# Imports
+import os
+import numpy as np
+## PIL is imported inside the functions that use it (slow to import)
+
+from Libraries.Utils import VideoUtils
+from Libraries.Utils import TraceUtils
+
+# Main Vars
+GIF_MAX_COLORS = 255 # One index is kept for transparency
+GIF_MIN_DELAY = 2 # Viewers slow down frames with delays below 2 centiseconds
+LUT_CACHE = {}
+LUT_CACHE_MAX = 8
+
+# Util Functions
+def GIFUtils_GetColorKeys(colors):
+    '''
+    GIFUtils - Get 24-bit keys of RGB colors (array of shape (..., 3))
+    '''
+    colors = np.asarray(colors, dtype=np.uint32)
+    return (colors[..., 0] << 16) | (colors[..., 1] << 8) | colors[..., 2]
+
+def GIFUtils_GetPalette(colors, frame=None, max_colors=GIF_MAX_COLORS):
+    '''
+    GIFUtils - Get palette (array of shape (N, 3)) of the given colors, filled up with the most common other colors of the frame
+
+    Parameters,
+    - colors : Known RGB colors (duplicates are removed, order is kept)
+    - frame : Sample frame to take more colors from (eg. the first frame, which has the anti-aliased text)
+    - max_colors : Maximum number of colors in the palette
+    '''
+    # Known colors
+    KEYS = []
+    for key in GIFUtils_GetColorKeys(np.array(colors, dtype=np.uint8).reshape(-1, 3)).tolist():
+        if key not in KEYS: KEYS.append(key)
+    KEYS = KEYS[:max_colors]
+    # Frame colors
+    if frame is not None and len(KEYS) < max_colors:
+        FRAME_KEYS, COUNTS = np.unique(GIFUtils_GetColorKeys(frame[..., :3]), return_counts=True)
+        ORDER = np.argsort(-COUNTS, kind="stable")
+        KNOWN = set(KEYS)
+        for key in FRAME_KEYS[ORDER].tolist():
+            if len(KEYS) >= max_colors: break
+            if key not in KNOWN: KEYS.append(key)
+    KEYS = np.array(KEYS, dtype=np.uint32)
+    PALETTE = np.stack([(KEYS >> 16) & 255, (KEYS >> 8) & 255, KEYS & 255], axis=-1).astype(np.uint8)
+
+    return PALETTE
+
+def GIFUtils_GetLUT(PALETTE):
+    '''
+    GIFUtils - Get lookup table from 15-bit colors (RGB555) to the index of the nearest palette color (cached)
+
+    Colors of the palette always map to their own index
+    '''
+    # Check cache
+    KEY = PALETTE.tobytes()
+    if KEY in LUT_CACHE.keys(): return LUT_CACHE[KEY]
+    # Nearest palette color of the center of each RGB555 bin
+    BINS = np.arange(32768, dtype=np.int32)
+    CENTERS = np.stack([(BINS >> 10) & 31, (BINS >> 5) & 31, BINS & 31], axis=-1).astype(np.float32) * 8 + 4
+    P = PALETTE.astype(np.float32)
+    DISTANCES = (CENTERS**2).sum(axis=1)[:, None] - 2 * CENTERS @ P.T + (P**2).sum(axis=1)[None, :]
+    LUT = np.argmin(DISTANCES, axis=1).astype(np.uint8)
+    ## Exact palette colors (first color wins if two fall in the same bin)
+    P_BINS = GIFUtils_GetBins(PALETTE)
+    LUT[P_BINS[::-1]] = np.arange(len(PALETTE), dtype=np.uint8)[::-1]
+    # Update cache
+    if len(LUT_CACHE) >= LUT_CACHE_MAX: LUT_CACHE.pop(next(iter(LUT_CACHE)))
+    LUT_CACHE[KEY] = LUT
+
+    return LUT
+
+def GIFUtils_GetBins(frame, out=None):
+    '''
+    GIFUtils - Get RGB555 bins of an RGB frame (uint16 array, written into out if given)
+    '''
+    if out is None: out = np.empty(frame.shape[:-1], dtype=np.uint16)
+    np.right_shift(frame[..., 0], 3, out=out, casting="unsafe")
+    out <<= 5
+    out |= frame[..., 1] >> 3
+    out <<= 5
+    out |= frame[..., 2] >> 3
+
+    return out
+
+def GIFUtils_QuantizeFrame(frame, LUT, out=None, bins=None):
+    '''
+    GIFUtils - Quantize RGB frame to palette indices by lookup (uint8 array, written into out if given, bins is a reused uint16 buffer)
+    '''
+    if out is None: out = np.empty(frame.shape[:2], dtype=np.uint8)
+    np.take(LUT, GIFUtils_GetBins(frame[..., :3], out=bins), out=out)
+
+    return out
+
+def GIFUtils_GetHeader(size, PALETTE, loop=0):
+    '''
+    GIFUtils - Get GIF header (screen descriptor, global color table with a transparent index after the palette and loop extension)
+    '''
+    # Color table size (power of 2, with room for the transparent index)
+    TABLE_BITS = max(1, int(np.ceil(np.log2(len(PALETTE) + 1))))
+    TABLE = np.zeros((2**TABLE_BITS, 3), dtype=np.uint8)
+    TABLE[:len(PALETTE)] = PALETTE
+    HEADER = b"GIF89a"
+    HEADER += int(size[1]).to_bytes(2, "little") + int(size[0]).to_bytes(2, "little")
+    HEADER += bytes([0x80 | (7 << 4) | (TABLE_BITS - 1), 0, 0])
+    HEADER += TABLE.tobytes()
+    ## Loop (NETSCAPE2.0 extension, 0 loops forever)
+    HEADER += b"\x21\xFF\x0BNETSCAPE2.0\x03\x01" + int(loop).to_bytes(2, "little") + b"\x00"
+
+    return HEADER
+
+# Main Functions
+@TraceUtils.TraceUtils_Trace()
+def GIFUtils_SaveFrameSequence(frames, save_path, PALETTE, duration=None, loop=0, PROGRESS_BAR=None):
+    '''
+    GIFUtils - Save Frame Sequence as GIF with a fixed palette
+
+    Frames are pulled from the sequence as the GIF is written, so the sequence is never held in memory
+
+    Parameters,
+    - frames : Frame sequence (iterable of {"frame", "duration"} items)
+    - save_path : Path to save GIF
+    - PALETTE : Palette (array of shape (N, 3), at most GIF_MAX_COLORS colors, see GIFUtils_GetPalette)
+    - duration : Duration of GIF, last frame is held till this duration (duration of sequence if None)
+    - loop : Number of times to loop (0 loops forever)
+    - PROGRESS_BAR : Progress bar updated once per item written with its start time in centiseconds (total is set from duration if given, else it is left to the caller)
+    '''
+    from PIL import Image, GifImagePlugin
+
+    # Init
+    LUT = GIFUtils_GetLUT(PALETTE)
+    TRANSPARENT = len(PALETTE)
+    STATE = {
+        "pending_start": None, # Start time (centiseconds) of the frame waiting for its delay
+        "dirty": None, # Rect (y0, y1, x0, x1) of the pending frame changed since the last written frame
+        "written": 0,
+        "frames": 0
+    }
+    BUFFERS = {}
+    if PROGRESS_BAR is not None:
+        if duration is not None: PROGRESS_BAR.setTotal(int(round(duration * 100)))
+        PROGRESS_BAR.update(0)
+    if os.path.dirname(save_path) != "": os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with open(save_path, "wb") as f:
+        # Write pending frame (only the box changed from the last written frame)
+        def GIFUtils_WritePending(end):
+            PENDING, LAST = BUFFERS["pending"], BUFFERS["last"]
+            if STATE["written"] == 0:
+                y0, y1, x0, x1 = 0, PENDING.shape[0], 0, PENDING.shape[1]
+                MASK = None
+            else:
+                DY0, DY1, DX0, DX1 = STATE["dirty"] if STATE["dirty"] is not None else (0, 1, 0, 1)
+                MASK = PENDING[DY0:DY1, DX0:DX1] != LAST[DY0:DY1, DX0:DX1]
+                ROWS, COLS = np.flatnonzero(MASK.any(axis=1)), np.flatnonzero(MASK.any(axis=0))
+                ## No change, carry the delay with a single transparent pixel
+                if len(ROWS) == 0: ROWS, COLS = np.array([0]), np.array([0])
+                MASK = MASK[ROWS[0]:ROWS[-1]+1, COLS[0]:COLS[-1]+1]
+                y0, y1, x0, x1 = DY0+ROWS[0], DY0+ROWS[-1]+1, DX0+COLS[0], DX0+COLS[-1]+1
+            CROP = PENDING[y0:y1, x0:x1].copy()
+            PARAMS = {"duration": (end - STATE["pending_start"]) * 10, "disposal": 1}
+            if MASK is not None:
+                CROP[~MASK] = TRANSPARENT
+                PARAMS["transparency"] = TRANSPARENT
+            for data in GifImagePlugin.getdata(Image.fromarray(CROP), offset=(int(x0), int(y0)), **PARAMS):
+                f.write(data)
+            LAST[y0:y1, x0:x1] = PENDING[y0:y1, x0:x1]
+            STATE["dirty"] = None
+            STATE["written"] += 1
+        # Frames
+        cur_time = 0.0
+        for item in frames:
+            start = int(round(cur_time * 100))
+            cur_time += item["duration"]
+            STATE["frames"] += 1
+            if PROGRESS_BAR is not None: PROGRESS_BAR.update(start)
+            if not item.get("changed", True): continue
+            if len(BUFFERS) == 0:
+                f.write(GIFUtils_GetHeader(item["frame"].shape[:2], PALETTE, loop=loop))
+                BUFFERS = {k: np.zeros(item["frame"].shape[:2], dtype=np.uint8) for k in ["cur", "pending", "last"]}
+                BUFFERS["bins"] = np.zeros(item["frame"].shape[:2], dtype=np.uint16)
+            ## Only the changed rect of the item is quantized (whole frame if not given)
+            RECT = item.get("rect", None)
+            if RECT is None: RECT = (0, item["frame"].shape[0], 0, item["frame"].shape[1])
+            y0, y1, x0, x1 = RECT
+            CUR = GIFUtils_QuantizeFrame(item["frame"][y0:y1, x0:x1], LUT, out=BUFFERS["cur"][y0:y1, x0:x1], bins=BUFFERS["bins"][y0:y1, x0:x1])
+            PENDING = BUFFERS["pending"][y0:y1, x0:x1]
+            ## First frame
+            if STATE["pending_start"] is None:
+                PENDING[...] = CUR
+                STATE["pending_start"] = start
+                continue
+            ## Unchanged frame (extends the pending frame)
+            if np.array_equal(CUR, PENDING): continue
+            ## Changed frame (pending frame is written, unless it is too short to be shown, then it is replaced)
+            if start - STATE["pending_start"] >= GIF_MIN_DELAY:
+                GIFUtils_WritePending(start)
+                STATE["pending_start"] = start
+            PENDING[...] = CUR
+            STATE["dirty"] = RECT if STATE["dirty"] is None else VideoUtils.VideoUtils_UnionRect(STATE["dirty"], RECT)
+        # Last frame
+        if STATE["pending_start"] is not None:
+            end = int(round((cur_time if duration is None else max(cur_time, duration)) * 100))
+            GIFUtils_WritePending(max(end, STATE["pending_start"] + GIF_MIN_DELAY))
+        f.write(b"\x3B")
+    if PROGRESS_BAR is not None: PROGRESS_BAR.close()
+    TraceUtils.TraceUtils_SetAttributes(frames=STATE["frames"], gif_frames=STATE["written"], bytes=os.path.getsize(save_path))
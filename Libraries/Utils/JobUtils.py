@@ -0,0 +1,208 @@
+"""
+Job Utils
+
+Local queue of background jobs run on worker processes
+- Jobs are identified by an ID (eg. hash of their inputs), submitting an existing job ID returns the running job
+- Jobs report progress through a progress bar object (same interface as the Streamlit ProgressBar) shared with the queue
+- Jobs are cancelled cooperatively, the job stops at its next progress update once cancelled
+- Each submission of a job has its own cancel token, so resubmitting a cancelled job never resumes its stale run
+- Jobs are reference counted by their waiters, a job is only cancelled when its last waiter leaves
+- Jobs submitted while tracing is started record their spans on the worker, which are added to the trace of the thread waiting on them
+"""
+
+# Imports
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from Libraries.Utils import TraceUtils
+
+# Main Classes
+class JobCancelledError(Exception):
+    '''
+    Job Utils - Raised inside a job when it has been cancelled
+    '''
+    pass
+
+class JobProgressBar:
+    def __init__(self, job_id, PROGRESS, CANCELLED, token=None):
+        '''
+        Job Progress Bar
+
+        Progress bar passed to jobs (same interface as the Streamlit ProgressBar)
+        - Progress is written to a dict shared with the queue
+        - Raises JobCancelledError on any update after the submission (token) of the job is cancelled
+        '''
+        self.job_id = job_id
+        self.token = job_id if token is None else token
+        self.PROGRESS = PROGRESS
+        self.CANCELLED = CANCELLED
+        self.total = 1
+        self.value = 0
+
+    def check(self):
+        if self.CANCELLED.get(self.token, False): raise JobCancelledError(self.job_id)
+
+    def setTotal(self, total):
+        self.check()
+        self.total = total
+        self.PROGRESS[self.job_id] = (self.value, self.total)
+
+    def update(self, value):
+        self.check()
+        self.value = max(0, min(value, self.total))
+        self.PROGRESS[self.job_id] = (self.value, self.total)
+
+    def next(self):
+        self.update(self.value + 1)
+
+    def back(self):
+        self.update(self.value - 1)
+
+    def close(self):
+        self.check()
+
+class JobQueue:
+    def __init__(self, n_workers=1, max_finished_jobs=64):
+        '''
+        Job Queue
+
+        Runs jobs on a pool of worker processes, jobs keep running across Streamlit reruns till they finish or are cancelled
+        - Results of the latest max_finished_jobs finished jobs are kept to be picked up
+        '''
+        CONTEXT = multiprocessing.get_context("spawn")
+        self.max_finished_jobs = max_finished_jobs
+        self.EXECUTOR = ProcessPoolExecutor(max(1, n_workers), mp_context=CONTEXT)
+        self.MANAGER = CONTEXT.Manager()
+        self.PROGRESS = self.MANAGER.dict()
+        self.CANCELLED = self.MANAGER.dict()
+        self.TRACES = self.MANAGER.dict()
+        self.JOBS = {}
+        self.LOCK = threading.Lock()
+        self.n_submitted = 0
+
+    def submit(self, job_id, func, *args, waiter=None, **kwargs):
+        '''
+        Submit job (if a job with the same ID is pending, running or done, it is returned instead)
+
+        func is called as func(*args, PROGRESS_BAR=JobProgressBar, **kwargs) on a worker process
+        waiter (eg. session and slot waiting on the job) is added to the waiters of the job, which keep it from being cancelled
+        '''
+        with self.LOCK:
+            if job_id in self.JOBS.keys() and self.status(job_id)["state"] not in ["failed", "cancelled"]:
+                if waiter is not None: self.JOBS[job_id]["waiters"].add(waiter)
+                return job_id
+            self.prune()
+            ## New cancel token for this submission (a stale run of the job stays cancelled)
+            self.n_submitted += 1
+            token = f"{job_id}#{self.n_submitted}"
+            STALE_TOKENS = self.JOBS[job_id]["tokens"] if job_id in self.JOBS.keys() else []
+            self.CANCELLED[token] = False
+            self.PROGRESS[job_id] = (0, 1)
+            self.TRACES.pop(job_id, None)
+            PROGRESS_BAR = JobProgressBar(job_id, self.PROGRESS, self.CANCELLED, token=token)
+            TRACES = self.TRACES if TraceUtils.TraceUtils_IsEnabled() else None
+            self.JOBS[job_id] = {
+                "future": self.EXECUTOR.submit(JobUtils_RunJob, job_id, func, args, kwargs, PROGRESS_BAR, TRACES),
+                "token": token,
+                "tokens": STALE_TOKENS + [token],
+                "waiters": set() if waiter is None else {waiter},
+                "time": time.time()
+            }
+
+        return job_id
+
+    def status(self, job_id):
+        '''
+        Get state ("pending", "running", "done", "failed", "cancelled" or None if not in queue) and progress (value, total) of job
+        '''
+        if job_id not in self.JOBS.keys(): return {"state": None, "progress": (0, 1)}
+        FUTURE = self.JOBS[job_id]["future"]
+        state = "pending"
+        if FUTURE.cancelled():
+            state = "cancelled"
+        elif FUTURE.done():
+            if FUTURE.exception() is None: state = "done"
+            elif isinstance(FUTURE.exception(), JobCancelledError): state = "cancelled"
+            else: state = "failed"
+        elif self.CANCELLED.get(self.JOBS[job_id]["token"], False):
+            state = "cancelled"
+        elif FUTURE.running():
+            state = "running"
+
+        return {"state": state, "progress": self.PROGRESS.get(job_id, (0, 1))}
+
+    def result(self, job_id, timeout=None):
+        '''
+        Get result of job (waits till it finishes, raises the error of the job if it failed)
+        '''
+        return self.JOBS[job_id]["future"].result(timeout=timeout)
+
+    def trace(self, job_id):
+        '''
+        Get trace events recorded by job (empty if it was not traced or has not finished)
+        '''
+        return self.TRACES.get(job_id, [])
+
+    def cancel(self, job_id, waiter=None):
+        '''
+        Cancel job (pending jobs are not started, running jobs stop at their next progress update)
+
+        If waiter is given, it is removed from the waiters of the job and the job is only cancelled if no waiters are left
+        Returns whether the job was cancelled
+        '''
+        with self.LOCK:
+            if job_id not in self.JOBS.keys(): return False
+            JOB = self.JOBS[job_id]
+            if waiter is not None:
+                JOB["waiters"].discard(waiter)
+                if len(JOB["waiters"]) > 0: return False
+            self.CANCELLED[JOB["token"]] = True
+            JOB["future"].cancel()
+
+        return True
+
+    def prune(self):
+        '''
+        Remove oldest finished jobs beyond max_finished_jobs
+        '''
+        FINISHED = sorted([k for k in self.JOBS.keys() if self.JOBS[k]["future"].done()], key=lambda k: self.JOBS[k]["time"])
+        for job_id in FINISHED[:max(0, len(FINISHED) - self.max_finished_jobs)]:
+            for token in self.JOBS.pop(job_id)["tokens"]: self.CANCELLED.pop(token, None)
+            self.PROGRESS.pop(job_id, None)
+            self.TRACES.pop(job_id, None)
+
+# Main Functions
+def JobUtils_RunJob(job_id, func, args, kwargs, PROGRESS_BAR, TRACES=None):
+    '''
+    Job Utils - Run job on worker process (records trace of the job into TRACES if given)
+    '''
+    if TRACES is None: return func(*args, PROGRESS_BAR=PROGRESS_BAR, **kwargs)
+    TraceUtils.TraceUtils_Start()
+    try:
+        with TraceUtils.TraceUtils_Span("Job", job_id=job_id):
+            return func(*args, PROGRESS_BAR=PROGRESS_BAR, **kwargs)
+    finally:
+        TRACES[job_id] = TraceUtils.TraceUtils_Stop()
+
+def JobUtils_WaitForJob(JOB_QUEUE, job_id, PROGRESS_BAR=None, poll_interval=0.25):
+    '''
+    Job Utils - Wait for job to finish, showing its progress on the progress bar, and get its result
+
+    If the wait is interrupted (eg. by a Streamlit rerun), the job keeps running and can be waited on again
+    Raises JobCancelledError if the job is cancelled
+    '''
+    while True:
+        STATUS = JOB_QUEUE.status(job_id)
+        if STATUS["state"] is None: raise KeyError(f"Job {job_id} not in queue")
+        if PROGRESS_BAR is not None:
+            PROGRESS_BAR.setTotal(max(1, STATUS["progress"][1]))
+            PROGRESS_BAR.update(STATUS["progress"][0])
+        if STATUS["state"] in ["done", "failed"]: break
+        if STATUS["state"] == "cancelled": raise JobCancelledError(job_id)
+        time.sleep(poll_interval)
+    if PROGRESS_BAR is not None: PROGRESS_BAR.close()
+    TraceUtils.TraceUtils_AddEvents(JOB_QUEUE.trace(job_id))
+
+    return JOB_QUEUE.result(job_id)
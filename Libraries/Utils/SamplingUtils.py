@@ -0,0 +1,81 @@
+"""
+Sampling Utils
+
+Samplers for drawing indices from distributions whose weights change during sampling
+"""
+
+# Imports
+import numpy as np
+
+# Main Classes
+class FenwickSampler:
+    def __init__(self, weights):
+        '''
+        Fenwick Tree Sampler
+
+        Samples index i with probability weights[i] / sum(weights)
+        - Updating a weight and sampling are both O(log k) for k weights
+        - Total weight is available in O(1)
+        - Tree is rebuilt after every k updates (O(1) amortized), so floating point drift does not accumulate
+        - If all weights are 0, indices are sampled uniformly
+        '''
+        self.weights = [float(w) for w in weights]
+        self.size = len(self.weights)
+        self.tree = [0.0] * (self.size + 1)
+        self.total = 0.0
+        self.n_updates = 0
+        self.build()
+
+    def build(self):
+        '''
+        Build the tree from the weights in O(k)
+        '''
+        self.tree = [0.0] + list(self.weights)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size: self.tree[parent] += self.tree[i]
+        self.total = sum(self.weights)
+        self.n_updates = 0
+        ## Highest power of 2 less than or equal to size (used to descend the tree while sampling)
+        self.top_bit = 1 << (self.size.bit_length() - 1) if self.size > 0 else 0
+
+    def update(self, index, weight):
+        '''
+        Set the weight of an index
+        '''
+        delta = float(weight) - self.weights[index]
+        self.weights[index] = float(weight)
+        self.total += delta
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+        # Rebuild periodically to remove accumulated floating point drift
+        self.n_updates += 1
+        if self.n_updates >= max(self.size, 64): self.build()
+
+    def find(self, value):
+        '''
+        Find the smallest index whose cumulative weight exceeds value (0 <= value < total)
+        '''
+        pos = 0
+        bit = self.top_bit
+        while bit > 0:
+            nxt = pos + bit
+            if nxt <= self.size and self.tree[nxt] <= value:
+                value -= self.tree[nxt]
+                pos = nxt
+            bit >>= 1
+        # Clamp for floating point drift at the end of the range
+        return min(pos, self.size - 1)
+
+    def sample(self, rng=None):
+        '''
+        Sample an index using the random generator (numpy.random.Generator)
+        '''
+        if rng is None: rng = np.random.default_rng()
+        # Recompute exactly in case drift hides a zero total
+        if self.total <= 0.0: self.build()
+        # Uniform fallback if all weights are 0
+        if self.total <= 0.0: return int(rng.integers(self.size))
+        return self.find(rng.random() * self.total)
@@ -0,0 +1,215 @@
+"""
+Trace Utils
+
+Lightweight tracing of pipeline stages (decompose, MIDI, synthesis, visualisation, encoding)
+- Stages are wrapped in named spans which record start time, duration and attributes (notes, frames, bytes written, peak memory)
+- Spans are only recorded on threads which have started tracing (eg. one Streamlit session or one batch worker)
+    - When tracing is not started, spans are a shared no-op object and cost a single lookup
+- Spans recorded on worker processes are returned with their results and added to the trace of the waiting thread
+- Traces can be exported as Chrome trace JSON (open in chrome://tracing or https://ui.perfetto.dev) or summarised per stage
+"""
+
+# Imports
+import os
+import sys
+import json
+import time
+import functools
+import threading
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Main Vars
+TRACE_SUMMARY_TOTALS = ["notes", "frames", "bytes"]
+TRACE_SUMMARY_MAXIMUMS = ["peak_rss_mb"]
+
+# Main Classes
+class TraceLocal(threading.local):
+    '''
+    Trace Local - Trace state of each thread (events is None when tracing is not started on the thread)
+    '''
+    events = None
+    stack = ()
+
+TRACE_LOCAL = TraceLocal()
+
+class TraceSpan:
+    def __init__(self, name, attrs):
+        '''
+        Trace Span
+
+        Records one stage as a Chrome trace complete event ("ph": "X") when it exits
+        '''
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        TRACE_LOCAL.stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        TRACE_LOCAL.stack.pop()
+        if exc_type is not None: self.attrs["error"] = exc_type.__name__
+        peak_rss = TraceUtils_GetPeakMemory()
+        if peak_rss is not None: self.attrs["peak_rss_mb"] = round(peak_rss / (1024 * 1024), 2)
+        TRACE_LOCAL.events.append({
+            "name": self.name,
+            "ph": "X",
+            "ts": self.start * 1e6,
+            "dur": (end - self.start) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": self.attrs
+        })
+        return False
+
+class TraceNullSpan:
+    '''
+    Trace Null Span - Span used when tracing is not started (does nothing)
+    '''
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+TRACE_NULL_SPAN = TraceNullSpan()
+
+# Util Functions
+def TraceUtils_GetPeakMemory():
+    '''
+    Trace Utils - Get peak resident memory of the process in bytes (None if not available on the platform)
+    '''
+    # Linux (ru_maxrss of spawned worker processes includes the peak of the parent, VmHWM does not)
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"): return int(line.split()[1]) * 1024
+    if resource is None: return None
+    # Other platforms (ru_maxrss is in bytes on macOS and in KB elsewhere)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+def TraceUtils_IsEnabled():
+    '''
+    Trace Utils - Check if tracing is started on the current thread
+    '''
+    return TRACE_LOCAL.events is not None
+
+# Main Functions
+## Recording Functions
+def TraceUtils_Start():
+    '''
+    Trace Utils - Start recording spans on the current thread (clears previously recorded spans)
+    '''
+    TRACE_LOCAL.events = []
+    TRACE_LOCAL.stack = []
+
+def TraceUtils_Stop():
+    '''
+    Trace Utils - Stop recording spans on the current thread and get the recorded events
+    '''
+    EVENTS = TRACE_LOCAL.events
+    TRACE_LOCAL.events = None
+    TRACE_LOCAL.stack = []
+
+    return EVENTS if EVENTS is not None else []
+
+def TraceUtils_GetEvents():
+    '''
+    Trace Utils - Get events recorded till now on the current thread
+    '''
+    EVENTS = TRACE_LOCAL.events
+    return list(EVENTS) if EVENTS is not None else []
+
+def TraceUtils_AddEvents(events):
+    '''
+    Trace Utils - Add events recorded elsewhere (eg. on a worker process) to the trace of the current thread
+    '''
+    if not TraceUtils_IsEnabled(): return
+    TRACE_LOCAL.events.extend(events)
+
+## Span Functions
+def TraceUtils_Span(name, **attrs):
+    '''
+    Trace Utils - Get span to wrap a stage in (use as a context manager, attributes can be added with span.set)
+    '''
+    if TRACE_LOCAL.events is None: return TRACE_NULL_SPAN
+    return TraceSpan(name, attrs)
+
+def TraceUtils_SetAttributes(**attrs):
+    '''
+    Trace Utils - Add attributes to the innermost running span of the current thread
+    '''
+    if TRACE_LOCAL.events is None or len(TRACE_LOCAL.stack) == 0: return
+    TRACE_LOCAL.stack[-1].set(**attrs)
+
+def TraceUtils_Trace(name=None):
+    '''
+    Trace Utils - Decorator to wrap every call of a function in a span (named by the function if name is None)
+    '''
+    def TraceUtils_Decorator(func):
+        span_name = func.__name__ if name is None else name
+        @functools.wraps(func)
+        def TraceUtils_Wrapper(*args, **kwargs):
+            if TRACE_LOCAL.events is None: return func(*args, **kwargs)
+            with TraceSpan(span_name, {}):
+                return func(*args, **kwargs)
+        return TraceUtils_Wrapper
+    return TraceUtils_Decorator
+
+## Export Functions
+def TraceUtils_GetChromeTrace(events):
+    '''
+    Trace Utils - Get Chrome trace JSON of events (times are relative to the first event)
+    '''
+    START = min([e["ts"] for e in events]) if len(events) > 0 else 0.0
+    TRACE = {
+        "traceEvents": [dict(e, ts=e["ts"] - START) for e in sorted(events, key=lambda e: e["ts"])],
+        "displayTimeUnit": "ms"
+    }
+
+    return json.dumps(TRACE, default=str)
+
+def TraceUtils_SaveChromeTrace(events, save_path):
+    '''
+    Trace Utils - Save events as Chrome trace JSON
+    '''
+    if os.path.dirname(save_path) != "": os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with open(save_path, "w") as f:
+        f.write(TraceUtils_GetChromeTrace(events))
+
+def TraceUtils_Summary(events):
+    '''
+    Trace Utils - Summarise events per span name (calls, total, mean and max time in ms, totals and maximums of attributes)
+
+    Rows are ordered by total time
+    '''
+    SUMMARY = {}
+    for e in events:
+        if e["name"] not in SUMMARY.keys():
+            SUMMARY[e["name"]] = {"stage": e["name"], "calls": 0, "total_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+        ROW = SUMMARY[e["name"]]
+        ROW["calls"] += 1
+        ROW["total_ms"] += e["dur"] / 1000
+        ROW["max_ms"] = max(ROW["max_ms"], e["dur"] / 1000)
+        for k in TRACE_SUMMARY_TOTALS:
+            if k in e["args"].keys(): ROW[k] = ROW.get(k, 0) + e["args"][k]
+        for k in TRACE_SUMMARY_MAXIMUMS:
+            if k in e["args"].keys(): ROW[k] = max(ROW.get(k, e["args"][k]), e["args"][k])
+    ROWS = sorted(SUMMARY.values(), key=lambda r: r["total_ms"], reverse=True)
+    for ROW in ROWS:
+        ROW["mean_ms"] = ROW["total_ms"] / ROW["calls"]
+
+    return ROWS
@@ -1,15 +1,472 @@
 """
 Video Utils
+
+Videos are encoded with PyAV (ffmpeg)
+- Encoder settings (codec, preset, CRF, threads, pixel format) are given as encoder params over ENCODER_PARAMS_DEFAULT
+- Frames are copied into one preallocated frame buffer which is encoded for every output frame
+    - The buffer is only updated when the frame sequence moves to the next item, held frames are encoded again without any copy
+- Items of frame sequences may give the rect of the region changed from the previous item, then only that region is copied into the buffer
+- With "vfr" in the encoder params, videos are encoded with a variable frame rate
+    - Each changed item of the frame sequence is encoded once, with its duration as the duration of the frame
+    - Hence encode time and file size depend on the number of drawn frames and not on the duration of the video
+- Audio already encoded with the audio codec of the encoder params (eg. .m4a files from VideoUtils_SaveAudio) is stream copied into videos
+    - Hence audio can be encoded once per track (and once for their mix) and reused by every video of it, other audio (eg. WAV) is encoded per video
 """
 
 # Imports
 import os
-import cv2
 import numpy as np
-from tqdm import tqdm
-from PIL import Image
-import matplotlib.pyplot as plt
-from moviepy.editor import AudioClip, VideoClip, ImageClip
+from fractions import Fraction
+## av and cv2 are imported inside the functions that use them (slow to import)
+
+from Libraries.Utils import TraceUtils
+
+# Main Vars
+ENCODER_PARAMS_DEFAULT = {
+    "codec": "libx264",
+    "preset": "medium", # Slower presets give smaller files for the same quality
+    "crf": 23, # Constant rate factor (lower is better quality and larger files)
+    "threads": 0, # 0 lets the encoder pick the number of threads
+    "pix_fmt": "yuv420p",
+    "vfr": False, # Variable frame rate (frames are only encoded when they change)
+    "audio_codec": "aac",
+    "audio_bitrate": 128000
+}
+VFR_TIME_BASE = 1000 # Timestamps per second of variable frame rate videos
+
+# Util Functions
+def VideoUtils_GetEncoderParams(encoder_params=None):
+    '''
+    VideoUtils - Get encoder params (given params over the defaults)
+    '''
+    ENCODER_PARAMS = dict(ENCODER_PARAMS_DEFAULT)
+    if encoder_params is not None: ENCODER_PARAMS.update(encoder_params)
+
+    return ENCODER_PARAMS
+
+def VideoUtils_GetDuration(path):
+    '''
+    VideoUtils - Get duration of audio or video file in seconds
+    '''
+    import av
+
+    with av.open(path) as CONTAINER:
+        if CONTAINER.duration is not None: return CONTAINER.duration / av.time_base
+        STREAM = CONTAINER.streams[0]
+        return float(STREAM.duration * STREAM.time_base)
+
+def VideoUtils_AddVideoStream(CONTAINER, frame_size, fps, encoder_params):
+    '''
+    VideoUtils - Add video stream to output container, with its frame buffer
+
+    Frame size is rounded up to even values as required by yuv420p (extra row/column stays black)
+    Variable frame rate streams use a fine time base and no B-frames (so decode order is display order and frame durations are kept)
+    Returns the stream, the frame buffer (numpy array of shape (H, W, 3)) and the PyAV frame sharing memory with the buffer
+    '''
+    import av
+
+    # Stream
+    H, W = frame_size[0] + frame_size[0] % 2, frame_size[1] + frame_size[1] % 2
+    STREAM = CONTAINER.add_stream(encoder_params["codec"], rate=fps)
+    STREAM.width, STREAM.height = W, H
+    STREAM.pix_fmt = encoder_params["pix_fmt"]
+    STREAM.options = {"preset": str(encoder_params["preset"]), "crf": str(encoder_params["crf"])}
+    STREAM.codec_context.thread_count = encoder_params["threads"]
+    STREAM.codec_context.thread_type = "AUTO"
+    if encoder_params["vfr"]:
+        STREAM.codec_context.time_base = Fraction(1, VFR_TIME_BASE)
+        STREAM.codec_context.max_b_frames = 0
+    # Frame Buffer
+    BUFFER = np.zeros((H, W, 3), dtype=np.uint8)
+    VIDEO_FRAME = av.VideoFrame.from_numpy_buffer(BUFFER, format="rgb24")
+
+    return STREAM, BUFFER, VIDEO_FRAME
+
+def VideoUtils_Mux(CONTAINER, packets, DURATIONS=None):
+    '''
+    VideoUtils - Mux packets into the output container (durations of packets are set from DURATIONS by pts, if given)
+    '''
+    for packet in packets:
+        if DURATIONS is not None and packet.pts in DURATIONS.keys(): packet.duration = DURATIONS.pop(packet.pts)
+        CONTAINER.mux(packet)
+
+def VideoUtils_EncodeFrame(CONTAINER, STREAM, VIDEO_FRAME, pts, duration=None, DURATIONS=None):
+    '''
+    VideoUtils - Encode the frame buffer as the frame at pts
+
+    Encoders holding references to input frames only see a converted copy of the buffer (pixel format is not rgb24)
+    Hence the buffer is copied first if the stream takes rgb24 frames as is
+    For variable frame rate streams, duration of the frame is kept in DURATIONS till its packet comes out of the encoder
+    '''
+    import av
+
+    if STREAM.pix_fmt == "rgb24": VIDEO_FRAME = av.VideoFrame.from_ndarray(VIDEO_FRAME.to_ndarray(), format="rgb24")
+    VIDEO_FRAME.pts = pts
+    if duration is not None: DURATIONS[pts] = duration
+    VideoUtils_Mux(CONTAINER, STREAM.encode(VIDEO_FRAME), DURATIONS)
+
+def VideoUtils_Flush(CONTAINER, STREAM, DURATIONS=None):
+    '''
+    VideoUtils - Flush frames buffered in the encoder of the stream
+    '''
+    VideoUtils_Mux(CONTAINER, STREAM.encode(None), DURATIONS)
+
+def VideoUtils_EncodeAudio(CONTAINER, STREAM, audio_frames, duration=None):
+    '''
+    VideoUtils - Encode audio frames into the audio stream (frames are resampled to the encoder format, stops at duration)
+    '''
+    for frame in audio_frames:
+        if duration is not None and frame.time is not None and frame.time >= duration: break
+        frame.pts = None
+        for packet in STREAM.encode(frame):
+            CONTAINER.mux(packet)
+    VideoUtils_Flush(CONTAINER, STREAM)
+
+def VideoUtils_AddAudioStream(CONTAINER, encoder_params):
+    '''
+    VideoUtils - Add audio stream to output container, encoded with the audio codec and bitrate of the encoder params
+    '''
+    STREAM = CONTAINER.add_stream(encoder_params["audio_codec"], rate=44100)
+    STREAM.bit_rate = encoder_params["audio_bitrate"]
+
+    return STREAM
+
+def VideoUtils_AddAudio(CONTAINER, audio_path, encoder_params, duration=None):
+    '''
+    VideoUtils - Add audio of file to the output container (stops at duration)
+
+    Audio already encoded with the audio codec of the encoder params is stream copied (packets are muxed as is, without decoding)
+    Other audio is decoded and encoded
+    Audio is added before the video as it is small, so the muxer does not buffer the video while interleaving
+    '''
+    import av
+
+    with av.open(audio_path) as AUDIO_CONTAINER:
+        IN_STREAM = AUDIO_CONTAINER.streams.audio[0]
+        ## Encoded audio (stream copy)
+        if IN_STREAM.codec_context.name == encoder_params["audio_codec"]:
+            STREAM = CONTAINER.add_stream_from_template(IN_STREAM)
+            for packet in AUDIO_CONTAINER.demux(IN_STREAM):
+                if packet.dts is None: continue # Flush packet of the demuxer
+                if duration is not None and packet.pts is not None and packet.pts * packet.time_base >= duration: break
+                packet.stream = STREAM
+                CONTAINER.mux(packet)
+        ## Other audio (encode)
+        else:
+            STREAM = VideoUtils_AddAudioStream(CONTAINER, encoder_params)
+            VideoUtils_EncodeAudio(CONTAINER, STREAM, AUDIO_CONTAINER.decode(IN_STREAM), duration=duration)
+
+def VideoUtils_GetMixedAudioFrame(audio_paths, rate=44100):
+    '''
+    VideoUtils - Get audio of files mixed into one audio frame (samples are summed and clipped, None if no file has audio)
+    '''
+    import av
+
+    AUDIOS = [VideoUtils_LoadAudio(path, rate=rate) for path in audio_paths]
+    AUDIOS = [a for a in AUDIOS if a is not None]
+    if len(AUDIOS) == 0: return None
+    AUDIO_MIX = np.zeros((2, max([a.shape[1] for a in AUDIOS])), dtype=np.float32)
+    for a in AUDIOS: AUDIO_MIX[:, :a.shape[1]] += a
+    np.clip(AUDIO_MIX, -1.0, 1.0, out=AUDIO_MIX)
+    AUDIO_FRAME = av.AudioFrame.from_ndarray(AUDIO_MIX, format="fltp", layout="stereo")
+    AUDIO_FRAME.sample_rate = rate
+
+    return AUDIO_FRAME
+
+def VideoUtils_UnionRect(rect, other):
+    '''
+    VideoUtils - Get rect (y0, y1, x0, x1) covering both rects (None stands for the whole frame)
+    '''
+    if rect is None or other is None: return None
+    return (min(rect[0], other[0]), max(rect[1], other[1]), min(rect[2], other[2]), max(rect[3], other[3]))
+
+def VideoUtils_CopyFrame(BUFFER, frame, rect=None):
+    '''
+    VideoUtils - Copy the region of frame inside rect (y0, y1, x0, x1) into the buffer (whole frame if rect is None)
+    '''
+    if rect is None:
+        BUFFER[:frame.shape[0], :frame.shape[1]] = frame
+        return
+    y0, y1, x0, x1 = rect
+    BUFFER[y0:y1, x0:x1] = frame[y0:y1, x0:x1]
+
+def VideoUtils_GetFrameDelta(frame, rect):
+    '''
+    VideoUtils - Get frame delta {"rect": (y0, y1, x0, x1), "patch": copy of the region of frame inside rect}
+
+    Frame deltas stand for a frame which only differs from the previous frame inside rect (see VideoUtils_FrameSequence_FromNoteFrames)
+    '''
+    y0, y1, x0, x1 = rect
+    return {"rect": (y0, y1, x0, x1), "patch": frame[y0:y1, x0:x1].copy()}
 
 
 # Main Functions
+## Frame Sequence Functions
+def VideoUtils_FrameSequence_FromNoteFrames(notes, notes_frames, duration=None, initial_frame=None):
+    '''
+    VideoUtils - Form Frame Sequence from Note Frames
+
+    A frame sequence is an iterable of items {"frame": frame, "duration": duration in seconds} shown one after another
+    - Frames are only valid till the next item is taken from the sequence (visualisers may reuse the same buffer)
+    - Items may have "changed": False when their frame is the same as the previous one (consumers can then skip comparing or encoding it)
+    - Items may have "rect": (y0, y1, x0, x1) when their frame only differs from the previous one inside rect (consumers can then only copy or compare that region)
+
+    Frame deltas (see VideoUtils_GetFrameDelta) are applied onto one reused canvas, which is given as the frame of their items with the rect of the delta
+
+    Parameters,
+    - notes : Notes visualised (delay gives the start of each note relative to the previous note)
+    - notes_frames : List of frames for each note (notes with no frames are skipped), frames after the first frame of a note may be frame deltas
+    - duration : Total duration, last frame is held till this duration (if given)
+    - initial_frame : Frame shown before the first note (first frame of first note if None)
+    '''
+    # Form final notes (clean overlapping notes)
+    NOTES_FINAL = []
+    NOTES_FRAMES_FINAL = []
+    for i in range(len(notes)):
+        cur_note = {
+            "note": notes[i]["note"],
+            "delay": notes[i]["delay"],
+            "duration": notes[i]["duration"] if i == len(notes)-1 else notes[i+1]["delay"]
+        }
+        ## If cur note starts at same time as previous note (delay = 0)
+        if len(notes_frames[i]) > 0:
+            NOTES_FINAL.append(cur_note)
+            NOTES_FRAMES_FINAL.append(notes_frames[i])
+    notes = NOTES_FINAL
+    notes_frames = NOTES_FRAMES_FINAL
+    # Initial Frame
+    if notes[0]["delay"] > 0:
+        if initial_frame is None: initial_frame = notes_frames[0][0]
+        yield {"frame": initial_frame, "duration": notes[0]["delay"]}
+    # Iterate over notes (full frames are only copied into the canvas when frame deltas follow them)
+    CANVAS = np.zeros(notes_frames[0][0].shape, dtype=notes_frames[0][0].dtype)
+    LAST_FRAME = notes_frames[0][0]
+    cur_time = 0
+    for i in range(len(notes)):
+        note_frame_duration = notes[i]["duration"] / len(notes_frames[i])
+        for j in range(len(notes_frames[i])):
+            FRAME = notes_frames[i][j]
+            if isinstance(FRAME, dict):
+                y0, y1, x0, x1 = FRAME["rect"]
+                CANVAS[y0:y1, x0:x1] = FRAME["patch"]
+                LAST_FRAME = CANVAS
+                yield {"frame": CANVAS, "duration": note_frame_duration, "rect": FRAME["rect"]}
+            else:
+                if j+1 < len(notes_frames[i]) and isinstance(notes_frames[i][j+1], dict): CANVAS[...] = FRAME
+                LAST_FRAME = FRAME
+                yield {"frame": FRAME, "duration": note_frame_duration}
+        cur_time += notes[i]["duration"]
+    # Final Frames
+    if duration is not None and cur_time < duration:
+        yield {"frame": LAST_FRAME, "duration": duration - cur_time, "changed": False}
+
+@TraceUtils.TraceUtils_Trace()
+def VideoUtils_SaveFrameSequence(frames, save_path, duration=None, audio_path=None, fps=24, encoder_params=None, PROGRESS_BAR=None):
+    '''
+    VideoUtils - Save Frame Sequence (with Audio) as Video
+
+    Frames are pulled from the sequence only as the video is encoded, so the sequence is never held in memory
+
+    Parameters,
+    - frames : Frame sequence (iterable of {"frame", "duration"} items)
+    - save_path : Path to save video
+    - duration : Duration of video (duration of audio if None, audio is required then)
+    - audio_path : Path of audio to add to the video (no audio if None, stream copied if already encoded, see VideoUtils_AddAudio)
+    - fps : Frames per second of video
+    - encoder_params : Encoder settings over ENCODER_PARAMS_DEFAULT (codec, preset, crf, threads, pix_fmt, vfr, audio_codec, audio_bitrate)
+    - PROGRESS_BAR : Progress bar updated once per item encoded (total is the number of frames at fps)
+    '''
+    import av
+
+    # Init
+    ENCODER_PARAMS = VideoUtils_GetEncoderParams(encoder_params)
+    if duration is None: duration = VideoUtils_GetDuration(audio_path)
+    N_FRAMES = max(1, int(round(duration * fps)))
+    END_PTS = max(1, int(round(duration * VFR_TIME_BASE)))
+    FRAMES_ITER = iter(frames)
+    CUR_ITEM = {
+        "item": next(FRAMES_ITER),
+        "end": 0.0
+    }
+    CUR_ITEM["end"] = CUR_ITEM["item"]["duration"]
+    FRAME_H, FRAME_W = CUR_ITEM["item"]["frame"].shape[:2]
+    if PROGRESS_BAR is not None:
+        PROGRESS_BAR.setTotal(N_FRAMES)
+        PROGRESS_BAR.update(0)
+    if os.path.dirname(save_path) != "": os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with av.open(save_path, "w") as CONTAINER:
+        # Streams
+        VIDEO_STREAM, BUFFER, VIDEO_FRAME = VideoUtils_AddVideoStream(CONTAINER, (FRAME_H, FRAME_W), fps, ENCODER_PARAMS)
+        if audio_path is not None: VideoUtils_AddAudio(CONTAINER, audio_path, ENCODER_PARAMS, duration=duration)
+        # Frames (buffer is updated only when the sequence moves to the next item)
+        VideoUtils_CopyFrame(BUFFER, CUR_ITEM["item"]["frame"])
+        if ENCODER_PARAMS["vfr"]:
+            ## Variable frame rate (buffer is encoded when the next changed item starts, which gives its duration)
+            DURATIONS = {}
+            pending_pts = 0
+            N_FRAMES = 1
+            for item in FRAMES_ITER:
+                start_pts = int(round(CUR_ITEM["end"] * VFR_TIME_BASE))
+                CUR_ITEM["end"] += item["duration"]
+                if start_pts >= END_PTS: break
+                if PROGRESS_BAR is not None: PROGRESS_BAR.update(int(CUR_ITEM["end"] * fps))
+                if not item.get("changed", True): continue
+                if start_pts > pending_pts:
+                    VideoUtils_EncodeFrame(CONTAINER, VIDEO_STREAM, VIDEO_FRAME, pending_pts, duration=start_pts - pending_pts, DURATIONS=DURATIONS)
+                    pending_pts = start_pts
+                    N_FRAMES += 1
+                VideoUtils_CopyFrame(BUFFER, item["frame"], item.get("rect", None))
+            VideoUtils_EncodeFrame(CONTAINER, VIDEO_STREAM, VIDEO_FRAME, pending_pts, duration=END_PTS - pending_pts, DURATIONS=DURATIONS)
+            VideoUtils_Flush(CONTAINER, VIDEO_STREAM, DURATIONS)
+        else:
+            ## Constant frame rate (items skipped between two output frames only add their rect to the region copied)
+            for i in range(N_FRAMES):
+                t = i / fps + 1e-6 # Tolerance for rounding errors in the summed item durations
+                item, changed, rect = None, False, None
+                while t >= CUR_ITEM["end"]:
+                    next_item = next(FRAMES_ITER, None)
+                    if next_item is None: break
+                    item = next_item
+                    CUR_ITEM["end"] += item["duration"]
+                    if item.get("changed", True):
+                        rect = VideoUtils_UnionRect(rect, item.get("rect", None)) if changed else item.get("rect", None)
+                        changed = True
+                if changed:
+                    CUR_ITEM["item"] = item
+                    VideoUtils_CopyFrame(BUFFER, item["frame"], rect)
+                VideoUtils_EncodeFrame(CONTAINER, VIDEO_STREAM, VIDEO_FRAME, i)
+                if PROGRESS_BAR is not None: PROGRESS_BAR.update(i + 1)
+            VideoUtils_Flush(CONTAINER, VIDEO_STREAM)
+    if PROGRESS_BAR is not None: PROGRESS_BAR.close()
+    TraceUtils.TraceUtils_SetAttributes(frames=N_FRAMES, duration=duration, bytes=os.path.getsize(save_path))
+
+def VideoUtils_LoadAudio(path, rate=44100):
+    '''
+    VideoUtils - Load audio of file as float32 stereo samples of shape (2, N) (None if the file has no audio)
+    '''
+    import av
+
+    with av.open(path) as CONTAINER:
+        if len(CONTAINER.streams.audio) == 0: return None
+        RESAMPLER = av.AudioResampler(format="fltp", layout="stereo", rate=rate)
+        CHUNKS = []
+        for frame in CONTAINER.decode(audio=0):
+            CHUNKS.extend([f.to_ndarray() for f in RESAMPLER.resample(frame)])
+        CHUNKS.extend([f.to_ndarray() for f in RESAMPLER.resample(None)])
+    if len(CHUNKS) == 0: return None
+
+    return np.concatenate(CHUNKS, axis=1)
+
+@TraceUtils.TraceUtils_Trace()
+def VideoUtils_SaveAudio(audio_paths, save_path, encoder_params=None):
+    '''
+    VideoUtils - Encode audio of files (mixed if more than one) into an audio file (eg. .m4a) which can be stream copied into videos
+
+    Parameters,
+    - audio_paths : Paths of audio (or video) files
+    - save_path : Path to save encoded audio
+    - encoder_params : Encoder settings over ENCODER_PARAMS_DEFAULT (only audio_codec and audio_bitrate are used)
+    '''
+    import av
+
+    # Init
+    ENCODER_PARAMS = VideoUtils_GetEncoderParams(encoder_params)
+    if os.path.dirname(save_path) != "": os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with av.open(save_path, "w") as CONTAINER:
+        STREAM = VideoUtils_AddAudioStream(CONTAINER, ENCODER_PARAMS)
+        ## Single file (decoded as it is encoded)
+        if len(audio_paths) == 1:
+            with av.open(audio_paths[0]) as AUDIO_CONTAINER:
+                VideoUtils_EncodeAudio(CONTAINER, STREAM, AUDIO_CONTAINER.decode(audio=0))
+        ## Mixed files
+        else:
+            AUDIO_FRAME = VideoUtils_GetMixedAudioFrame(audio_paths)
+            VideoUtils_EncodeAudio(CONTAINER, STREAM, [AUDIO_FRAME] if AUDIO_FRAME is not None else [])
+    TraceUtils.TraceUtils_SetAttributes(files=len(audio_paths), bytes=os.path.getsize(save_path))
+
+@TraceUtils.TraceUtils_Trace()
+def VideoUtils_CombineVideos(video_paths, save_path, compress_size=True, fps=24, encoder_params=None, audio_path=None):
+    '''
+    VideoUtils - Combine Videos into a grid (audio of the videos is mixed, video lasts as long as the longest video)
+
+    Parameters,
+    - video_paths : Paths of videos to combine
+    - save_path : Path to save combined video
+    - compress_size : Whether to scale down each video by the number of columns (so the grid is as wide as one video)
+    - fps : Frames per second of combined video
+    - encoder_params : Encoder settings over ENCODER_PARAMS_DEFAULT
+    - audio_path : Path of audio to use instead of mixing the audio of the videos (eg. mix already encoded by VideoUtils_SaveAudio, which is stream copied)
+    '''
+    import av
+    import cv2
+
+    # Init
+    ENCODER_PARAMS = VideoUtils_GetEncoderParams(encoder_params)
+    N = len(video_paths)
+    N_ROWS = int(N ** (0.5))
+    N_COLS = int(np.ceil(N / N_ROWS))
+    SCALE = 1 / N_COLS if compress_size else 1
+    INPUTS = [av.open(path) for path in video_paths]
+    try:
+        DURATION = max([VideoUtils_GetDuration(path) for path in video_paths])
+        N_FRAMES = max(1, int(round(DURATION * fps)))
+        SIZES = [(max(1, int(c.streams.video[0].height * SCALE)), max(1, int(c.streams.video[0].width * SCALE))) for c in INPUTS]
+        CELL_SIZE = (max([s[0] for s in SIZES]), max([s[1] for s in SIZES]))
+        CELLS = []
+        for vi in range(N):
+            CELL = {
+                "frames": INPUTS[vi].decode(video=0),
+                "size": SIZES[vi],
+                "pos": ((vi // N_COLS) * CELL_SIZE[0], (vi % N_COLS) * CELL_SIZE[1])
+            }
+            CELL["next"] = next(CELL["frames"], None)
+            CELLS.append(CELL)
+        # Mixed Audio (only if no audio is given)
+        AUDIO_FRAME = VideoUtils_GetMixedAudioFrame(video_paths) if audio_path is None else None
+        if os.path.dirname(save_path) != "": os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        with av.open(save_path, "w") as CONTAINER:
+            # Streams
+            VIDEO_STREAM, BUFFER, VIDEO_FRAME = VideoUtils_AddVideoStream(CONTAINER, (CELL_SIZE[0]*int(np.ceil(N / N_COLS)), CELL_SIZE[1]*N_COLS), fps, ENCODER_PARAMS)
+            if audio_path is not None:
+                VideoUtils_AddAudio(CONTAINER, audio_path, ENCODER_PARAMS)
+            elif AUDIO_FRAME is not None:
+                AUDIO_STREAM = VideoUtils_AddAudioStream(CONTAINER, ENCODER_PARAMS)
+                VideoUtils_EncodeAudio(CONTAINER, AUDIO_STREAM, [AUDIO_FRAME])
+            # Frames (each cell is redrawn only when its video moves to its next frame)
+            DURATIONS = {} if ENCODER_PARAMS["vfr"] else None
+            pending_pts = None
+            N_ENCODED = 0
+            for i in range(N_FRAMES):
+                t = i / fps + 1e-6
+                UPDATES = []
+                for CELL in CELLS:
+                    frame = None
+                    while CELL["next"] is not None and CELL["next"].time <= t:
+                        frame = CELL["next"]
+                        CELL["next"] = next(CELL["frames"], None)
+                    if frame is not None: UPDATES.append((CELL, frame))
+                ## Variable frame rate (buffer is encoded when any cell changes, which gives its duration)
+                if ENCODER_PARAMS["vfr"]:
+                    pts = int(round(i / fps * VFR_TIME_BASE))
+                    if pending_pts is not None:
+                        if len(UPDATES) == 0: continue
+                        VideoUtils_EncodeFrame(CONTAINER, VIDEO_STREAM, VIDEO_FRAME, pending_pts, duration=pts - pending_pts, DURATIONS=DURATIONS)
+                        N_ENCODED += 1
+                    pending_pts = pts
+                for CELL, frame in UPDATES:
+                    y, x = CELL["pos"]
+                    h, w = CELL["size"]
+                    FRAME = frame.to_ndarray(format="rgb24")
+                    if FRAME.shape[:2] != (h, w): FRAME = cv2.resize(FRAME, (w, h), interpolation=cv2.INTER_AREA)
+                    BUFFER[y:y+h, x:x+w] = FRAME
+                if not ENCODER_PARAMS["vfr"]:
+                    VideoUtils_EncodeFrame(CONTAINER, VIDEO_STREAM, VIDEO_FRAME, i)
+                    N_ENCODED += 1
+            if ENCODER_PARAMS["vfr"]:
+                END_PTS = max(pending_pts + 1, int(round(DURATION * VFR_TIME_BASE)))
+                VideoUtils_EncodeFrame(CONTAINER, VIDEO_STREAM, VIDEO_FRAME, pending_pts, duration=END_PTS - pending_pts, DURATIONS=DURATIONS)
+                N_ENCODED += 1
+            VideoUtils_Flush(CONTAINER, VIDEO_STREAM, DURATIONS)
+    finally:
+        for c in INPUTS: c.close()
+    TraceUtils.TraceUtils_SetAttributes(videos=N, frames=N_ENCODED, bytes=os.path.getsize(save_path))
@@ -3,16 +3,35 @@ Visualiser Library - Circle Bouncer
 """
 
 # Imports
-import os
-import cv2
 import json
+import inspect
 import numpy as np
-import matplotlib.pyplot as plt
-from moviepy.editor import VideoFileClip, AudioFileClip, ImageClip, concatenate_videoclips, clips_array
+## cv2 and matplotlib are imported inside the functions that use them (slow to import)
+
+from Libraries.Utils import VideoUtils
+from Libraries.Utils import GIFUtils
+from Libraries.Utils import TraceUtils
 
 # Main Vars
-CMAPS = sorted(list(plt.cm._colormaps))
 CMAP_DEFAULT = "rainbow"
+PROXY_PARAMS = {
+    "size": 128,
+    "fps": 8
+}
+NOTE_COLORS_CACHE = {}
+NOTE_DIRECTIONS_CACHE = {}
+BASE_LAYERS_CACHE = {}
+LAYERS_CACHE_MAX = 16
+
+def __getattr__(name):
+    '''
+    Circle Bouncer - Lazy module attributes (CMAPS is built from the matplotlib colormap registry on first access)
+    '''
+    if name == "CMAPS":
+        import matplotlib
+        globals()["CMAPS"] = sorted(list(matplotlib.colormaps))
+        return globals()["CMAPS"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Util Functions
 def Util_Hex2RGB(hex):
@@ -35,98 +54,164 @@ def Util_GetTuplePoint(x):
     '''
     return (int(x[0]), int(x[1]))
 
-def VideoUtils_SaveVisualisationVideo(notes, notes_frames, audio_path, save_path, fps=24, initial_frame=None):
+def Util_GetPointsRect(points, pad, frame_size):
     '''
-    VideoUtils - Save Note Frames with Audio as Visualisation Video
+    Util - Get rect (y0, y1, x0, x1) around (x, y) points with padding, clipped to the frame size
     '''
-    # Init
-    AUDIO = AudioFileClip(audio_path)
-    DURATION = AUDIO.duration
-    FRAMES = []
-    FRAMES_INFO = []
-    # Form final notes (clean overlapping notes)
-    NOTES_FINAL = []
-    NOTES_FRAMES_FINAL = []
-    for i in range(len(notes)):
-        cur_note = {
-            "note": notes[i]["note"],
-            "delay": notes[i]["delay"],
-            "duration": notes[i]["duration"] if i == len(notes)-1 else notes[i+1]["delay"]
-        }
-        ## If cur note starts at same time as previous note (delay = 0)
-        if len(notes_frames[i]) > 0:
-            NOTES_FINAL.append(cur_note)
-            NOTES_FRAMES_FINAL.append(notes_frames[i])
-    notes = NOTES_FINAL
-    notes_frames = NOTES_FRAMES_FINAL
-    # Initial Frame
-    if notes[0]["delay"] > 0:
-        if initial_frame is None: initial_frame = np.copy(notes_frames[0][0])
-        initial_frame_clip = ImageClip(initial_frame).set_duration(notes[0]["delay"])
-        FRAMES.append(initial_frame_clip)
-        FRAMES_INFO.append({
-            "type": "initial",
-            "note": notes[0]["note"],
-            "duration": notes[0]["delay"]
-        })
-    # Iterate over notes
-    cur_time = 0
-    for i in range(len(notes)):
-        note_frame_duration = notes[i]["duration"] / len(notes_frames[i])
-        for j in range(len(notes_frames[i])):
-            frame_clip = ImageClip(notes_frames[i][j]).set_duration(note_frame_duration)
-            FRAMES.append(frame_clip)
-            FRAMES_INFO.append({
-                "type": "note",
-                "note": notes[i]["note"],
-                "duration": note_frame_duration,
-                "video_duration": FRAMES[-1].duration
-            })
-        cur_time += notes[i]["duration"]
-    # Final Frames
-    if cur_time < DURATION:
-        final_frame_clip = ImageClip(notes_frames[-1][-1]).set_duration(DURATION - cur_time)
-        FRAMES.append(final_frame_clip)
-        FRAMES_INFO.append({
-            "type": "final",
-            "note": notes[-1]["note"],
-            "duration": DURATION - cur_time,
-            "video_duration": FRAMES[-1].duration
-        })
-    # Concatenate
-    VIDEO = concatenate_videoclips(FRAMES, method="chain")
-    # Set Audio
-    VIDEO = VIDEO.set_audio(AUDIO)
+    XS = [int(p[0]) for p in points]
+    YS = [int(p[1]) for p in points]
+    return (
+        max(0, min(YS)-pad), min(frame_size[0], max(YS)+pad+1),
+        max(0, min(XS)-pad), min(frame_size[1], max(XS)+pad+1)
+    )
+
+def VideoUtils_SaveVisualisationVideo(notes, notes_frames, audio_path, save_path, fps=24, initial_frame=None, encoder_params=None, PROGRESS_BAR=None):
+    '''
+    VideoUtils - Save Note Frames with Audio as Visualisation Video (video lasts as long as the audio, last frame is held till the end)
+    '''
+    # Form Frame Sequence
+    FRAMES = VideoUtils.VideoUtils_FrameSequence_FromNoteFrames(notes, notes_frames, initial_frame=initial_frame)
     # Write Video
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    VIDEO.write_videofile(save_path, fps=fps)
+    VideoUtils.VideoUtils_SaveFrameSequence(FRAMES, save_path, audio_path=audio_path, fps=fps, encoder_params=encoder_params, PROGRESS_BAR=PROGRESS_BAR)
 
-def VideoUtils_CombineVisualisationVideos(video_paths, save_path, compress_size=True, fps=24):
+def VideoUtils_CombineVisualisationVideos(video_paths, save_path, compress_size=True, fps=24, encoder_params=None, audio_path=None):
     '''
-    VideoUtils - Combine Visualisation Videos
+    VideoUtils - Combine Visualisation Videos into a grid (see VideoUtils.VideoUtils_CombineVideos)
     '''
-    # Init
-    N = len(video_paths)
-    N_ROWS = int(N ** (0.5))
-    N_COLS = int(np.ceil(N / N_ROWS))
-    VIDEO_GRID = []
-    # Combine Videos
-    for vi in range(N):
-        VIDEO_CLIP = VideoFileClip(video_paths[vi])
-        if compress_size: VIDEO_CLIP = VIDEO_CLIP.resize(1/N_COLS)
-        if vi % N_COLS == 0:
-            VIDEO_GRID.append([VIDEO_CLIP])
-        else:
-            VIDEO_GRID[-1].append(VIDEO_CLIP)
-    COMBINED_VIDEO = clips_array(VIDEO_GRID)
-    # Save Combined Video
-    COMBINED_VIDEO.write_videofile(save_path, fps=fps)
+    VideoUtils.VideoUtils_CombineVideos(video_paths, save_path, compress_size=compress_size, fps=fps, encoder_params=encoder_params, audio_path=audio_path)
 
 # Main Functions
+## Layer Functions
+def CircleBouncer_GetNoteColors(UNIQUE_NOTES, fade_params, sizes, colors):
+    '''
+    Circle Bouncer - Get colors of notes with their faded colors (cached, as they do not depend on the frame size or the notes played)
+    '''
+    import matplotlib
+
+    # Check cache
+    KEY = json.dumps([list(UNIQUE_NOTES), fade_params, sizes["circle"]["thickness"], colors], sort_keys=True, default=str)
+    if KEY in NOTE_COLORS_CACHE.keys(): return NOTE_COLORS_CACHE[KEY]
+    # Set Note Colors
+    NOTE_COLORS = {
+        "fade_threshold": fade_params["threshold"],
+        "background": Util_Hex2RGB(colors["circle"]) if sizes["circle"]["thickness"] == -1 else Util_Hex2RGB("#000000"),
+        "cmap_list": np.array(matplotlib.colormaps[colors["note"]["cmap"]](np.linspace(0, 1, len(UNIQUE_NOTES)))[:, :3]*255, dtype=int).tolist()
+    }
+    NOTE_COLORS["color_map"] = {
+        UNIQUE_NOTES[i]: tuple(NOTE_COLORS["cmap_list"][i])
+        for i in range(len(UNIQUE_NOTES))
+    }
+    NOTE_COLORS["color_map_withfade"] = {}
+    bg_color = np.array(NOTE_COLORS["background"])
+    for un in UNIQUE_NOTES:
+        NOTE_COLORS["color_map_withfade"][un] = []
+        if fade_params["threshold"] > 0:
+            note_color = np.array(NOTE_COLORS["color_map"][un])
+            for itd in range(fade_params["threshold"]):
+                cur_faded_color = note_color
+                if fade_params["type"] == "linear":
+                    cur_faded_color = (itd*bg_color + (fade_params["threshold"]-itd)*note_color) / fade_params["threshold"]
+                    cur_faded_color = np.array(np.round(cur_faded_color, 0), dtype=np.uint8)
+                cur_faded_color = tuple(cur_faded_color.tolist())
+                NOTE_COLORS["color_map_withfade"][un].append(cur_faded_color)
+    # Update cache
+    if len(NOTE_COLORS_CACHE) >= LAYERS_CACHE_MAX: NOTE_COLORS_CACHE.pop(next(iter(NOTE_COLORS_CACHE)))
+    NOTE_COLORS_CACHE[KEY] = NOTE_COLORS
+
+    return NOTE_COLORS
+
+def CircleBouncer_GetNoteDirections(UNIQUE_NOTES):
+    '''
+    Circle Bouncer - Get unit directions (cos, sin) of the note markers around the circle (cached, as they do not depend on the frame size)
+
+    Base layers of all frame sizes (eg. proxy and full renders) scale these directions by their circle
+    '''
+    # Check cache
+    KEY = json.dumps(list(UNIQUE_NOTES), default=str)
+    if KEY in NOTE_DIRECTIONS_CACHE.keys(): return NOTE_DIRECTIONS_CACHE[KEY]
+    # Directions
+    theta = (np.pi*2) / max(1, len(UNIQUE_NOTES))
+    NOTE_DIRECTIONS = [(np.cos(theta*i), np.sin(theta*i)) for i in range(len(UNIQUE_NOTES))]
+    # Update cache
+    if len(NOTE_DIRECTIONS_CACHE) >= LAYERS_CACHE_MAX: NOTE_DIRECTIONS_CACHE.pop(next(iter(NOTE_DIRECTIONS_CACHE)))
+    NOTE_DIRECTIONS_CACHE[KEY] = NOTE_DIRECTIONS
+
+    return NOTE_DIRECTIONS
+
+def CircleBouncer_GetBaseLayer(UNIQUE_NOTES, frame_size, show_text, sizes, colors, NOTE_COLORS):
+    '''
+    Circle Bouncer - Get base layer with the circle and note markers drawn and the positions of the notes (cached, as it does not depend on the notes played)
+
+    The base layer image is read only, visualise modes draw on copies of it
+    Image and positions depend on the frame size, note colors and directions are shared by all frame sizes
+    '''
+    import cv2
+
+    # Check cache
+    KEY = json.dumps([list(UNIQUE_NOTES), list(frame_size), show_text, sizes, colors], sort_keys=True, default=str)
+    if KEY in BASE_LAYERS_CACHE.keys(): return BASE_LAYERS_CACHE[KEY]
+    # Init
+    I = np.zeros((frame_size[0], frame_size[1], 3), dtype=np.uint8)
+    UNIQUE_NOTES_DATA = {k: {} for k in UNIQUE_NOTES}
+    MIN_FRAME_SIZE = min(frame_size[0], frame_size[1])
+    # Draw initial circle
+    GAP = int(MIN_FRAME_SIZE*sizes["gap"]/2) # Gap between radius of circle and size of frame
+    CIRCLE_PARAMS = {
+        "center": (int(frame_size[0]/2), int(frame_size[1]/2)),
+        "radius": int(min(frame_size[0], frame_size[1])/2 - GAP),
+        "color": Util_Hex2RGB(colors["circle"]),
+        "thickness": max(1, int(MIN_FRAME_SIZE*sizes["circle"]["thickness"]))
+    }
+    I = cv2.circle(
+        I, CIRCLE_PARAMS["center"], CIRCLE_PARAMS["radius"],
+        CIRCLE_PARAMS["color"], CIRCLE_PARAMS["thickness"]
+    )
+    I = np.array(I, dtype=np.uint8)
+    ## Draw unique notes
+    TEXT_PARAMS = {
+        "font": cv2.FONT_HERSHEY_SIMPLEX,
+        "font_scale": MIN_FRAME_SIZE*sizes["text"]["scale"],
+        "thickness": 0
+    }
+    NOTE_DIRECTIONS = CircleBouncer_GetNoteDirections(UNIQUE_NOTES)
+    for i in range(len(UNIQUE_NOTES)):
+        point = (
+            CIRCLE_PARAMS["center"][0] + CIRCLE_PARAMS["radius"]*NOTE_DIRECTIONS[i][0],
+            CIRCLE_PARAMS["center"][1] + CIRCLE_PARAMS["radius"]*NOTE_DIRECTIONS[i][1]
+        )
+        if show_text:
+            TEXT_PARAMS["color"] = NOTE_COLORS["color_map"][UNIQUE_NOTES[i]]
+            I = cv2.putText(
+                I, str(UNIQUE_NOTES[i]), Util_GetTuplePoint(point),
+                TEXT_PARAMS["font"], TEXT_PARAMS["font_scale"],
+                TEXT_PARAMS["color"], TEXT_PARAMS["thickness"], cv2.LINE_AA
+            )
+            I = np.array(I, dtype=np.uint8)
+        UNIQUE_NOTES_DATA[UNIQUE_NOTES[i]] = {
+            "index": i,
+            "position": point
+        }
+    I.flags.writeable = False
+    BASE_LAYER = {
+        "I": I,
+        "UNIQUE_NOTES_DATA": UNIQUE_NOTES_DATA
+    }
+    # Update cache
+    if len(BASE_LAYERS_CACHE) >= LAYERS_CACHE_MAX: BASE_LAYERS_CACHE.pop(next(iter(BASE_LAYERS_CACHE)))
+    BASE_LAYERS_CACHE[KEY] = BASE_LAYER
+
+    return BASE_LAYER
+
+## Visualise Functions
 def CircleBouncer_VisualiseMode_LineSequence(notes, cur_data, **params):
     '''
     Circle Bouncer - Visualise Mode - Line Sequence
+
+    Only the first frame of a note is kept as a full frame, the intermediate frames are frame deltas of the rect around their line segment
+    Hence each intermediate frame only copies that rect instead of the whole frame (see VideoUtils.VideoUtils_GetFrameDelta)
     '''
+    import cv2
+
     # Init
     iteration = cur_data["iteration"]
     I = np.copy(cur_data["I"])
@@ -140,7 +225,7 @@ def CircleBouncer_VisualiseMode_LineSequence(notes, cur_data, **params):
         "note": note["note"],
         "position": UNIQUE_NOTES_DATA[note["note"]]["position"]
     }
-    note_frames = [np.copy(I)]
+    note_frames = [I]
 
     # For non-first iterations, draw line
     if "notes" in cur_data.keys():
@@ -179,8 +264,12 @@ def CircleBouncer_VisualiseMode_LineSequence(notes, cur_data, **params):
                 Util_GetTuplePoint(cur_end_pos),
                 LINE_PARAMS["color"], LINE_PARAMS["thickness"]
             )
-            I = np.array(I, dtype=np.uint8)
-            note_frames.append(np.copy(I))
+            ### First frame is kept in full (copied if more frames are drawn over it), later frames only keep their dirty rect
+            if fi == 0:
+                note_frames.append(np.copy(I) if FRAMES_PER_NOTE > 1 else I)
+            else:
+                DIRTY_RECT = Util_GetPointsRect([cur_start_pos, cur_end_pos], LINE_PARAMS["thickness"]//2 + 1, I.shape)
+                note_frames.append(VideoUtils.VideoUtils_GetFrameDelta(I, DIRTY_RECT))
     else:
         cur_data.update({
             "notes": []
@@ -189,13 +278,15 @@ def CircleBouncer_VisualiseMode_LineSequence(notes, cur_data, **params):
     # For all iterations, draw point
     ## Set Point Color destination note color
     POINT_PARAMS["color"] = NOTE_COLORS["color_map"][next_data["note"]]
-    ## Draw Point
-    I_last = cv2.circle(
-        note_frames[-1], Util_GetTuplePoint(next_data["position"]),
+    ## Draw Point (extending the dirty rect of the last frame if it is a frame delta)
+    I = cv2.circle(
+        I, Util_GetTuplePoint(next_data["position"]),
         POINT_PARAMS["radius"], POINT_PARAMS["color"], POINT_PARAMS["thickness"]
     )
-    I_last = np.array(I_last, dtype=np.uint8)
-    note_frames[-1] = I_last
+    if isinstance(note_frames[-1], dict):
+        POINT_RECT = Util_GetPointsRect([next_data["position"]], POINT_PARAMS["radius"] + 1, I.shape)
+        DIRTY_RECT = VideoUtils.VideoUtils_UnionRect(note_frames[-1]["rect"], POINT_RECT)
+        note_frames[-1] = VideoUtils.VideoUtils_GetFrameDelta(I, DIRTY_RECT)
 
     # Update Cur Data
     cur_data["notes"].append(next_data)
@@ -206,6 +297,8 @@ def CircleBouncer_VisualiseMode_ConvergeSequence(notes, cur_data, **params):
     '''
     Circle Bouncer - Visualise Mode - Converge Sequence
     '''
+    import cv2
+
     # Init
     iteration = cur_data["iteration"]
     I = np.copy(cur_data["I"])
@@ -262,6 +355,7 @@ def CircleBouncer_VisualiseMode_ConvergeSequence(notes, cur_data, **params):
 
     return note_frames, cur_data
 
+@TraceUtils.TraceUtils_Trace()
 def CircleBouncer_VisualiseNotes(notes, UNIQUE_NOTES, frame_size=(1024, 1024),
     mode="line_sequence", # Can be ["line_sequence", "converge_lines"]
     show_text=True, frames_per_notesec=1,
@@ -314,70 +408,11 @@ def CircleBouncer_VisualiseNotes(notes, UNIQUE_NOTES, frame_size=(1024, 1024),
     '''
     # Init
     NOTES_FRAMES = []
-    I = np.zeros((frame_size[0], frame_size[1], 3), dtype=np.uint8)
-    UNIQUE_NOTES_DATA = {k: {} for k in UNIQUE_NOTES}
+    NOTE_COLORS = CircleBouncer_GetNoteColors(UNIQUE_NOTES, fade_params, sizes, colors)
+    BASE_LAYER = CircleBouncer_GetBaseLayer(UNIQUE_NOTES, frame_size, show_text, sizes, colors, NOTE_COLORS)
+    I = BASE_LAYER["I"]
+    UNIQUE_NOTES_DATA = BASE_LAYER["UNIQUE_NOTES_DATA"]
     MIN_FRAME_SIZE = min(frame_size[0], frame_size[1])
-    ## Set Note Colors
-    NOTE_COLORS = {
-        "fade_threshold": fade_params["threshold"],
-        "background": Util_Hex2RGB(colors["circle"]) if sizes["circle"]["thickness"] == -1 else Util_Hex2RGB("#000000"),
-        "cmap_list": np.array(plt.get_cmap(colors["note"]["cmap"])(np.linspace(0, 1, len(UNIQUE_NOTES)))[:, :3]*255, dtype=int).tolist()
-    }
-    NOTE_COLORS["color_map"] = {
-        UNIQUE_NOTES[i]: tuple(NOTE_COLORS["cmap_list"][i])
-        for i in range(len(UNIQUE_NOTES))
-    }
-    NOTE_COLORS["color_map_withfade"] = {}
-    bg_color = np.array(NOTE_COLORS["background"])
-    for un in UNIQUE_NOTES:
-        NOTE_COLORS["color_map_withfade"][un] = []
-        if fade_params["threshold"] > 0:
-            note_color = np.array(NOTE_COLORS["color_map"][un])
-            for itd in range(fade_params["threshold"]):
-                cur_faded_color = note_color
-                if fade_params["type"] == "linear":
-                    cur_faded_color = (itd*bg_color + (fade_params["threshold"]-itd)*note_color) / fade_params["threshold"]
-                    cur_faded_color = np.array(np.round(cur_faded_color, 0), dtype=np.uint8)
-                cur_faded_color = tuple(cur_faded_color.tolist())
-                NOTE_COLORS["color_map_withfade"][un].append(cur_faded_color)
-    # Draw initial circle
-    GAP = int(MIN_FRAME_SIZE*sizes["gap"]/2) # Gap between radius of circle and size of frame
-    CIRCLE_PARAMS = {
-        "center": (int(frame_size[0]/2), int(frame_size[1]/2)),
-        "radius": int(min(frame_size[0], frame_size[1])/2 - GAP),
-        "color": Util_Hex2RGB(colors["circle"]),
-        "thickness": max(1, int(MIN_FRAME_SIZE*sizes["circle"]["thickness"]))
-    }
-    I = cv2.circle(
-        I, CIRCLE_PARAMS["center"], CIRCLE_PARAMS["radius"],
-        CIRCLE_PARAMS["color"], CIRCLE_PARAMS["thickness"]
-    )
-    I = np.array(I, dtype=np.uint8)
-    ## Draw unique notes
-    TEXT_PARAMS = {
-        "font": cv2.FONT_HERSHEY_SIMPLEX,
-        "font_scale": MIN_FRAME_SIZE*sizes["text"]["scale"],
-        "thickness": 0
-    }
-    for i in range(len(UNIQUE_NOTES)):
-        theta = (np.pi*2) / len(UNIQUE_NOTES)
-        angle = theta*i
-        point = (
-            CIRCLE_PARAMS["center"][0] + CIRCLE_PARAMS["radius"]*np.cos(angle), 
-            CIRCLE_PARAMS["center"][1] + CIRCLE_PARAMS["radius"]*np.sin(angle)
-        )
-        if show_text:
-            TEXT_PARAMS["color"] = NOTE_COLORS["color_map"][UNIQUE_NOTES[i]]
-            I = cv2.putText(
-                I, str(UNIQUE_NOTES[i]), Util_GetTuplePoint(point),
-                TEXT_PARAMS["font"], TEXT_PARAMS["font_scale"],
-                TEXT_PARAMS["color"], TEXT_PARAMS["thickness"], cv2.LINE_AA
-            )
-            I = np.array(I, dtype=np.uint8)
-        UNIQUE_NOTES_DATA[UNIQUE_NOTES[i]] = {
-            "index": i,
-            "position": point
-        }
     # Draw Notes
     LINE_PARAMS = {
         "thickness": max(1, int(MIN_FRAME_SIZE*sizes["line"]["thickness"]))
@@ -412,8 +447,73 @@ def CircleBouncer_VisualiseNotes(notes, UNIQUE_NOTES, frame_size=(1024, 1024),
         NOTES_FRAMES.append(note_frames)
         if PROGRESS_BAR is not None: PROGRESS_BAR.next()
     if PROGRESS_BAR is not None: PROGRESS_BAR.close()
+    N_FRAMES = sum([len(note_frames) for note_frames in NOTES_FRAMES])
+    FRAMES_BYTES = sum([(f["patch"].nbytes if isinstance(f, dict) else f.nbytes) for note_frames in NOTES_FRAMES for f in note_frames])
+    TraceUtils.TraceUtils_SetAttributes(notes=len(notes), frames=N_FRAMES, frames_mb=round(FRAMES_BYTES / (1024 * 1024), 2))
 
     return NOTES_FRAMES
 
+def CircleBouncer_RenderVideo(save_path, notes, UNIQUE_NOTES, audio_path, vis_params={}, fps=24, encoder_params=None, PROGRESS_BAR=None):
+    '''
+    Circle Bouncer - Visualise Notes and save the frames with audio as video (vis_params are passed to CircleBouncer_VisualiseNotes)
+    '''
+    NOTES_FRAMES = CircleBouncer_VisualiseNotes(notes, UNIQUE_NOTES, PROGRESS_BAR=PROGRESS_BAR, **vis_params)
+    VideoUtils_SaveVisualisationVideo(notes, NOTES_FRAMES, audio_path, save_path, fps=fps, encoder_params=encoder_params, PROGRESS_BAR=PROGRESS_BAR)
+
+def CircleBouncer_GetPalette(UNIQUE_NOTES, vis_params={}):
+    '''
+    Circle Bouncer - Get GIF palette of a visualisation (note colors with their fade steps, circle and background colors, filled up with the colors of the base layer)
+    '''
+    # Params (vis_params over the defaults of CircleBouncer_VisualiseNotes)
+    PARAMS = {
+        k: p.default for k, p in inspect.signature(CircleBouncer_VisualiseNotes).parameters.items()
+        if p.default is not inspect.Parameter.empty
+    }
+    PARAMS.update(vis_params)
+    # Colors
+    NOTE_COLORS = CircleBouncer_GetNoteColors(UNIQUE_NOTES, PARAMS["fade_params"], PARAMS["sizes"], PARAMS["colors"])
+    BASE_LAYER = CircleBouncer_GetBaseLayer(UNIQUE_NOTES, PARAMS["frame_size"], PARAMS["show_text"], PARAMS["sizes"], PARAMS["colors"], NOTE_COLORS)
+    COLORS = [(0, 0, 0), NOTE_COLORS["background"], Util_Hex2RGB(PARAMS["colors"]["circle"])]
+    COLORS.extend([tuple(c) for c in NOTE_COLORS["cmap_list"]])
+    for un in UNIQUE_NOTES:
+        COLORS.extend(NOTE_COLORS["color_map_withfade"][un])
+    PALETTE = GIFUtils.GIFUtils_GetPalette(COLORS, frame=BASE_LAYER["I"])
+
+    return PALETTE
+
+def CircleBouncer_SaveVisualisationGIF(notes, notes_frames, UNIQUE_NOTES, save_path, vis_params={}, duration=None, PROGRESS_BAR=None):
+    '''
+    Circle Bouncer - Save Note Frames as GIF (see GIFUtils.GIFUtils_SaveFrameSequence, vis_params must be the ones the frames were visualised with)
+    '''
+    PALETTE = CircleBouncer_GetPalette(UNIQUE_NOTES, vis_params)
+    FRAMES = VideoUtils.VideoUtils_FrameSequence_FromNoteFrames(notes, notes_frames, duration=duration)
+    if PROGRESS_BAR is not None and duration is None: PROGRESS_BAR.setTotal(int(round((sum([n["delay"] for n in notes]) + notes[-1]["duration"]) * 100)))
+    GIFUtils.GIFUtils_SaveFrameSequence(FRAMES, save_path, PALETTE, duration=duration, PROGRESS_BAR=PROGRESS_BAR)
+
+def CircleBouncer_RenderGIF(save_path, notes, UNIQUE_NOTES, vis_params={}, PROGRESS_BAR=None):
+    '''
+    Circle Bouncer - Visualise Notes and save the frames as GIF (vis_params are passed to CircleBouncer_VisualiseNotes)
+    '''
+    NOTES_FRAMES = CircleBouncer_VisualiseNotes(notes, UNIQUE_NOTES, PROGRESS_BAR=PROGRESS_BAR, **vis_params)
+    CircleBouncer_SaveVisualisationGIF(notes, NOTES_FRAMES, UNIQUE_NOTES, save_path, vis_params=vis_params, PROGRESS_BAR=PROGRESS_BAR)
+
+def CircleBouncer_GetProxyParams(vis_params, fps=24, size=PROXY_PARAMS["size"], proxy_fps=PROXY_PARAMS["fps"]):
+    '''
+    Circle Bouncer - Get visualisation params and fps for a low resolution, low fps proxy of a render (same notes, colors and relative sizes)
+
+    Parameters,
+    - vis_params : Visualisation params of the full render
+    - fps : FPS of the full render
+    - size : Size of the larger side of the proxy frame
+    - proxy_fps : Maximum FPS of the proxy
+    '''
+    PROXY_VIS_PARAMS = dict(vis_params)
+    FRAME_SIZE = vis_params.get("frame_size", (1024, 1024))
+    SCALE = min(1.0, size / max(FRAME_SIZE))
+    PROXY_VIS_PARAMS["frame_size"] = (max(1, int(FRAME_SIZE[0]*SCALE)), max(1, int(FRAME_SIZE[1]*SCALE)))
+    PROXY_VIS_PARAMS["frames_per_notesec"] = min(vis_params.get("frames_per_notesec", 1), proxy_fps)
+
+    return PROXY_VIS_PARAMS, min(fps, proxy_fps)
+
 
 # RunCode
\ No newline at end of file
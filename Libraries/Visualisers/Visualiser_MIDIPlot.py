@@ -3,22 +3,57 @@ Visualiser Library - MIDI Plot
 """
 
 # Imports
+import os
+import hashlib
+import threading
 import numpy as np
-import matplotlib.pyplot as plt
+from collections import OrderedDict
+## cv2 and matplotlib are imported inside the functions that use them (slow to import)
 
 # Main Vars
+DEFAULT_COLORS = [
+    "red", "maroon", "lightgreen", "darkgreen",
+    "lightblue", "indigo", "gray", "black",
+    "violet", "purple", "pink", "orange"
+]
+RASTER_PARAMS = {
+    "background": (255, 255, 255),
+    "axes": (0, 0, 0),
+    "grid": (200, 200, 200),
+    "margin": {
+        "left": 48,
+        "bottom": 32,
+        "top": 8,
+        "right": 8
+    },
+    "font_scale": 0.35,
+    "bar_height": 0.8,
+    "x_ticks": 8
+}
+RASTER_TEMPLATES = {}
+RASTER_TEMPLATES_MAX = 16
+PYRAMID_PARAMS = {
+    "min_step": 0.01,
+    "max_base_bins": 32768,
+    "min_level_bins": 256
+}
+PYRAMIDS = {}
+PYRAMIDS_MAX = 8
+RENDER_CACHE = OrderedDict()
+RENDER_CACHE_LOCK = threading.Lock() # Render cache is shared by concurrent script threads
+RENDER_CACHE_PARAMS = {
+    "max_bytes": 256 * 1024 * 1024,
+    "bytes": 0
+}
 
-
-# Main Functions
-def MIDIPlot_PlotNotes_HBar(notes, note_value_name_map=None, note_value_color_map=None, start_time=0):
+# Util Functions
+def MIDIPlot_GetValueMap(notes, note_value_name_map=None):
     '''
-    MIDI Plot - Plot Notes as Horizontal Bar Graph
-
-    X axis is time and Y axis is the different possible note values
+    MIDI Plot - Get map of note values to their names and plot row indices
     '''
-    # Init Maps
+    # Init
     VALUE_MAP = {}
-    VALUE_NAMES = []
+    # Form Map
     if note_value_name_map is None:
         unique_note_values = sorted(list(set([note["value"] for note in notes])))
         for i in range(len(unique_note_values)):
@@ -26,7 +61,6 @@ def MIDIPlot_PlotNotes_HBar(notes, note_value_name_map=None, note_value_color_ma
                 "name": str(i),
                 "index": i
             }
-        VALUE_NAMES = [VALUE_MAP[v]["name"] for v in unique_note_values]
     else:
         unique_note_values = sorted(list(note_value_name_map.keys()))
         for i in range(len(unique_note_values)):
@@ -34,17 +68,116 @@ def MIDIPlot_PlotNotes_HBar(notes, note_value_name_map=None, note_value_color_ma
                 "name": str(note_value_name_map[unique_note_values[i]]),
                 "index": i
             }
-        VALUE_NAMES = [VALUE_MAP[v]["name"] for v in unique_note_values]
-    # Init Colors
+    VALUE_NAMES = [VALUE_MAP[v]["name"] for v in unique_note_values]
+
+    return VALUE_MAP, VALUE_NAMES
+
+def MIDIPlot_GetValueColorMap(VALUE_MAP, note_value_color_map=None):
+    '''
+    MIDI Plot - Get map of note values to colors (default colors are used if no map is given)
+    '''
+    if note_value_color_map is not None: return note_value_color_map
     unique_note_values = sorted(list(VALUE_MAP.keys()))
-    if note_value_color_map is None:
-        DEFAULT_COLORS = [
-            "red", "maroon", "lightgreen", "darkgreen",
-            "lightblue", "indigo", "gray", "black",
-            "violet", "purple", "pink", "orange"
-        ]
-        note_value_color_map = {}
-        for i in range(len(unique_note_values)): note_value_color_map[unique_note_values[i]] = DEFAULT_COLORS[i % len(DEFAULT_COLORS)]
+    return {unique_note_values[i]: DEFAULT_COLORS[i % len(DEFAULT_COLORS)] for i in range(len(unique_note_values))}
+
+def MIDIPlot_GetNoteTimes(notes, start_time=0):
+    '''
+    MIDI Plot - Get start and end times of notes
+    '''
+    STARTS = start_time + np.cumsum(np.array([note["delay"] for note in notes], dtype=float))
+    ENDS = STARTS + np.array([note["duration"] for note in notes], dtype=float)
+
+    return STARTS, ENDS
+
+def MIDIPlot_HashNotes(notes, start_time=0):
+    '''
+    MIDI Plot - Get stable hash of the values and times of notes
+    '''
+    STARTS, ENDS = MIDIPlot_GetNoteTimes(notes, start_time)
+    ARRAYS = [np.array([note["value"] for note in notes], dtype=np.int64), STARTS, ENDS]
+    HASH = hashlib.sha256()
+    for A in ARRAYS: HASH.update(A.tobytes())
+
+    return HASH.hexdigest()
+
+def MIDIPlot_HashRender(notes, backend, note_value_name_map=None, note_value_color_map=None, start_time=0, notes_key=None):
+    '''
+    MIDI Plot - Get stable hash of everything a plot image depends on (note values and times, maps and backend)
+
+    Notes are hashed only if no notes_key (key of the note set from upstream, e.g. a cache key) is given
+    '''
+    HASH = hashlib.sha256()
+    HASH.update((MIDIPlot_HashNotes(notes, start_time) if notes_key is None else f"{notes_key}:{start_time}").encode())
+    HASH.update(repr(backend).encode())
+    for MAP in [note_value_name_map, note_value_color_map]:
+        HASH.update(repr(None if MAP is None else sorted(MAP.items())).encode())
+
+    return HASH.hexdigest()
+
+def MIDIPlot_FigureToImage(FIG):
+    '''
+    MIDI Plot - Convert matplotlib figure to RGB image
+    '''
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    CANVAS = FigureCanvasAgg(FIG)
+    CANVAS.draw()
+    return np.array(CANVAS.buffer_rgba())[:, :, :3]
+
+def MIDIPlot_GetRasterTemplate(size, VALUE_NAMES, time_range):
+    '''
+    MIDI Plot - Get raster image with axes, ticks and labels drawn (cached, as it only depends on the size, names and time range)
+    '''
+    import cv2
+
+    # Check cache
+    KEY = (tuple(size), tuple(VALUE_NAMES), tuple(time_range))
+    if KEY in RASTER_TEMPLATES.keys(): return RASTER_TEMPLATES[KEY]
+    # Init
+    W, H = size
+    MARGIN = RASTER_PARAMS["margin"]
+    PLOT_W, PLOT_H = W - MARGIN["left"] - MARGIN["right"], H - MARGIN["top"] - MARGIN["bottom"]
+    I = np.full((H, W, 3), RASTER_PARAMS["background"], dtype=np.uint8)
+    N_ROWS = max(1, len(VALUE_NAMES))
+    ROW_H = PLOT_H / N_ROWS
+    FONT = cv2.FONT_HERSHEY_SIMPLEX
+    TEXT_H = cv2.getTextSize("A", FONT, RASTER_PARAMS["font_scale"], 1)[0][1] + 4
+    # X Ticks and Grid
+    tick_interval = (time_range[1] - time_range[0]) / RASTER_PARAMS["x_ticks"]
+    tick_decimals = max(1, int(np.ceil(-np.log10(tick_interval))))
+    for i in range(RASTER_PARAMS["x_ticks"] + 1):
+        x = MARGIN["left"] + int(round(i * (PLOT_W - 1) / RASTER_PARAMS["x_ticks"]))
+        t = time_range[0] + i * (time_range[1] - time_range[0]) / RASTER_PARAMS["x_ticks"]
+        I[MARGIN["top"]:MARGIN["top"]+PLOT_H:4, x] = RASTER_PARAMS["grid"]
+        cv2.putText(I, f"{t:.{tick_decimals}f}", (x - 8, H - MARGIN["bottom"] + TEXT_H + 2), FONT, RASTER_PARAMS["font_scale"], RASTER_PARAMS["axes"], 1, cv2.LINE_AA)
+    cv2.putText(I, "Time (seconds)", (MARGIN["left"] + PLOT_W // 2 - 40, H - 4), FONT, RASTER_PARAMS["font_scale"], RASTER_PARAMS["axes"], 1, cv2.LINE_AA)
+    # Y Labels (skip rows so that labels do not overlap)
+    label_step = max(1, int(np.ceil(TEXT_H / ROW_H)))
+    for r in range(0, len(VALUE_NAMES), label_step):
+        y = MARGIN["top"] + int(round(PLOT_H - (r + 0.5) * ROW_H))
+        I[y, MARGIN["left"]:MARGIN["left"]+PLOT_W:4] = RASTER_PARAMS["grid"]
+        cv2.putText(I, VALUE_NAMES[r], (4, y + TEXT_H // 2 - 2), FONT, RASTER_PARAMS["font_scale"], RASTER_PARAMS["axes"], 1, cv2.LINE_AA)
+    # Axes
+    cv2.rectangle(I, (MARGIN["left"] - 1, MARGIN["top"] - 1), (MARGIN["left"] + PLOT_W, MARGIN["top"] + PLOT_H), RASTER_PARAMS["axes"], 1)
+    # Update cache
+    if len(RASTER_TEMPLATES) >= RASTER_TEMPLATES_MAX: RASTER_TEMPLATES.pop(next(iter(RASTER_TEMPLATES)))
+    RASTER_TEMPLATES[KEY] = I
+
+    return I
+
+# Main Functions
+def MIDIPlot_PlotNotes_HBar(notes, note_value_name_map=None, note_value_color_map=None, start_time=0):
+    '''
+    MIDI Plot - Plot Notes as Horizontal Bar Graph
+
+    X axis is time and Y axis is the different possible note values
+    '''
+    import matplotlib.pyplot as plt
+
+    # Init Maps
+    VALUE_MAP, VALUE_NAMES = MIDIPlot_GetValueMap(notes, note_value_name_map)
+    # Init Colors
+    note_value_color_map = MIDIPlot_GetValueColorMap(VALUE_MAP, note_value_color_map)
 
     # Form rectangles from notes
     Y = [VALUE_MAP[note["value"]]["index"] for note in notes]
@@ -70,5 +203,259 @@ def MIDIPlot_PlotNotes_HBar(notes, note_value_name_map=None, note_value_color_ma
 
     return FIG
 
+def MIDIPlot_PlotNotes_Raster(notes, note_value_name_map=None, note_value_color_map=None, start_time=0, size=(1024, 512)):
+    '''
+    MIDI Plot - Plot Notes as Horizontal Bars painted directly into an image array
+
+    Same plot as MIDIPlot_PlotNotes_HBar, but returns an RGB image (height x width x 3) of the given size (width, height)
+    - Bars of all notes are painted together with vectorized index arithmetic
+    - Axes and labels are drawn once and reused for plots with the same size, names and time range
+    '''
+    from matplotlib.colors import to_rgb
+
+    # Init Maps
+    VALUE_MAP, VALUE_NAMES = MIDIPlot_GetValueMap(notes, note_value_name_map)
+    note_value_color_map = MIDIPlot_GetValueColorMap(VALUE_MAP, note_value_color_map)
+    unique_note_values = sorted(list(VALUE_MAP.keys()))
+    ROW_COLORS = np.array([
+        np.array(to_rgb(note_value_color_map[v])) * 255 if v in note_value_color_map.keys() else RASTER_PARAMS["axes"]
+        for v in unique_note_values
+    ], dtype=np.uint8).reshape(-1, 3)
+    # Init Times
+    STARTS, ENDS = MIDIPlot_GetNoteTimes(notes, start_time)
+    TIME_RANGE = (
+        float(min(start_time, STARTS.min())) if len(notes) > 0 else float(start_time),
+        float(ENDS.max()) if len(notes) > 0 else float(start_time) + 1.0
+    )
+    if TIME_RANGE[1] <= TIME_RANGE[0]: TIME_RANGE = (TIME_RANGE[0], TIME_RANGE[0] + 1.0)
+    # Init Image
+    I = np.copy(MIDIPlot_GetRasterTemplate(size, VALUE_NAMES, TIME_RANGE))
+    if len(notes) == 0: return I
+    MARGIN = RASTER_PARAMS["margin"]
+    PLOT_W, PLOT_H = size[0] - MARGIN["left"] - MARGIN["right"], size[1] - MARGIN["top"] - MARGIN["bottom"]
+    N_ROWS = len(VALUE_NAMES)
+    # Form coverage of each row over the pixel columns
+    ROWS = np.array([VALUE_MAP[note["value"]]["index"] for note in notes], dtype=np.int64)
+    SCALE = PLOT_W / (TIME_RANGE[1] - TIME_RANGE[0])
+    X0 = np.clip(np.floor((STARTS - TIME_RANGE[0]) * SCALE).astype(np.int64), 0, PLOT_W - 1)
+    X1 = np.clip(np.ceil((ENDS - TIME_RANGE[0]) * SCALE).astype(np.int64), X0 + 1, PLOT_W)
+    COVERAGE = np.zeros((N_ROWS, PLOT_W + 1), dtype=np.int32)
+    np.add.at(COVERAGE, (ROWS, X0), 1)
+    np.add.at(COVERAGE, (ROWS, X1), -1)
+    COVERAGE = np.cumsum(COVERAGE, axis=1)[:, :PLOT_W] > 0
+    # Map pixel rows to note rows (row 0 at the bottom, bars cover bar_height of the row)
+    ROW_POS = (PLOT_H - 0.5 - np.arange(PLOT_H)) * N_ROWS / PLOT_H
+    ROW_OF_Y = np.clip(np.floor(ROW_POS).astype(np.int64), 0, N_ROWS - 1)
+    VALID_Y = np.abs(ROW_POS - ROW_OF_Y - 0.5) <= RASTER_PARAMS["bar_height"] / 2
+    # Paint
+    MASK = COVERAGE[ROW_OF_Y] & VALID_Y[:, None]
+    PLOT = I[MARGIN["top"]:MARGIN["top"]+PLOT_H, MARGIN["left"]:MARGIN["left"]+PLOT_W]
+    PLOT[MASK] = np.broadcast_to(ROW_COLORS[ROW_OF_Y][:, None, :], PLOT.shape)[MASK]
+
+    return I
+
+## Tile Pyramid Functions
+def MIDIPlot_BuildPyramid(notes, note_value_name_map=None, start_time=0):
+    '''
+    MIDI Plot - Build level of detail pyramid of note tiles over (pitch row, time)
+
+    Level 0 has time tiles of a fixed step and every next level merges pairs of tiles of the previous level
+    Each level has arrays of shape (rows, tiles),
+    - count : Number of notes starting in the tile
+    - coverage : Fraction of the tile covered by notes
+    '''
+    # Init
+    VALUE_MAP, VALUE_NAMES = MIDIPlot_GetValueMap(notes, note_value_name_map)
+    STARTS, ENDS = MIDIPlot_GetNoteTimes(notes, start_time)
+    TIME_START = float(min(start_time, STARTS.min())) if len(notes) > 0 else float(start_time)
+    TIME_END = float(ENDS.max()) if len(notes) > 0 else float(start_time) + 1.0
+    if TIME_END <= TIME_START: TIME_END = TIME_START + 1.0
+    STEP = max(PYRAMID_PARAMS["min_step"], (TIME_END - TIME_START) / PYRAMID_PARAMS["max_base_bins"])
+    N_BINS = int(np.ceil((TIME_END - TIME_START) / STEP))
+    N_ROWS = max(1, len(VALUE_NAMES))
+    ROWS = np.array([VALUE_MAP[note["value"]]["index"] for note in notes], dtype=np.int64)
+    # Base Level
+    X0 = np.clip(np.floor((STARTS - TIME_START) / STEP).astype(np.int64), 0, N_BINS - 1)
+    X1 = np.clip(np.ceil((ENDS - TIME_START) / STEP).astype(np.int64), X0 + 1, N_BINS)
+    ## Count
+    COUNT = np.zeros((N_ROWS, N_BINS), dtype=np.int32)
+    np.add.at(COUNT, (ROWS, X0), 1)
+    ## Coverage (any note active in the tile)
+    COVERAGE = np.zeros((N_ROWS, N_BINS + 1), dtype=np.int32)
+    np.add.at(COVERAGE, (ROWS, X0), 1)
+    np.add.at(COVERAGE, (ROWS, X1), -1)
+    COVERAGE = (np.cumsum(COVERAGE, axis=1)[:, :N_BINS] > 0).astype(np.float32)
+    LEVELS = [{
+        "step": STEP,
+        "count": COUNT,
+        "coverage": COVERAGE
+    }]
+    # Higher Levels
+    while LEVELS[-1]["count"].shape[1] > PYRAMID_PARAMS["min_level_bins"]:
+        PREV = LEVELS[-1]
+        n = PREV["count"].shape[1]
+        ## Pad to even number of tiles
+        PAD = ((0, 0), (0, n % 2))
+        COUNT = np.pad(PREV["count"], PAD)
+        COVERAGE = np.pad(PREV["coverage"], PAD)
+        LEVELS.append({
+            "step": PREV["step"] * 2,
+            "count": COUNT[:, 0::2] + COUNT[:, 1::2],
+            "coverage": (COVERAGE[:, 0::2] + COVERAGE[:, 1::2]) / 2
+        })
+    PYRAMID = {
+        "value_map": VALUE_MAP,
+        "value_names": VALUE_NAMES,
+        "time_range": (TIME_START, TIME_END),
+        "levels": LEVELS
+    }
+
+    return PYRAMID
+
+def MIDIPlot_GetPyramid(notes, note_value_name_map=None, start_time=0, notes_key=None):
+    '''
+    MIDI Plot - Get tile pyramid of notes (built once per note set and cached by notes_key, or by note hash if not given)
+
+    notes_key should be a key of the note set from upstream (e.g. a cache key), so that lookups do not depend on the number of notes
+    '''
+    KEY = (
+        MIDIPlot_HashNotes(notes) if notes_key is None else notes_key, start_time,
+        None if note_value_name_map is None else tuple(sorted(note_value_name_map.items()))
+    )
+    if KEY not in PYRAMIDS.keys():
+        if len(PYRAMIDS) >= PYRAMIDS_MAX: PYRAMIDS.pop(next(iter(PYRAMIDS)))
+        PYRAMIDS[KEY] = MIDIPlot_BuildPyramid(notes, note_value_name_map, start_time)
+
+    return PYRAMIDS[KEY]
+
+def MIDIPlot_RenderPyramidWindow(PYRAMID, time_window=None, note_value_color_map=None, size=(1024, 512)):
+    '''
+    MIDI Plot - Render a time window of a tile pyramid as an RGB image
+
+    Uses the coarsest level which still has at least one tile per pixel column in the window,
+    so the cost depends on the pixels shown and not on the number of notes
+    Tile color is the row color blended with the background by the tile coverage
+    '''
+    from matplotlib.colors import to_rgb
+
+    # Init
+    TIME_RANGE = PYRAMID["time_range"]
+    if time_window is None: time_window = TIME_RANGE
+    time_window = (float(time_window[0]), float(time_window[1]))
+    if time_window[1] <= time_window[0]: time_window = (time_window[0], time_window[0] + PYRAMID["levels"][0]["step"])
+    note_value_color_map = MIDIPlot_GetValueColorMap(PYRAMID["value_map"], note_value_color_map)
+    unique_note_values = sorted(list(PYRAMID["value_map"].keys()))
+    ROW_COLORS = np.array([
+        np.array(to_rgb(note_value_color_map[v])) * 255 if v in note_value_color_map.keys() else RASTER_PARAMS["axes"]
+        for v in unique_note_values
+    ], dtype=np.float32).reshape(-1, 3)
+    MARGIN = RASTER_PARAMS["margin"]
+    PLOT_W, PLOT_H = size[0] - MARGIN["left"] - MARGIN["right"], size[1] - MARGIN["top"] - MARGIN["bottom"]
+    N_ROWS = max(1, len(PYRAMID["value_names"]))
+    I = np.copy(MIDIPlot_GetRasterTemplate(size, PYRAMID["value_names"], time_window))
+    if len(PYRAMID["value_names"]) == 0: return I
+    # Select Level
+    LEVEL = PYRAMID["levels"][0]
+    for L in PYRAMID["levels"]:
+        if (time_window[1] - time_window[0]) / L["step"] < PLOT_W: break
+        LEVEL = L
+    # Sample tiles at pixel columns
+    N_TILES = LEVEL["coverage"].shape[1]
+    X_TIMES = time_window[0] + (np.arange(PLOT_W) + 0.5) * (time_window[1] - time_window[0]) / PLOT_W
+    X_TILES = np.floor((X_TIMES - TIME_RANGE[0]) / LEVEL["step"]).astype(np.int64)
+    X_VALID = (X_TILES >= 0) & (X_TILES < N_TILES)
+    X_TILES = np.clip(X_TILES, 0, N_TILES - 1)
+    ## Only the window tiles are read
+    T0, T1 = int(X_TILES.min()), int(X_TILES.max()) + 1
+    WINDOW_COVERAGE = LEVEL["coverage"][:, T0:T1][:, X_TILES - T0] * X_VALID[None, :]
+    # Map pixel rows to note rows (row 0 at the bottom)
+    ROW_POS = (PLOT_H - 0.5 - np.arange(PLOT_H)) * N_ROWS / PLOT_H
+    ROW_OF_Y = np.clip(np.floor(ROW_POS).astype(np.int64), 0, N_ROWS - 1)
+    VALID_Y = np.abs(ROW_POS - ROW_OF_Y - 0.5) <= RASTER_PARAMS["bar_height"] / 2
+    # Paint
+    ALPHA = (WINDOW_COVERAGE[ROW_OF_Y] * VALID_Y[:, None])[:, :, None]
+    PLOT = I[MARGIN["top"]:MARGIN["top"]+PLOT_H, MARGIN["left"]:MARGIN["left"]+PLOT_W]
+    PLOT[:] = (PLOT * (1 - ALPHA) + ROW_COLORS[ROW_OF_Y][:, None, :] * ALPHA).astype(np.uint8)
+
+    return I
+
+## Render Cache Functions
+def MIDIPlot_RenderCache_Get(key, cache_dir=None):
+    '''
+    MIDI Plot - Get plot image from render cache (memory first, then disk), None if not cached
+    '''
+    import cv2
+
+    # Memory
+    with RENDER_CACHE_LOCK:
+        if key in RENDER_CACHE.keys():
+            RENDER_CACHE.move_to_end(key)
+            return RENDER_CACHE[key]
+    # Disk
+    if cache_dir is None: return None
+    path = os.path.join(cache_dir, key + ".png")
+    if not os.path.exists(path): return None
+    I = cv2.imread(path, cv2.IMREAD_COLOR)
+    if I is None: return None
+    I = cv2.cvtColor(I, cv2.COLOR_BGR2RGB)
+
+    return MIDIPlot_RenderCache_Put(key, I)
+
+def MIDIPlot_RenderCache_Put(key, I, cache_dir=None):
+    '''
+    MIDI Plot - Put plot image in render cache and return the cached (read only) image
+
+    Memory cache is bounded by total image bytes (least recently used images are dropped first)
+    Disk cache (if cache_dir is given) is written atomically as PNG
+    '''
+    import cv2
+
+    # Memory
+    I = np.ascontiguousarray(I)
+    I.flags.writeable = False
+    with RENDER_CACHE_LOCK:
+        if key in RENDER_CACHE.keys(): RENDER_CACHE_PARAMS["bytes"] -= RENDER_CACHE.pop(key).nbytes
+        RENDER_CACHE[key] = I
+        RENDER_CACHE_PARAMS["bytes"] += I.nbytes
+        while RENDER_CACHE_PARAMS["bytes"] > RENDER_CACHE_PARAMS["max_bytes"] and len(RENDER_CACHE) > 1:
+            RENDER_CACHE_PARAMS["bytes"] -= RENDER_CACHE.popitem(last=False)[1].nbytes
+    # Disk
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, key + ".png")
+        temp_path = os.path.join(cache_dir, f"{key}.{os.getpid()}.tmp.png")
+        cv2.imwrite(temp_path, cv2.cvtColor(I, cv2.COLOR_RGB2BGR))
+        os.replace(temp_path, path)
+
+    return I
+
+def MIDIPlot_PlotNotes_Cached(notes, backend="Raster", note_value_name_map=None, note_value_color_map=None, start_time=0, cache_dir=None, notes_key=None):
+    '''
+    MIDI Plot - Plot Notes with the given backend as an RGB image, reusing cached images of the same notes
+
+    Parameters,
+    - notes : Notes to plot
+    - backend : Name of backend in MIDIPLOT_BACKENDS
+    - note_value_name_map : Map of note values to names
+    - note_value_color_map : Map of note values to colors
+    - start_time : Start time of the first note
+    - cache_dir : Directory for the disk cache (only memory cache is used if None)
+    - notes_key : Key of the note set from upstream (e.g. a cache key), notes are hashed if None
+    '''
+    # Check cache
+    key = MIDIPlot_HashRender(notes, backend, note_value_name_map, note_value_color_map, start_time, notes_key=notes_key)
+    I = MIDIPlot_RenderCache_Get(key, cache_dir)
+    if I is not None: return I
+    # Plot
+    I = MIDIPLOT_BACKENDS[backend](notes, note_value_name_map=note_value_name_map, note_value_color_map=note_value_color_map, start_time=start_time)
+    if not isinstance(I, np.ndarray): I = MIDIPlot_FigureToImage(I)
+
+    return MIDIPlot_RenderCache_Put(key, I, cache_dir)
+
+# Main Vars
+MIDIPLOT_BACKENDS = {
+    "Matplotlib": MIDIPlot_PlotNotes_HBar,
+    "Raster": MIDIPlot_PlotNotes_Raster
+}
 
 # RunCode
@@ -0,0 +1,218 @@
+"""
+Visualiser Library - Piano Roll
+
+Visualisation Logic:
+- The whole roll of notes is rendered once into a tall raster (time along height, note values along width)
+- Each video frame is a slice view of this raster at the playhead time (no copy)
+- Only the playhead overlay is drawn on each frame and is restored after the frame is used
+    - Hence cost of each frame depends only on the overlay size and not on the number of notes
+"""
+
+# Imports
+import numpy as np
+## matplotlib is imported inside the functions that use them (slow to import)
+
+from Libraries.Utils import VideoUtils
+from Libraries.Utils import GIFUtils
+from Libraries.Utils import TraceUtils
+from Libraries.Visualisers.Visualiser_CircleBouncer import Util_Hex2RGB
+
+# Main Vars
+CMAP_DEFAULT = "rainbow"
+PROXY_PARAMS = {
+    "size": 128,
+    "fps": 8
+}
+NOTE_COLORS_CACHE = {}
+NOTE_COLORS_CACHE_MAX = 16
+
+# Util Functions
+def PianoRoll_GetNoteTimes(notes):
+    '''
+    Piano Roll - Get start and end times of notes
+    '''
+    STARTS = np.cumsum(np.array([note["delay"] for note in notes], dtype=float))
+    ENDS = STARTS + np.array([note["duration"] for note in notes], dtype=float)
+
+    return STARTS, ENDS
+
+def PianoRoll_GetNoteColors(UNIQUE_NOTES, cmap):
+    '''
+    Piano Roll - Get map of notes to colors picked from the colormap (cached, as it does not depend on the frame size or the notes played)
+    '''
+    import matplotlib
+
+    # Check cache
+    KEY = (tuple(UNIQUE_NOTES), cmap)
+    if KEY in NOTE_COLORS_CACHE.keys(): return NOTE_COLORS_CACHE[KEY]
+    # Set Note Colors
+    CMAP_LIST = np.array(matplotlib.colormaps[cmap](np.linspace(0, 1, len(UNIQUE_NOTES)))[:, :3]*255, dtype=np.uint8)
+    NOTE_COLOR_MAP = {UNIQUE_NOTES[i]: CMAP_LIST[i] for i in range(len(UNIQUE_NOTES))}
+    # Update cache
+    if len(NOTE_COLORS_CACHE) >= NOTE_COLORS_CACHE_MAX: NOTE_COLORS_CACHE.pop(next(iter(NOTE_COLORS_CACHE)))
+    NOTE_COLORS_CACHE[KEY] = NOTE_COLOR_MAP
+
+    return NOTE_COLOR_MAP
+
+# Main Functions
+@TraceUtils.TraceUtils_Trace()
+def PianoRoll_VisualiseNotes(notes, UNIQUE_NOTES, frame_size=(512, 512),
+    pixels_per_sec=128, playhead_pos=0.8,
+    value_range=None,
+    colors={
+        "background": "#000000",
+        "playhead": "#FFFFFF",
+        "note": {
+            "cmap": CMAP_DEFAULT
+        }
+    },
+    PROGRESS_BAR=None
+    ):
+    '''
+    Piano Roll - Visualise Notes
+
+    Parameters:
+    - notes: List of notes for the current track
+    - UNIQUE_NOTES: list of possible notes (note colors are picked from the colormap by position of the note in this list)
+    - frame_size: Size of visualisation frame (height, width)
+    - pixels_per_sec: Number of pixels the roll scrolls in one second
+    - playhead_pos: Position of playhead as fraction of frame height from the top (notes above it are upcoming)
+    - value_range: Range of note values shown along the width (range of used note values if None)
+    - colors: Parameters to control the colors used in the visualisation
+
+    Returns roll data to be used with PianoRoll_FrameSequence
+    '''
+    # Init
+    H, W = frame_size
+    PLAYHEAD_Y = int(round((H - 1) * playhead_pos))
+    STARTS, ENDS = PianoRoll_GetNoteTimes(notes)
+    DURATION = float(ENDS.max()) if len(notes) > 0 else 0.0
+    VALUES = np.array([note["value"] for note in notes], dtype=np.int64)
+    if value_range is None: value_range = (int(VALUES.min()), int(VALUES.max())) if len(notes) > 0 else (0, 0)
+    N_LANES = value_range[1] - value_range[0] + 1
+    LANE_EDGES = np.round(np.linspace(0, W, N_LANES + 1)).astype(int)
+    NOTE_COLOR_MAP = PianoRoll_GetNoteColors(UNIQUE_NOTES, colors["note"]["cmap"])
+    ## Roll raster (time 0 is PLAYHEAD_Y rows above the bottom and time increases upwards)
+    ROLL_H = int(np.ceil(DURATION * pixels_per_sec)) + H + 1
+    BASE_Y = ROLL_H - (H - PLAYHEAD_Y)
+    ROLL = np.empty((ROLL_H, W, 3), dtype=np.uint8)
+    ROLL[:] = Util_Hex2RGB(colors["background"])
+    # Draw Notes (each note is drawn once into the roll)
+    if PROGRESS_BAR is not None: PROGRESS_BAR.setTotal(len(notes))
+    Y_TOP = BASE_Y - np.ceil(ENDS * pixels_per_sec).astype(int)
+    Y_BOTTOM = BASE_Y - np.floor(STARTS * pixels_per_sec).astype(int)
+    for i in range(len(notes)):
+        lane = VALUES[i] - value_range[0]
+        if lane < 0 or lane >= N_LANES: continue
+        x0, x1 = LANE_EDGES[lane], LANE_EDGES[lane+1]
+        if x1 - x0 > 2: x0, x1 = x0 + 1, x1 - 1
+        if notes[i]["note"] in NOTE_COLOR_MAP.keys():
+            ROLL[Y_TOP[i]:max(Y_TOP[i]+1, Y_BOTTOM[i]-1), x0:x1] = NOTE_COLOR_MAP[notes[i]["note"]]
+        if PROGRESS_BAR is not None: PROGRESS_BAR.next()
+    if PROGRESS_BAR is not None: PROGRESS_BAR.close()
+    TraceUtils.TraceUtils_SetAttributes(notes=len(notes), roll_mb=round(ROLL.nbytes / (1024 * 1024), 2))
+
+    ROLL_DATA = {
+        "roll": ROLL,
+        "frame_size": frame_size,
+        "base_y": BASE_Y,
+        "playhead_y": PLAYHEAD_Y,
+        "pixels_per_sec": pixels_per_sec,
+        "duration": DURATION,
+        "playhead_color": np.array(Util_Hex2RGB(colors["playhead"]), dtype=np.uint8),
+        "colors": [Util_Hex2RGB(colors["background"]), Util_Hex2RGB(colors["playhead"])] + [tuple(c.tolist()) for c in NOTE_COLOR_MAP.values()]
+    }
+
+    return ROLL_DATA
+
+def PianoRoll_FrameSequence(ROLL_DATA, fps=24, duration=None, playhead_thickness=2):
+    '''
+    Piano Roll - Form Frame Sequence (items of {"frame", "duration"}) scrolling over the roll
+
+    Each frame is a view into the roll with the playhead drawn in place, which is restored when the next frame is taken
+    Hence each frame is only valid till the next item is taken from the sequence
+    Frames where the roll has not scrolled (eg. after the last note) are marked with "changed": False
+
+    Parameters,
+    - ROLL_DATA : Roll data from PianoRoll_VisualiseNotes
+    - fps : Frames per second
+    - duration : Duration of sequence (duration of notes if None, roll stays at the end after the notes)
+    - playhead_thickness : Thickness of playhead line in pixels
+    '''
+    # Init
+    ROLL = ROLL_DATA["roll"]
+    H, W = ROLL_DATA["frame_size"]
+    if duration is None: duration = ROLL_DATA["duration"]
+    N_FRAMES = max(1, int(np.ceil(duration * fps)))
+    MAX_SHIFT = int(np.ceil(ROLL_DATA["duration"] * ROLL_DATA["pixels_per_sec"]))
+    PH_Y0 = max(0, ROLL_DATA["playhead_y"] - playhead_thickness // 2)
+    PH_Y1 = min(H, PH_Y0 + playhead_thickness)
+    # Iterate over frames
+    prev_shift = None
+    for i in range(N_FRAMES):
+        shift = min(MAX_SHIFT, int(round(i / fps * ROLL_DATA["pixels_per_sec"])))
+        y0 = ROLL_DATA["base_y"] - ROLL_DATA["playhead_y"] - shift
+        FRAME = ROLL[y0:y0+H]
+        ## Draw playhead overlay (keeping the pixels under it)
+        PLAYHEAD_PIXELS = np.copy(FRAME[PH_Y0:PH_Y1])
+        FRAME[PH_Y0:PH_Y1] = ROLL_DATA["playhead_color"]
+        try:
+            yield {"frame": FRAME, "duration": 1.0 / fps, "changed": shift != prev_shift}
+        finally:
+            ## Restore pixels under overlay (also when the sequence is not read till the end)
+            FRAME[PH_Y0:PH_Y1] = PLAYHEAD_PIXELS
+        prev_shift = shift
+
+def PianoRoll_SaveVisualisationVideo(ROLL_DATA, audio_path, save_path, fps=24, encoder_params=None, PROGRESS_BAR=None):
+    '''
+    Piano Roll - Save Roll with Audio as Visualisation Video (video lasts as long as the audio)
+    '''
+    DURATION = VideoUtils.VideoUtils_GetDuration(audio_path)
+    FRAMES = PianoRoll_FrameSequence(ROLL_DATA, fps=fps, duration=DURATION)
+    VideoUtils.VideoUtils_SaveFrameSequence(FRAMES, save_path, duration=DURATION, audio_path=audio_path, fps=fps, encoder_params=encoder_params, PROGRESS_BAR=PROGRESS_BAR)
+
+def PianoRoll_RenderVideo(save_path, notes, UNIQUE_NOTES, audio_path, vis_params={}, fps=24, encoder_params=None, PROGRESS_BAR=None):
+    '''
+    Piano Roll - Visualise Notes and save the roll with audio as video (vis_params are passed to PianoRoll_VisualiseNotes)
+    '''
+    ROLL_DATA = PianoRoll_VisualiseNotes(notes, UNIQUE_NOTES, PROGRESS_BAR=PROGRESS_BAR, **vis_params)
+    PianoRoll_SaveVisualisationVideo(ROLL_DATA, audio_path, save_path, fps=fps, encoder_params=encoder_params, PROGRESS_BAR=PROGRESS_BAR)
+
+def PianoRoll_SaveVisualisationGIF(ROLL_DATA, save_path, fps=24, duration=None, PROGRESS_BAR=None):
+    '''
+    Piano Roll - Save Roll as GIF (palette is the colors of the roll, see GIFUtils.GIFUtils_SaveFrameSequence)
+    '''
+    PALETTE = GIFUtils.GIFUtils_GetPalette(ROLL_DATA["colors"])
+    FRAMES = PianoRoll_FrameSequence(ROLL_DATA, fps=fps, duration=duration)
+    if PROGRESS_BAR is not None: PROGRESS_BAR.setTotal(int(round((ROLL_DATA["duration"] if duration is None else duration) * 100)))
+    GIFUtils.GIFUtils_SaveFrameSequence(FRAMES, save_path, PALETTE, PROGRESS_BAR=PROGRESS_BAR)
+
+def PianoRoll_RenderGIF(save_path, notes, UNIQUE_NOTES, vis_params={}, fps=24, PROGRESS_BAR=None):
+    '''
+    Piano Roll - Visualise Notes and save the roll as GIF (vis_params are passed to PianoRoll_VisualiseNotes)
+    '''
+    ROLL_DATA = PianoRoll_VisualiseNotes(notes, UNIQUE_NOTES, PROGRESS_BAR=PROGRESS_BAR, **vis_params)
+    PianoRoll_SaveVisualisationGIF(ROLL_DATA, save_path, fps=fps, PROGRESS_BAR=PROGRESS_BAR)
+
+def PianoRoll_GetProxyParams(vis_params, fps=24, size=PROXY_PARAMS["size"], proxy_fps=PROXY_PARAMS["fps"]):
+    '''
+    Piano Roll - Get visualisation params and fps for a low resolution, low fps proxy of a render
+
+    Scroll speed is scaled with the frame, so the proxy shows the same window of time as the full render
+
+    Parameters,
+    - vis_params : Visualisation params of the full render
+    - fps : FPS of the full render
+    - size : Size of the larger side of the proxy frame
+    - proxy_fps : Maximum FPS of the proxy
+    '''
+    PROXY_VIS_PARAMS = dict(vis_params)
+    FRAME_SIZE = vis_params.get("frame_size", (512, 512))
+    SCALE = min(1.0, size / max(FRAME_SIZE))
+    PROXY_VIS_PARAMS["frame_size"] = (max(1, int(FRAME_SIZE[0]*SCALE)), max(1, int(FRAME_SIZE[1]*SCALE)))
+    PROXY_VIS_PARAMS["pixels_per_sec"] = max(1, int(round(vis_params.get("pixels_per_sec", 128)*SCALE)))
+
+    return PROXY_VIS_PARAMS, min(fps, proxy_fps)
+
+
+# RunCode
@@ -23,6 +23,9 @@ Visualiser for music and audio using python
         - Generates a randomised sequence of notes
         - Each new note is generated by selecting from all the notes with each note having a defined probability
         - This probability distribution can be constant or calculated at each iteration based on the already generated sequence
+    - Markov
+        - Learns how often each note (value, duration and delay) follows the previous notes from a directory of MIDI files
+        - Generates notes by sampling from these learnt transitions
 
 ## Visualisers
 - These are libraries to visualise the generated music and notes
@@ -39,36 +42,325 @@ Visualiser for music and audio using python
         - Each track is visualised as a separate pointer since tracks are independent of each other
         - This is purely sequential and hence for overlapping notes, the pointer takes the position of the latest note it encountered
             - I.e. pointer movement is based on delay parameter and not on duration, hence if 2 notes overlap the pointer stays on the older note only till the delay for the next note is over
+    - Piano Roll
+        - Visualise the notes as a scrolling piano roll with a playhead
+        - The whole roll is rendered once and each frame is a window of it at the playhead, so long and high fps videos are cheap
 
 
 """
 
 # Imports
+import os
+import json
+import time
+import argparse
+import importlib
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 ## Util Imports
 from Libraries.Utils.AudioUtils import *
-## Music Generator Imports
-from Libraries.MusicGenerators import MusicGenerator_Piano
-## Note Generator Imports
-from Libraries.NoteGenerators import NoteGenerator_RandomSequence
-## Visualiser Imports
-from Libraries.Visualisers import Visualiser_MIDIPlot
-from Libraries.Visualisers import Visualiser_CircleBouncer
+from Libraries.Utils import ArtifactUtils
+from Libraries.Utils import TraceUtils
+## Library Imports (Music Generators, Note Generators and Visualisers are imported on first use through LIBRARIES)
+
+# Main Classes
+class LazyLibraries(dict):
+    def __init__(self, module_paths):
+        '''
+        Lazy Libraries
+
+        Dict of library names to module paths, each module is imported when it is first accessed
+        - Keeps import of MusicVis (and of every worker process) fast, only the used libraries and their dependencies are loaded
+        '''
+        super().__init__(module_paths)
+
+    def __getitem__(self, name):
+        module = super().__getitem__(name)
+        if isinstance(module, str):
+            module = importlib.import_module(module)
+            super().__setitem__(name, module)
+        return module
+
+    def get(self, name, default=None):
+        return self[name] if name in self.keys() else default
+
+    def values(self):
+        return [self[name] for name in self.keys()]
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
 
 # Main Vars
 LIBRARIES = {
-    "MusicGenerator": {
-        "Piano": MusicGenerator_Piano
-    },
-    "NoteGenerator": {
-        "RandomSequence": NoteGenerator_RandomSequence
-    },
-    "Visualisers": {
-        "MIDIPlot": Visualiser_MIDIPlot,
-        "CircleBouncer": Visualiser_CircleBouncer
-    }
+    "MusicGenerator": LazyLibraries({
+        "Piano": "Libraries.MusicGenerators.MusicGenerator_Piano"
+    }),
+    "NoteGenerator": LazyLibraries({
+        "RandomSequence": "Libraries.NoteGenerators.NoteGenerator_RandomSequence",
+        "Markov": "Libraries.NoteGenerators.NoteGenerator_Markov"
+    }),
+    "Visualisers": LazyLibraries({
+        "MIDIPlot": "Libraries.Visualisers.Visualiser_MIDIPlot",
+        "CircleBouncer": "Libraries.Visualisers.Visualiser_CircleBouncer",
+        "PianoRoll": "Libraries.Visualisers.Visualiser_PianoRoll"
+    })
 }
 
+BATCH_PATHS = {
+    "chords": "Data/SoundCodes/chords.json",
+    "tracks": "Data/SoundCodes/tracks.json"
+}
+BATCH_INPUT_EXTENSIONS = {
+    ".mid": "midi",
+    ".midi": "midi",
+    ".json": "json"
+}
+BATCH_STAGES = ["extract", "decompose", "synthesize", "visualise", "encode"]
+BATCH_VISUALISERS = ["CircleBouncer", "PianoRoll"]
+BATCH_STAGE_LIMITS = {}
+
 # Main Functions
+## Batch Util Functions
+def MusicVis_Batch_InitWorker(STAGE_LIMITS):
+    '''
+    MusicVis - Batch - Init worker process (load sound codes and set shared stage concurrency limits)
+    '''
+    LIBRARIES["MusicGenerator"]["Piano"].CHORDS = json.load(open(BATCH_PATHS["chords"], "r"))
+    LIBRARIES["MusicGenerator"]["Piano"].TRACKS = json.load(open(BATCH_PATHS["tracks"], "r"))
+    BATCH_STAGE_LIMITS.clear()
+    BATCH_STAGE_LIMITS.update(STAGE_LIMITS)
+
+@contextlib.contextmanager
+def MusicVis_Batch_Stage(stage, **attrs):
+    '''
+    MusicVis - Batch - Context to run a stage in (limits how many workers run the stage at the same time and traces the stage)
+    '''
+    wait_start = time.perf_counter()
+    with BATCH_STAGE_LIMITS.get(stage, contextlib.nullcontext()):
+        with TraceUtils.TraceUtils_Span(stage, wait_ms=(time.perf_counter() - wait_start) * 1000, **attrs):
+            yield
+
+def MusicVis_Batch_LoadNotesJSON(path):
+    '''
+    MusicVis - Batch - Load tracks of notes from JSON file
+
+    JSON can be,
+    - List of notes (one track)
+    - List of lists of notes (one track per list)
+    - Dict with "tracks" as a list of {"notes": [...], "common_params": {...}} ("common_params" is optional)
+    '''
+    DATA = json.load(open(path, "r"))
+    if isinstance(DATA, dict): return [(t["notes"], t.get("common_params", {})) for t in DATA["tracks"]]
+    if len(DATA) > 0 and isinstance(DATA[0], list): return [(notes, {}) for notes in DATA]
+    return [(DATA, {})]
 
+def MusicVis_Batch_MergeTracks(TRACKS_NOTES):
+    '''
+    MusicVis - Batch - Merge tracks into one sequence of notes ordered by start time (delays are recomputed)
+    '''
+    NOTES_TIMED = []
+    for notes in TRACKS_NOTES:
+        cur_time = 0.0
+        for note in notes:
+            cur_time += note["delay"]
+            NOTES_TIMED.append((cur_time, note))
+    NOTES_TIMED = sorted(NOTES_TIMED, key=lambda x: x[0])
+    NOTES = []
+    prev_time = 0.0
+    for cur_time, note in NOTES_TIMED:
+        NOTES.append(dict(note, delay=cur_time - prev_time))
+        prev_time = cur_time
 
-# RunCode
\ No newline at end of file
+    return NOTES
+
+def MusicVis_Batch_GetOutputPaths(input_path, output_dir, input_dir=None, gif=False):
+    '''
+    MusicVis - Batch - Get output paths of an input file
+
+    Outputs mirror the path of the input relative to input_dir (only its file name if None) and keep its extension,
+    eg. <input_dir>/a/x.mid -> <output_dir>/a/x.mid.(mid|wav|mp4|gif), so that no two input files share outputs
+    '''
+    name = os.path.relpath(input_path, input_dir) if input_dir is not None else os.path.basename(input_path)
+    OUTPUTS = [("midi", ".mid"), ("wav", ".wav"), ("mp4", ".mp4")] + ([("gif", ".gif")] if gif else [])
+
+    return {k: os.path.join(output_dir, name + ext) for k, ext in OUTPUTS}
+
+## Batch Functions
+def MusicVis_Batch_RenderFile(input_path, output_dir, visualiser="PianoRoll", vis_params={}, fps=24, encoder_params=None, gif=False, trace=False, input_dir=None):
+    '''
+    MusicVis - Batch - Render a MIDI or note JSON file to MIDI, WAV and MP4 (extract, decompose, synthesize, visualise, encode)
+
+    All tracks are synthesized together and visualised as one merged sequence of notes
+    Outputs are written atomically to the paths from MusicVis_Batch_GetOutputPaths, with .gif if gif is True
+    If trace is True, the trace events of the file are returned with the result
+    '''
+    # Init
+    if trace: TraceUtils.TraceUtils_Start()
+    PIANO = LIBRARIES["MusicGenerator"]["Piano"]
+    VISUALISER = LIBRARIES["Visualisers"][visualiser]
+    TIMES = {}
+    OUTPUT_PATHS = MusicVis_Batch_GetOutputPaths(input_path, output_dir, input_dir=input_dir, gif=gif)
+    os.makedirs(os.path.dirname(OUTPUT_PATHS["mp4"]), exist_ok=True)
+    # Extract
+    start_time = time.time()
+    with MusicVis_Batch_Stage("extract", file=input_path):
+        if BATCH_INPUT_EXTENSIONS[os.path.splitext(input_path)[1].lower()] == "midi":
+            MIDIAudio = PIANO.AudioGen_LoadMIDI(input_path)
+            TRACKS = [(notes, {}) for notes in PIANO.MIDI_ExtractNotes(MIDIAudio)]
+        else:
+            TRACKS = MusicVis_Batch_LoadNotesJSON(input_path)
+    TIMES["extract"] = time.time() - start_time
+    # Decompose
+    start_time = time.time()
+    with MusicVis_Batch_Stage("decompose"):
+        TRACKS_NOTES = []
+        for notes, common_params in TRACKS:
+            COMMON_PARAMS = dict(PIANO.TRACKS["default"]["common_params"])
+            COMMON_PARAMS.update(common_params)
+            TRACKS_NOTES.append(PIANO.Note_MaterializeNotes(
+                PIANO.Note_DecomposeNotesToKeys(notes, common_params=COMMON_PARAMS)
+            ))
+        TRACKS_NOTES = [notes for notes in TRACKS_NOTES if len(notes) > 0]
+        if len(TRACKS_NOTES) == 0: raise ValueError(f"No notes found in {input_path}")
+    TIMES["decompose"] = time.time() - start_time
+    # Synthesize
+    start_time = time.time()
+    with MusicVis_Batch_Stage("synthesize"):
+        MIDIAudio = PIANO.MIDIFile(len(TRACKS_NOTES))
+        for t in range(len(TRACKS_NOTES)):
+            MIDIAudio = PIANO.MIDI_AddTrack(TRACKS_NOTES[t], MIDIAudio=MIDIAudio, track=t, start_time=0, tempo=60)
+        ArtifactUtils.ArtifactUtils_WriteAtomic(OUTPUT_PATHS["midi"], lambda p: PIANO.AudioGen_SaveMIDI(MIDIAudio, save_path=p))
+        ArtifactUtils.ArtifactUtils_WriteAtomic(OUTPUT_PATHS["wav"], lambda p: Utils_MIDI2WAV(OUTPUT_PATHS["midi"], p))
+    TIMES["synthesize"] = time.time() - start_time
+    # Visualise
+    start_time = time.time()
+    NOTES = MusicVis_Batch_MergeTracks(TRACKS_NOTES)
+    UNIQUE_NOTES = PIANO.AVAILABLE_NOTES
+    with MusicVis_Batch_Stage("visualise"):
+        if visualiser == "CircleBouncer":
+            ## Clean chords (notes with delay 0 causing visualisation jumps)
+            NOTES = [note for ni, note in enumerate(NOTES) if ni == 0 or note["delay"] != 0]
+            VIS_DATA = VISUALISER.CircleBouncer_VisualiseNotes(NOTES, UNIQUE_NOTES, **vis_params)
+        else:
+            VIS_DATA = VISUALISER.PianoRoll_VisualiseNotes(NOTES, UNIQUE_NOTES, **vis_params)
+    TIMES["visualise"] = time.time() - start_time
+    # Encode
+    start_time = time.time()
+    with MusicVis_Batch_Stage("encode"):
+        if visualiser == "CircleBouncer":
+            ArtifactUtils.ArtifactUtils_WriteAtomic(OUTPUT_PATHS["mp4"], lambda p: VISUALISER.VideoUtils_SaveVisualisationVideo(NOTES, VIS_DATA, OUTPUT_PATHS["wav"], p, fps=fps, encoder_params=encoder_params))
+            if gif: ArtifactUtils.ArtifactUtils_WriteAtomic(OUTPUT_PATHS["gif"], lambda p: VISUALISER.CircleBouncer_SaveVisualisationGIF(NOTES, VIS_DATA, UNIQUE_NOTES, p, vis_params=vis_params))
+        else:
+            ArtifactUtils.ArtifactUtils_WriteAtomic(OUTPUT_PATHS["mp4"], lambda p: VISUALISER.PianoRoll_SaveVisualisationVideo(VIS_DATA, OUTPUT_PATHS["wav"], p, fps=fps, encoder_params=encoder_params))
+            if gif: ArtifactUtils.ArtifactUtils_WriteAtomic(OUTPUT_PATHS["gif"], lambda p: VISUALISER.PianoRoll_SaveVisualisationGIF(VIS_DATA, p, fps=fps))
+    TIMES["encode"] = time.time() - start_time
+
+    return {
+        "input": input_path,
+        "outputs": OUTPUT_PATHS,
+        "notes": len(NOTES),
+        "times": TIMES,
+        "trace": TraceUtils.TraceUtils_Stop() if trace else []
+    }
+
+def MusicVis_Batch_Render(input_dir, output_dir, visualiser="PianoRoll", vis_params={}, fps=24, encoder_params=None, gif=False, n_workers=1, stage_limits={}, overwrite=False, trace_path=None):
+    '''
+    MusicVis - Batch - Render all MIDI and note JSON files in a directory (searched recursively) over a pool of worker processes
+
+    Parameters,
+    - input_dir : Directory of input files
+    - output_dir : Directory to write outputs to
+    - visualiser : Visualiser to use (one of BATCH_VISUALISERS)
+    - vis_params : Parameters for the visualiser
+    - fps : Frames per second of videos
+    - encoder_params : Video encoder settings (over VideoUtils.ENCODER_PARAMS_DEFAULT, eg. {"preset": "veryfast", "crf": 28})
+    - gif : Whether to also export each visualisation as GIF
+    - n_workers : Number of worker processes
+    - stage_limits : Maximum number of workers running each stage at the same time (eg. {"encode": 2}), unlimited if missing
+    - overwrite : Whether to render files whose video already exists
+    Outputs mirror the paths of the inputs relative to input_dir (see MusicVis_Batch_GetOutputPaths)
+    - trace_path : Path to save Chrome trace JSON of all files to (not traced if None)
+    '''
+    # Init
+    INPUT_PATHS = sorted([
+        os.path.join(root, f)
+        for root, dirs, files in os.walk(input_dir) for f in files
+        if os.path.splitext(f)[1].lower() in BATCH_INPUT_EXTENSIONS.keys()
+    ])
+    if not overwrite:
+        INPUT_PATHS = [
+            p for p in INPUT_PATHS
+            if not os.path.exists(MusicVis_Batch_GetOutputPaths(p, output_dir, input_dir=input_dir)["mp4"])
+        ]
+    CONTEXT = multiprocessing.get_context("spawn")
+    STAGE_LIMITS = {stage: CONTEXT.BoundedSemaphore(stage_limits[stage]) for stage in stage_limits.keys()}
+    RESULTS = []
+    print(f"Files: {len(INPUT_PATHS)}")
+    # Render
+    START_TIME = time.time()
+    with ProcessPoolExecutor(max(1, n_workers), mp_context=CONTEXT, initializer=MusicVis_Batch_InitWorker, initargs=(STAGE_LIMITS,)) as EXECUTOR:
+        FUTURES = {
+            EXECUTOR.submit(MusicVis_Batch_RenderFile, path, output_dir, visualiser, vis_params, fps, encoder_params, gif, trace_path is not None, input_dir): path
+            for path in INPUT_PATHS
+        }
+        for i, future in enumerate(as_completed(FUTURES)):
+            try:
+                RESULTS.append(dict(future.result(), status="done"))
+            except Exception as e:
+                RESULTS.append({"input": FUTURES[future], "status": "failed", "error": str(e)})
+            elapsed = time.time() - START_TIME
+            print(f"[{i+1}/{len(INPUT_PATHS)}] {RESULTS[-1]['status']}: {FUTURES[future]} ({(i+1) / max(elapsed, 1e-6) * 60:.2f} files/minute)")
+    # Throughput
+    ELAPSED = time.time() - START_TIME
+    N_DONE = len([r for r in RESULTS if r["status"] == "done"])
+    STAGE_TIMES = {stage: sum([r["times"][stage] for r in RESULTS if r["status"] == "done"]) for stage in BATCH_STAGES}
+    print(f"Done: {N_DONE}/{len(INPUT_PATHS)} in {ELAPSED:.2f}s ({N_DONE / max(ELAPSED, 1e-6) * 60:.2f} files/minute)")
+    print("Stage Times (s): " + ", ".join([f"{stage}: {STAGE_TIMES[stage]:.2f}" for stage in BATCH_STAGES]))
+    # Trace
+    if trace_path is not None:
+        TraceUtils.TraceUtils_SaveChromeTrace(sum([r["trace"] for r in RESULTS if r["status"] == "done"], []), trace_path)
+        print(f"Trace: {trace_path}")
+
+    return RESULTS
+
+# RunCode
+if __name__ == "__main__":
+    # Parse Args
+    parser = argparse.ArgumentParser(description="Batch render MIDI and note JSON files to videos")
+    parser.add_argument("input_dir", help="Directory of MIDI (.mid, .midi) and note JSON (.json) files")
+    parser.add_argument("output_dir", help="Directory to write MIDI, WAV and MP4 outputs to")
+    parser.add_argument("--visualiser", default="PianoRoll", choices=BATCH_VISUALISERS, help="Visualiser to use")
+    parser.add_argument("--size", type=int, default=512, help="Size of video frames")
+    parser.add_argument("--fps", type=int, default=24, help="Frames per second of videos")
+    parser.add_argument("--preset", default=None, help="Encoder preset (eg. ultrafast, veryfast, medium, slow), faster presets give larger files")
+    parser.add_argument("--crf", type=int, default=None, help="Encoder constant rate factor (lower is better quality and larger files)")
+    parser.add_argument("--threads", type=int, default=None, help="Encoder threads per video (0 lets the encoder pick)")
+    parser.add_argument("--pix-fmt", default=None, help="Pixel format of videos (eg. yuv420p)")
+    parser.add_argument("--vfr", action="store_true", help="Encode videos with a variable frame rate (frames are only encoded when they change)")
+    parser.add_argument("--gif", action="store_true", help="Also export each visualisation as GIF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument(
+        "--stage-limit", action="append", default=[], metavar="STAGE=N",
+        help=f"Maximum number of workers running a stage at the same time (stages: {', '.join(BATCH_STAGES)}), can be repeated"
+    )
+    parser.add_argument("--overwrite", action="store_true", help="Render files whose video already exists")
+    parser.add_argument("--trace", default=None, help="Path to save Chrome trace JSON of the stages of all files to")
+    args = parser.parse_args()
+    # Run
+    STAGE_LIMITS = {}
+    for limit in args.stage_limit:
+        stage, n = limit.split("=")
+        if stage not in BATCH_STAGES: parser.error(f"Unknown stage {stage}")
+        STAGE_LIMITS[stage] = int(n)
+    VIS_PARAMS = {"frame_size": (args.size, args.size)}
+    if args.visualiser == "CircleBouncer": VIS_PARAMS["frames_per_notesec"] = args.fps
+    ENCODER_PARAMS = {
+        k: v for k, v in [("preset", args.preset), ("crf", args.crf), ("threads", args.threads), ("pix_fmt", args.pix_fmt)]
+        if v is not None
+    }
+    if args.vfr: ENCODER_PARAMS["vfr"] = True
+    MusicVis_Batch_Render(
+        args.input_dir, args.output_dir, visualiser=args.visualiser, vis_params=VIS_PARAMS, fps=args.fps, encoder_params=ENCODER_PARAMS, gif=args.gif,
+        n_workers=args.workers, stage_limits=STAGE_LIMITS, overwrite=args.overwrite, trace_path=args.trace
+    )
\ No newline at end of file
@@ -4,13 +4,19 @@ Stream lit GUI for hosting MusicVis
 
 # Imports
 import os
-import av
 import json
+import uuid
+import hashlib
 import functools
+import threading
 import streamlit as st
-import matplotlib.pyplot as plt
+from collections import OrderedDict
 
 from MusicVis import *
+from Libraries.Utils import ArtifactUtils
+from Libraries.Utils import JobUtils
+from Libraries.Utils import TraceUtils
+from Libraries.Utils import VideoUtils
 
 # Main Vars
 config = json.load(open("./StreamLitGUI/UIConfig.json", "r"))
@@ -26,12 +32,25 @@ def main():
         )
     )
     
-    if selected_box == config["PROJECT_NAME"]:
-        HomePage()
-    else:
-        correspondingFuncName = selected_box.replace(" ", "_").lower()
-        if correspondingFuncName in globals().keys():
-            globals()[correspondingFuncName]()
+    # Tracing (trace of the last run which ran any stage is shown till the current run finishes, as a stopped run cannot update the page)
+    USERINPUT_Trace = st.sidebar.checkbox("Trace Pipeline", value=False)
+    if USERINPUT_Trace:
+        TRACE_PLACEHOLDER = st.sidebar.empty()
+        UI_TraceSummary(st.session_state.get("trace_events", []), TRACE_PLACEHOLDER, key="trace_last")
+        TraceUtils.TraceUtils_Start()
+    try:
+        if selected_box == config["PROJECT_NAME"]:
+            HomePage()
+        else:
+            correspondingFuncName = selected_box.replace(" ", "_").lower()
+            if correspondingFuncName in globals().keys():
+                globals()[correspondingFuncName]()
+    finally:
+        if USERINPUT_Trace:
+            TRACE_EVENTS = TraceUtils.TraceUtils_Stop()
+            if len(TRACE_EVENTS) > 0:
+                st.session_state["trace_events"] = TRACE_EVENTS
+                UI_TraceSummary(TRACE_EVENTS, TRACE_PLACEHOLDER, key="trace_current")
  
 
 def HomePage():
@@ -44,15 +63,11 @@ def HomePage():
 # Repo Based Vars
 PATHS = {
     "cache": "StreamLitGUI/CacheData/Cache.json",
-    "midi_save_path": "Data/GeneratedAudio/generated_midi_{track}.mid",
-    "wav_save_path": "Data/GeneratedAudio/generated_wav_{track}.wav",
+    "artifacts": "Data/Artifacts/",
     "chords": "Data/SoundCodes/chords.json",
     "tracks": "Data/SoundCodes/tracks.json",
-    "temp": {
-        "audio": "Data/Temp/audio_{track}.wav",
-        "video": "Data/Temp/video_{track}.mp4",
-        "midi": "Data/Temp/midi.mid"
-    }
+    "markov_model": "Data/Models/Markov/",
+    "midiplot_cache": "Data/Cache/MIDIPlot/"
 }
 
 # Util Vars
@@ -87,8 +102,30 @@ NOTE_PARAMS_INFO = {
     }
 }
 NOTE_PARAM_KEYS = list(NOTE_PARAMS_INFO.keys())
+NOTE_VALUE_NAME_MAP = { # Note value names for MIDI plots (computed once, not on every rerun)
+    v: LIBRARIES["MusicGenerator"]["Piano"].AVAILABLE_NOTES[
+        (v - LIBRARIES["MusicGenerator"]["Piano"].NOTE_VALUE_RANGE[0]) % len(LIBRARIES["MusicGenerator"]["Piano"].AVAILABLE_NOTES)
+    ]
+    for v in range(LIBRARIES["MusicGenerator"]["Piano"].NOTE_VALUE_RANGE[0], LIBRARIES["MusicGenerator"]["Piano"].NOTE_VALUE_RANGE[1]+1)
+}
 DISPLAY_INTERMEDIATE_INFO = True
+NOTES_DISPLAY_PAGE_SIZES = [25, 100, 500]
 VISUALISATION_SIZE = 512
+GENERATION_CHECKPOINTS_MAX = 16
+MIDI_UPLOADS_PARSED_MAX = 8
+MIDI_UPLOADS_NOTES_MAX = 64
+JOB_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+ENCODER_PARAMS = { # Video encoder settings of this deployment (over VideoUtils.ENCODER_PARAMS_DEFAULT, faster presets give larger files)
+    "preset": "medium",
+    "crf": 23,
+    "threads": 0,
+    "vfr": True # Frames are only encoded when they change
+}
+PROXY_ENCODER_PARAMS = dict(ENCODER_PARAMS, preset="ultrafast")
+CACHE_HASH_FUNCS = { # Resolved notes are hashed by their layers without materializing (types are given by name, so the library is not imported here)
+    "Libraries.MusicGenerators.MusicGenerator_Piano.ResolvedNotes": repr,
+    "Libraries.MusicGenerators.MusicGenerator_Piano.NoteView": repr
+}
 
 # Util Functions
 def LoadCache():
@@ -174,46 +211,123 @@ def NoteCode_GetNoteCode(note):
     return note_code
 
 # Streamlit Cached Functions
-# @st.cache_data # Disabled since USERINPUT_MIDIFile cannot be cached
-def CACHEDFUNC_MIDI_ExtractNotes(USERINPUT_MIDIFile, USERINPUT_ClipTime, USERINPUT_Speed):
+@st.cache_resource(max_entries=MIDI_UPLOADS_PARSED_MAX)
+def CACHEDFUNC_MIDI_LoadMIDIBytes(midi_hash, _midi_bytes):
+    '''
+    Streamlit Cached Function - MIDI - Parse uploaded MIDI bytes (cached by hash of the bytes, shared as read only)
+    '''
+    return LIBRARIES["MusicGenerator"]["Piano"].AudioGen_LoadMIDIBytes(_midi_bytes)
+
+@st.cache_data(max_entries=MIDI_UPLOADS_NOTES_MAX)
+def CACHEDFUNC_MIDI_ExtractNotes(midi_hash, _midi_bytes, USERINPUT_ClipTime, USERINPUT_Speed):
     '''
-    Streamlit Cached Function - MIDI - Extract Notes
+    Streamlit Cached Function - MIDI - Extract Notes (cached by hash of the MIDI bytes, clip time and speed)
     '''
+    MIDIAudio = CACHEDFUNC_MIDI_LoadMIDIBytes(midi_hash, _midi_bytes)
     USERINPUT_InputTracks_Notes = LIBRARIES["MusicGenerator"]["Piano"].MIDI_ExtractNotes(
-        USERINPUT_MIDIFile, clip_time=USERINPUT_ClipTime, speed=USERINPUT_Speed
+        MIDIAudio, clip_time=USERINPUT_ClipTime, speed=USERINPUT_Speed
     )
 
     return USERINPUT_InputTracks_Notes
 
-@st.cache_data
+@st.cache_resource
+def CACHEDFUNC_Markov_LoadModel(model_dir, model_mtime):
+    '''
+    Streamlit Cached Function - Markov - Load Model (Reloaded only when the saved model changes)
+    '''
+    MODEL = LIBRARIES["NoteGenerator"]["Markov"].Markov_LoadModel(model_dir)
+
+    return MODEL
+
+@st.cache_resource
+def CACHEDFUNC_RandomSequence_GetCheckpoints():
+    '''
+    Streamlit Cached Function - Random Sequence - Get store of generation checkpoints (shared across reruns and sessions, so guarded by a lock)
+    '''
+    return OrderedDict(), threading.Lock()
+
+def CACHEDFUNC_RandomSequence_GenerateNotes(N, ENV_UPDATE_FUNC, MAPS, seed=0):
+    '''
+    Streamlit Cached Function - Random Sequence - Generate Notes
+
+    Generated notes are cached by (seed, distribution, params), so asking for more notes only generates the new notes
+    Notes are same as RandomSequence_GenerateNotes for the same seed (single random stream), as used by BatchGenerator
+    '''
+    # Init
+    CHECKPOINTS, CHECKPOINTS_LOCK = CACHEDFUNC_RandomSequence_GetCheckpoints()
+    BASE_FUNC = ENV_UPDATE_FUNC.func if isinstance(ENV_UPDATE_FUNC, functools.partial) else ENV_UPDATE_FUNC
+    FUNC_PARAMS = ENV_UPDATE_FUNC.keywords if isinstance(ENV_UPDATE_FUNC, functools.partial) else {}
+    KEY = hashlib.sha256(json.dumps(
+        [BASE_FUNC.__name__, FUNC_PARAMS, MAPS["value_name"], seed], sort_keys=True, default=str
+    ).encode()).hexdigest()
+    ## Copy checkpoint so that generation runs outside the lock
+    with CHECKPOINTS_LOCK:
+        CHECKPOINT = CHECKPOINTS.get(KEY, None)
+        if CHECKPOINT is not None: CHECKPOINT = dict(CHECKPOINT, notes=list(CHECKPOINT["notes"]))
+    # Generate
+    NOTES_DATA = LIBRARIES["NoteGenerator"]["RandomSequence"].RandomSequence_ResumeNotes(
+        N, ENV_UPDATE_FUNC, MAPS, seed=seed, CHECKPOINT=CHECKPOINT, chunk_size=None
+    )
+    # Update cache (Keep the longest checkpoint if another session resumed the same key meanwhile)
+    CHECKPOINT = NOTES_DATA.pop("checkpoint")
+    with CHECKPOINTS_LOCK:
+        if KEY not in CHECKPOINTS.keys() or len(CHECKPOINTS[KEY]["notes"]) <= len(CHECKPOINT["notes"]):
+            CHECKPOINTS[KEY] = CHECKPOINT
+        CHECKPOINTS.move_to_end(KEY)
+        while len(CHECKPOINTS) > GENERATION_CHECKPOINTS_MAX: CHECKPOINTS.popitem(last=False)
+    ## Copy notes as they are modified later and the cached notes should not change
+    NOTES_DATA["notes"] = [dict(note) for note in NOTES_DATA["notes"]]
+
+    return NOTES_DATA
+
+@st.cache_data(hash_funcs=CACHE_HASH_FUNCS)
 def CACHEDFUNC_Note_DecomposeNotesToKeys(USERINPUT_Notes, USERINPUT_CommonParams):
     '''
     Streamlit Cached Function - Note - Decompose Notes to Keys
+
+    Also returns a key of the decomposed notes (computed only on cache misses) to look up their plots without rehashing the notes
     '''
+    NOTES_KEY = ArtifactUtils.ArtifactUtils_HashInputs("decomposed_notes", {"notes": USERINPUT_Notes, "common_params": USERINPUT_CommonParams})
     USERINPUT_Notes = LIBRARIES["MusicGenerator"]["Piano"].Note_DecomposeNotesToKeys(USERINPUT_Notes, common_params=USERINPUT_CommonParams)
 
-    return USERINPUT_Notes
+    return USERINPUT_Notes, NOTES_KEY
+
+@st.cache_data(hash_funcs=CACHE_HASH_FUNCS)
+def CACHEDFUNC_Note_GetNotesStats(USERINPUT_Notes):
+    '''
+    Streamlit Cached Function - Note - Get Notes Stats
+    '''
+    STATS = LIBRARIES["MusicGenerator"]["Piano"].Note_GetNotesStats(USERINPUT_Notes)
+
+    return STATS
 
-@st.cache_data
-def CACHEDFUNC_GenerateAudioTracksFromNotes(USERINPUT_Tracks_Inputs):
+@st.cache_data(hash_funcs=CACHE_HASH_FUNCS)
+def CACHEDFUNC_GenerateMIDITracksFromNotes(USERINPUT_Tracks_Inputs):
     '''
-    Streamlit Cached Function -
+    Streamlit Cached Function - Generate MIDI artifacts for each track and the combined MIDI artifact
+
+    WAV artifacts are synthesized as background jobs outside this function (see UI_GenerateAudioTracksFromNotes),
+    so that the job slots of the session are updated even when this function is cached
     '''
     # Init
     TRACKS_DATA = {
+        "tracks": [],
+        "errors": [None]*len(USERINPUT_Tracks_Inputs),
         "notes": [],
-        "audio_paths": [],
-        "midi_audios": []
+        "midi_audios": [],
+        "midi_paths": []
     }
-    # Generate Audio From Notes
+    # Generate MIDI From Notes
     TRACKS_WORKING = [True]*len(USERINPUT_Tracks_Inputs)
     MIDIAudio_Combined = LIBRARIES["MusicGenerator"]["Piano"].MIDIFile(len(USERINPUT_Tracks_Inputs))
-    TRACK_COLS = st.columns(len(USERINPUT_Tracks_Inputs))
     for t in range(len(USERINPUT_Tracks_Inputs)):
-        st_track = TRACK_COLS[t]
         USERINPUT_Inputs = USERINPUT_Tracks_Inputs[t]
         ## Resolve Notes
         NOTES = USERINPUT_Inputs["notes"]
+        ARTIFACT_INPUTS = { # Plain dicts of the resolved notes (for hashing)
+            "notes": LIBRARIES["MusicGenerator"]["Piano"].Note_MaterializeNotes(NOTES),
+            "tempo": USERINPUT_Inputs["other_params"]["tempo"]
+        }
         ## Add track
         MIDIAudio = LIBRARIES["MusicGenerator"]["Piano"].MIDI_AddTrack(
             NOTES, 
@@ -222,10 +336,14 @@ def CACHEDFUNC_GenerateAudioTracksFromNotes(USERINPUT_Tracks_Inputs):
         )
         ## Create audio file
         try:
-            LIBRARIES["MusicGenerator"]["Piano"].AudioGen_SaveMIDI(MIDIAudio, save_path=PATHS["midi_save_path"].format(track=t))
+            midi_path = ArtifactUtils.ArtifactUtils_GetArtifact(
+                "midi", ARTIFACT_INPUTS, ".mid",
+                lambda path: LIBRARIES["MusicGenerator"]["Piano"].AudioGen_SaveMIDI(MIDIAudio, save_path=path),
+                store_dir=PATHS["artifacts"]
+            )
         except Exception as e:
             TRACKS_WORKING[t] = False
-            st_track.error(e)
+            TRACKS_DATA["errors"][t] = str(e)
         if not TRACKS_WORKING[t]: continue
         ## Add track for combined
         MIDIAudio_Combined = LIBRARIES["MusicGenerator"]["Piano"].MIDI_AddTrack(
@@ -233,21 +351,192 @@ def CACHEDFUNC_GenerateAudioTracksFromNotes(USERINPUT_Tracks_Inputs):
             track=t, start_time=0, 
             tempo=USERINPUT_Inputs["other_params"]["tempo"]
         )
-        # Display Track Outputs
-        st_track.markdown("## Track")
-        audio_path = PATHS["wav_save_path"].format(track=t)
-        Utils_MIDI2WAV(PATHS["midi_save_path"].format(track=t), audio_path)
-        st_track.audio(audio_path)
+        TRACKS_DATA["tracks"].append(t)
         TRACKS_DATA["notes"].append(NOTES)
-        TRACKS_DATA["audio_paths"].append(audio_path)
         TRACKS_DATA["midi_audios"].append(MIDIAudio)
+        TRACKS_DATA["midi_paths"].append(midi_path)
     ## Merge tracks into one MIDI file
     # MIDIAudio_Combined = LIBRARIES["MusicGenerator"]["Piano"].MIDI_CombineMIDIAudios(TRACKS_DATA["midi_audios"])
-    LIBRARIES["MusicGenerator"]["Piano"].AudioGen_SaveMIDI(MIDIAudio_Combined, save_path=PATHS["midi_save_path"].format(track="combined"))
+    TRACKS_DATA["combined_midi_path"] = ArtifactUtils.ArtifactUtils_GetArtifact(
+        "midi", {"tracks": TRACKS_DATA["midi_paths"]}, ".mid",
+        lambda path: LIBRARIES["MusicGenerator"]["Piano"].AudioGen_SaveMIDI(MIDIAudio_Combined, save_path=path),
+        store_dir=PATHS["artifacts"]
+    )
 
     return TRACKS_DATA
 
+def ARTIFACTFUNC_MIDI2WAV(midi_path, slot="wav"):
+    '''
+    Artifact Function - Get WAV artifact synthesized from a MIDI artifact (synthesized as a background job)
+    '''
+    return JOBFUNC_GetArtifact(
+        slot, "wav", {"midi": midi_path}, ".wav",
+        functools.partial(Utils_MIDI2WAV, midi_path)
+    )
+
+def ARTIFACTFUNC_EncodeAudio(audio_paths):
+    '''
+    Artifact Function - Get artifact of audio files encoded (mixed if more than one) with the audio codec of ENCODER_PARAMS
+
+    Videos stream copy the encoded audio, so the audio of a track is encoded once for all its renders (proxy and full)
+    '''
+    AUDIO_PARAMS = {k: v for k, v in VideoUtils.VideoUtils_GetEncoderParams(ENCODER_PARAMS).items() if k.startswith("audio_")}
+    return ArtifactUtils.ArtifactUtils_GetArtifact(
+        "audio", {"audio": audio_paths, "encoder": AUDIO_PARAMS}, ".m4a",
+        lambda path: VideoUtils.VideoUtils_SaveAudio(audio_paths, path, encoder_params=AUDIO_PARAMS),
+        store_dir=PATHS["artifacts"]
+    )
+
+def ARTIFACTFUNC_CombineVisualisationVideos(video_paths, compress_size=True, fps=24, audio_path=None):
+    '''
+    Artifact Function - Get artifact of visualisation videos combined into a grid (with the given audio, or the mixed audio of the videos if None)
+    '''
+    return ArtifactUtils.ArtifactUtils_GetArtifact(
+        "video", {"videos": video_paths, "compress_size": compress_size, "fps": fps, "encoder": ENCODER_PARAMS, "audio": audio_path}, ".mp4",
+        lambda path: LIBRARIES["Visualisers"]["CircleBouncer"].VideoUtils_CombineVisualisationVideos(
+            video_paths, path, compress_size=compress_size, fps=fps, encoder_params=ENCODER_PARAMS, audio_path=audio_path
+        ),
+        store_dir=PATHS["artifacts"]
+    )
+
+@st.cache_resource
+def CACHEDFUNC_GetJobQueue():
+    '''
+    Streamlit Cached Function - Get job queue shared by all sessions (jobs keep running across reruns)
+    '''
+    return JobUtils.JobQueue(n_workers=JOB_WORKERS)
+
+def JOBFUNC_GetWaiter(slot):
+    '''
+    Job Function - Get waiter ID of a slot of this session (jobs are only cancelled when none of their waiters need them)
+    '''
+    if "jobs" not in st.session_state: st.session_state["jobs"] = {}
+    if "session_id" not in st.session_state: st.session_state["session_id"] = uuid.uuid4().hex
+
+    return f"{st.session_state['session_id']}/{slot}"
+
+def JOBFUNC_SubmitArtifact(slot, kind, inputs, ext, build_func):
+    '''
+    Job Function - Submit background job building the artifact if it is not in the store, without waiting for it
+
+    - Job ID is the artifact name (hash of its inputs), so a rerun with the same inputs picks up the running job
+    - Each session has one job per slot, when the inputs of a slot change the slot stops waiting on its previous job
+      (which is cancelled if no other session or slot waits on it)
+    - build_func is called on a worker process, so it must be picklable (functions from Libraries, not from this script)
+
+    Returns the artifact path and the job ID (None if the artifact is already in the store)
+    '''
+    # Check store
+    path = ArtifactUtils.ArtifactUtils_GetPath(ArtifactUtils.ArtifactUtils_HashInputs(kind, inputs), ext, PATHS["artifacts"])
+    if os.path.exists(path): return path, None
+    # Cancel previous job of slot if inputs changed
+    JOB_QUEUE = CACHEDFUNC_GetJobQueue()
+    job_id = os.path.basename(path)
+    waiter = JOBFUNC_GetWaiter(slot)
+    prev_job_id = st.session_state["jobs"].get(slot, None)
+    if prev_job_id is not None and prev_job_id != job_id: JOB_QUEUE.cancel(prev_job_id, waiter=waiter)
+    st.session_state["jobs"][slot] = job_id
+    # Submit
+    JOB_QUEUE.submit(
+        job_id, ArtifactUtils.ArtifactUtils_GetArtifact,
+        kind, inputs, ext, build_func, store_dir=PATHS["artifacts"], waiter=waiter
+    )
+
+    return path, job_id
+
+def JOBFUNC_ReleaseSlot(slot):
+    '''
+    Job Function - Stop waiting on the previous job of a slot of this session which is not needed anymore
+    (it is cancelled if no other session or slot waits on it)
+    '''
+    waiter = JOBFUNC_GetWaiter(slot)
+    prev_job_id = st.session_state["jobs"].pop(slot, None)
+    if prev_job_id is not None: CACHEDFUNC_GetJobQueue().cancel(prev_job_id, waiter=waiter)
+
+def JOBFUNC_GetArtifact(slot, kind, inputs, ext, build_func, PROGRESS_BAR=None):
+    '''
+    Job Function - Get artifact, building it as a background job if it is not in the store (see JOBFUNC_SubmitArtifact)
+    '''
+    # Check store and submit
+    path, job_id = JOBFUNC_SubmitArtifact(slot, kind, inputs, ext, build_func)
+    if job_id is None:
+        if PROGRESS_BAR is not None: PROGRESS_BAR.close()
+        return path
+    # Wait (resubmit if the job was cancelled meanwhile, the resubmitted job has its own cancel token)
+    JOB_QUEUE = CACHEDFUNC_GetJobQueue()
+    while True:
+        try:
+            path = JobUtils.JobUtils_WaitForJob(JOB_QUEUE, job_id, PROGRESS_BAR=PROGRESS_BAR)
+            break
+        except JobUtils.JobCancelledError:
+            JOB_QUEUE.submit(
+                job_id, ArtifactUtils.ArtifactUtils_GetArtifact,
+                kind, inputs, ext, build_func, store_dir=PATHS["artifacts"], waiter=JOBFUNC_GetWaiter(slot)
+            )
+
+    return path
+
 # UI Functions
+def UI_TraceSummary(events, st_placeholder, key="trace"):
+    '''
+    UI - Show summary table of traced stages with a download of the Chrome trace in the placeholder
+    '''
+    st_container = st_placeholder.container()
+    st_container.markdown("## Trace")
+    if len(events) == 0:
+        st_container.markdown("No stages were run yet (cached results are not traced)")
+        return
+    st_container.dataframe(TraceUtils.TraceUtils_Summary(events), hide_index=True)
+    st_container.download_button(
+        "Download Chrome Trace", TraceUtils.TraceUtils_GetChromeTrace(events),
+        file_name="musicvis_trace.json", mime="application/json", key=key
+    )
+
+def UI_GenerateAudioTracksFromNotes(USERINPUT_Tracks_Inputs):
+    '''
+    UI - Generate MIDI (cached) and WAV (background jobs) artifacts for each track and display the tracks
+    '''
+    # Generate MIDI
+    TRACKS_DATA = dict(CACHEDFUNC_GenerateMIDITracksFromNotes(USERINPUT_Tracks_Inputs))
+    # Generate Audio and Display Track Outputs
+    TRACKS_DATA["audio_paths"] = []
+    TRACK_COLS = st.columns(len(USERINPUT_Tracks_Inputs))
+    for t in range(len(USERINPUT_Tracks_Inputs)):
+        if TRACKS_DATA["errors"][t] is not None: TRACK_COLS[t].error(TRACKS_DATA["errors"][t])
+    for i, t in enumerate(TRACKS_DATA["tracks"]):
+        st_track = TRACK_COLS[t]
+        st_track.markdown("## Track")
+        audio_path = ARTIFACTFUNC_MIDI2WAV(TRACKS_DATA["midi_paths"][i], slot=f"wav_{t}")
+        st_track.audio(audio_path)
+        TRACKS_DATA["audio_paths"].append(audio_path)
+
+    return TRACKS_DATA
+
+def UI_DisplayNotes(notes, st_container=st, key="Notes"):
+    '''
+    UI - Display Notes as summary statistics and one page of notes
+
+    Statistics are cached by the notes and only the notes of the selected page are sent to the browser as JSON, so large note lists stay responsive
+    '''
+    with st_container.expander("Notes Info", expanded=False):
+        # Stats
+        STATS = CACHEDFUNC_Note_GetNotesStats(notes)
+        cols = st.columns(2)
+        cols[0].metric("Notes", STATS["count"])
+        cols[1].metric("Length (seconds)", "-" if STATS["length"] is None else round(STATS["length"], 3))
+        if len(STATS["params"]) > 0:
+            st.dataframe([dict(param=p, **STATS["params"][p]) for p in STATS["params"].keys()], hide_index=True)
+        if len(STATS["notes"]) > 0:
+            st.dataframe([{"note": n, "count": c} for n, c in STATS["notes"].items()], hide_index=True)
+        # Page
+        cols = st.columns(2)
+        USERINPUT_PageSize = cols[0].selectbox("Notes per Page", NOTES_DISPLAY_PAGE_SIZES, key=f"{key}_PageSize")
+        N_PAGES = max(1, int(np.ceil(len(notes) / USERINPUT_PageSize)))
+        USERINPUT_Page = cols[1].number_input(f"Page (of {N_PAGES})", min_value=1, max_value=N_PAGES, value=1, key=f"{key}_Page")
+        USERINPUT_Page = min(USERINPUT_Page, N_PAGES)
+        PAGE_NOTES = notes[(USERINPUT_Page-1)*USERINPUT_PageSize:USERINPUT_Page*USERINPUT_PageSize]
+        st.json([note if isinstance(note, str) else dict(note) for note in PAGE_NOTES], expanded=True)
+
 def UI_PianoInfo():
     st.markdown("## Piano Info")
     with st.expander("### Keys", expanded=True):
@@ -283,10 +572,10 @@ def UI_ExtractNotesFromMIDIFile():
     # Load MIDI file
     USERINPUT_MIDIFile = st.file_uploader("Upload MIDI File", type="mid")
     if USERINPUT_MIDIFile is not None:
-        ## Read MIDI
-        os.makedirs(os.path.dirname(PATHS["temp"]["midi"]), exist_ok=True)
-        open(PATHS["temp"]["midi"], "wb").write(USERINPUT_MIDIFile.read())
-        USERINPUT_MIDIFile = LIBRARIES["MusicGenerator"]["Piano"].AudioGen_LoadMIDI(PATHS["temp"]["midi"])
+        ## Read MIDI (in memory, identified by hash of its bytes)
+        MIDI_BYTES = USERINPUT_MIDIFile.getvalue()
+        MIDI_HASH = hashlib.sha256(MIDI_BYTES).hexdigest()
+        USERINPUT_MIDIFile = CACHEDFUNC_MIDI_LoadMIDIBytes(MIDI_HASH, MIDI_BYTES)
         ## Clip
         cols = st.columns(2)
         cols = [cols[0].columns((1, 3)), cols[1].columns((1, 3))]
@@ -314,7 +603,7 @@ def UI_ExtractNotesFromMIDIFile():
         ## Speed
         USERINPUT_Speed = st.number_input("Speed", min_value=0.01, value=1.0)
         ## Extract Notes
-        USERINPUT_InputTracks_Notes = CACHEDFUNC_MIDI_ExtractNotes(USERINPUT_MIDIFile, USERINPUT_ClipTime, USERINPUT_Speed)
+        USERINPUT_InputTracks_Notes = CACHEDFUNC_MIDI_ExtractNotes(MIDI_HASH, MIDI_BYTES, USERINPUT_ClipTime, USERINPUT_Speed)
 
     return USERINPUT_InputTracks_Notes
 
@@ -325,6 +614,9 @@ def UI_LoadNotes(USERINPUT_Tracks_Notes=[], editable=False):
     # Basic inputs
     USERINPUT_tempo = st.number_input("Tempo", min_value=1, value=60, disabled=True)
     USERINPUT_NTracks = st.number_input("Tracks", min_value=1, value=max(1, len(USERINPUT_Tracks_Notes)), disabled=not editable)
+    MIDIPLOT_BACKENDS = LIBRARIES["Visualisers"]["MIDIPlot"].MIDIPLOT_BACKENDS
+    USERINPUT_MIDIPlotBackend = st.sidebar.selectbox("MIDI Plot Backend", list(MIDIPLOT_BACKENDS.keys()), index=list(MIDIPLOT_BACKENDS.keys()).index("Raster"))
+    USERINPUT_MIDIPlotZoom = st.sidebar.checkbox("MIDI Plot Zoom", value=False)
     OUT = []
     # Iterate over tracks
     TRACK_COLS = st.columns(USERINPUT_NTracks)
@@ -362,22 +654,32 @@ def UI_LoadNotes(USERINPUT_Tracks_Notes=[], editable=False):
                 ))
         ## Display Notes JSON
         st_track.markdown(f"Input Notes ({len(USERINPUT_Notes)})")
-        if DISPLAY_INTERMEDIATE_INFO: st_track.json(USERINPUT_Notes, expanded=False)
+        if DISPLAY_INTERMEDIATE_INFO: UI_DisplayNotes(USERINPUT_Notes, st_track, key=f"InputNotes_{t}")
         ## Decompose notes to keys
-        USERINPUT_Notes = CACHEDFUNC_Note_DecomposeNotesToKeys(USERINPUT_Notes, USERINPUT_CommonParams)
+        USERINPUT_Notes, NOTES_KEY = CACHEDFUNC_Note_DecomposeNotesToKeys(USERINPUT_Notes, USERINPUT_CommonParams)
         ## Display Notes JSON
         st_track.markdown(f"Decomposed Notes ({len(USERINPUT_Notes)})")
-        if DISPLAY_INTERMEDIATE_INFO: st_track.json(USERINPUT_Notes, expanded=False)
+        if DISPLAY_INTERMEDIATE_INFO: UI_DisplayNotes(USERINPUT_Notes, st_track, key=f"DecomposedNotes_{t}")
         ## Display notes MIDI as Plot
-        NOTE_VALUE_RANGE = LIBRARIES["MusicGenerator"]["Piano"].NOTE_VALUE_RANGE
-        AVAILABLE_NOTES = LIBRARIES["MusicGenerator"]["Piano"].AVAILABLE_NOTES
-        NOTE_VALUE_NAME_MAP = {
-            v: AVAILABLE_NOTES[((v-NOTE_VALUE_RANGE[0]) % len(AVAILABLE_NOTES))]
-            for v in range(NOTE_VALUE_RANGE[0], NOTE_VALUE_RANGE[1]+1)
-        }
         USERINPUT_Notes_KnownOnly = [note for note in USERINPUT_Notes if note["value"] >= 0]
-        MIDI_FIG = LIBRARIES["Visualisers"]["MIDIPlot"].MIDIPlot_PlotNotes_HBar(USERINPUT_Notes_KnownOnly, note_value_name_map=NOTE_VALUE_NAME_MAP)
-        st_track.pyplot(MIDI_FIG)
+        MIDI_I = LIBRARIES["Visualisers"]["MIDIPlot"].MIDIPlot_PlotNotes_Cached(
+            USERINPUT_Notes_KnownOnly, backend=USERINPUT_MIDIPlotBackend,
+            note_value_name_map=NOTE_VALUE_NAME_MAP, cache_dir=PATHS["midiplot_cache"], notes_key=NOTES_KEY
+        )
+        st_track.image(MIDI_I)
+        ## Display zoomable notes MIDI from tile pyramid
+        if USERINPUT_MIDIPlotZoom and len(USERINPUT_Notes_KnownOnly) > 0:
+            MIDI_PYRAMID = LIBRARIES["Visualisers"]["MIDIPlot"].MIDIPlot_GetPyramid(
+                USERINPUT_Notes_KnownOnly, note_value_name_map=NOTE_VALUE_NAME_MAP, notes_key=NOTES_KEY
+            )
+            TIME_RANGE = MIDI_PYRAMID["time_range"]
+            USERINPUT_ZoomWindow = st_track.slider(
+                "Zoom Window (seconds)", min_value=float(TIME_RANGE[0]), max_value=float(TIME_RANGE[1]),
+                value=(float(TIME_RANGE[0]), float(TIME_RANGE[1])),
+                key=f"ZoomWindow_{t}"
+            )
+            MIDI_ZOOM_I = LIBRARIES["Visualisers"]["MIDIPlot"].MIDIPlot_RenderPyramidWindow(MIDI_PYRAMID, time_window=USERINPUT_ZoomWindow)
+            st_track.image(MIDI_ZOOM_I)
         TRACK_OUT = {
             "other_params": {
                 "tempo": USERINPUT_tempo
@@ -393,11 +695,13 @@ def UI_NoteGenerator_RandomSequence_LoadEnvUpdateFunc(POSSIBLE_NOTES):
     '''
     UI - Note Generator - Random Sequence - Load Environment Update Function
     '''
+    import matplotlib.pyplot as plt
+
     # Select function
     USERINPUT_EnvUpdateFuncName = st.selectbox("Select Update Function", LIBRARIES["NoteGenerator"]["RandomSequence"].NOTEGENENV_UPDATE_FUNCS.keys())
     USERINPUT_EnvUpdateFunc = LIBRARIES["NoteGenerator"]["RandomSequence"].NOTEGENENV_UPDATE_FUNCS[USERINPUT_EnvUpdateFuncName]
     # Enter params
-    if USERINPUT_EnvUpdateFuncName == "Constant Random Distribution":
+    if USERINPUT_EnvUpdateFuncName in ["Constant Random Distribution", "Adaptive Random Distribution"]:
         ## Get Probability Distribution
         PROB_DIST = {n: 1 for n in POSSIBLE_NOTES}
         PROB_DIST = json.loads(st.text_area(
@@ -457,10 +761,115 @@ def UI_NoteGenerator_RandomSequence_LoadEnvUpdateFunc(POSSIBLE_NOTES):
                 "prob": PROB_DIST[POSSIBLE_NOTES[i]],
                 "params": PARAMS_GEN_DATA
             }
-        USERINPUT_EnvUpdateFunc = functools.partial(USERINPUT_EnvUpdateFunc, VALUE_GEN_MAP=VALUE_GEN_MAP)
+        ENV_PARAMS = {"VALUE_GEN_MAP": VALUE_GEN_MAP}
+        ## Get Adaptive Parameters
+        if USERINPUT_EnvUpdateFuncName == "Adaptive Random Distribution":
+            cols = st.columns(2)
+            ENV_PARAMS["repeat_penalty"] = cols[0].number_input("Repeat Penalty", min_value=0.0, max_value=1.0, value=0.5)
+            ENV_PARAMS["memory"] = cols[1].number_input("Memory", min_value=1, value=4)
+        USERINPUT_EnvUpdateFunc = functools.partial(USERINPUT_EnvUpdateFunc, **ENV_PARAMS)
     
     return USERINPUT_EnvUpdateFunc
 
+def UI_NoteGenerator_Markov_LoadModel():
+    '''
+    UI - Note Generator - Markov - Train or Load Model
+    '''
+    # Model Path
+    USERINPUT_ModelDir = st.text_input("Model Directory", value=PATHS["markov_model"])
+    # Train
+    with st.expander("Train Model"):
+        USERINPUT_MIDIDir = st.text_input("MIDI Files Directory", value="Data/")
+        cols = st.columns(3)
+        USERINPUT_Order = cols[0].number_input("Order", min_value=1, max_value=8, value=2)
+        USERINPUT_TimeStep = cols[1].number_input("Time Step", min_value=0.001, value=0.05, format="%.3f")
+        USERINPUT_Workers = cols[2].number_input("Workers", min_value=1, value=max(1, os.cpu_count() // 2))
+        if st.button("Train"):
+            MODEL = LIBRARIES["NoteGenerator"]["Markov"].Markov_TrainModel(
+                USERINPUT_MIDIDir, order=USERINPUT_Order, step=USERINPUT_TimeStep, n_workers=USERINPUT_Workers
+            )
+            LIBRARIES["NoteGenerator"]["Markov"].Markov_SaveModel(MODEL, USERINPUT_ModelDir)
+    # Load
+    META_PATH = os.path.join(USERINPUT_ModelDir, "meta.json")
+    if not os.path.exists(META_PATH):
+        st.error("No trained model found in " + USERINPUT_ModelDir)
+        st.stop()
+    MODEL = CACHEDFUNC_Markov_LoadModel(USERINPUT_ModelDir, os.path.getmtime(META_PATH))
+    st.markdown(f"Model: Order {MODEL['order']}, {len(MODEL['vocab_values'])} tokens, {len(MODEL['state_keys'])} states")
+
+    return MODEL
+
+def UI_VisualiseTracks(TRACKS_RENDERS, render_func, proxy_params_func, proxy=True):
+    '''
+    UI - Render visualisation videos of tracks as background jobs and show them in a column per track
+
+    - TRACKS_RENDERS : List of {"inputs": artifact inputs, "render_kwargs": kwargs of render_func, "vis_params", "fps"} of each track
+    - Videos are encoded with ENCODER_PARAMS
+    - If proxy is True, a low resolution, low fps proxy of each track (from proxy_params_func) is rendered and shown first
+        - Proxies are encoded with PROXY_ENCODER_PARAMS
+        - Proxies are submitted before the full renders, so the workers pick them up first
+        - Full renders keep running in the background and replace the proxies as they finish
+
+    Returns video paths of the full renders
+    '''
+    # Init
+    VIDEO_PLACEHOLDERS = [col.empty() for col in st.columns(len(TRACKS_RENDERS))]
+    JOBS = {"proxy": [], "full": []}
+    for t in range(len(TRACKS_RENDERS)):
+        RENDER = TRACKS_RENDERS[t]
+        JOBS["full"].append({
+            "slot": f"video_{t}", "inputs": dict(RENDER["inputs"], encoder=ENCODER_PARAMS),
+            "build_func": functools.partial(
+                render_func, **RENDER["render_kwargs"],
+                vis_params=RENDER["vis_params"], fps=RENDER["fps"], encoder_params=ENCODER_PARAMS
+            )
+        })
+        PROXY_VIS_PARAMS, PROXY_FPS = proxy_params_func(RENDER["vis_params"], fps=RENDER["fps"])
+        JOBS["proxy"].append({
+            "slot": f"proxy_{t}", "inputs": dict(RENDER["inputs"], params=PROXY_VIS_PARAMS, fps=PROXY_FPS, encoder=PROXY_ENCODER_PARAMS, proxy=True),
+            "build_func": functools.partial(
+                render_func, **RENDER["render_kwargs"],
+                vis_params=PROXY_VIS_PARAMS, fps=PROXY_FPS, encoder_params=PROXY_ENCODER_PARAMS
+            )
+        })
+    ## Proxies are skipped for tracks whose full render is already in the store
+    FULL_PATHS = [
+        ArtifactUtils.ArtifactUtils_GetPath(ArtifactUtils.ArtifactUtils_HashInputs("video", JOB["inputs"]), ".mp4", PATHS["artifacts"])
+        for JOB in JOBS["full"]
+    ]
+    PROXY_TRACKS = [t for t in range(len(TRACKS_RENDERS)) if proxy and not os.path.exists(FULL_PATHS[t])]
+    ## Stale proxy jobs of skipped tracks (from earlier inputs) are released so they do not occupy workers
+    for t in range(len(TRACKS_RENDERS)):
+        if t not in PROXY_TRACKS: JOBFUNC_ReleaseSlot(JOBS["proxy"][t]["slot"])
+    # Submit (proxies first)
+    for t in PROXY_TRACKS:
+        JOB = JOBS["proxy"][t]
+        JOBFUNC_SubmitArtifact(JOB["slot"], "video", JOB["inputs"], ".mp4", JOB["build_func"])
+    for JOB in JOBS["full"]:
+        JOBFUNC_SubmitArtifact(JOB["slot"], "video", JOB["inputs"], ".mp4", JOB["build_func"])
+    # Show proxies
+    for t in PROXY_TRACKS:
+        JOB = JOBS["proxy"][t]
+        with TraceUtils.TraceUtils_Span("Visualise Track Proxy", track=t, notes=len(TRACKS_RENDERS[t]["render_kwargs"]["notes"])):
+            video_path = JOBFUNC_GetArtifact(
+                JOB["slot"], "video", JOB["inputs"], ".mp4", JOB["build_func"],
+                PROGRESS_BAR=ProgressBar(f"Previewing Track {t}")
+            )
+        VIDEO_PLACEHOLDERS[t].video(video_path)
+    # Show full renders
+    VIDEO_PATHS = []
+    for t in range(len(TRACKS_RENDERS)):
+        JOB = JOBS["full"][t]
+        with TraceUtils.TraceUtils_Span("Visualise Track", track=t, notes=len(TRACKS_RENDERS[t]["render_kwargs"]["notes"])):
+            video_path = JOBFUNC_GetArtifact(
+                JOB["slot"], "video", JOB["inputs"], ".mp4", JOB["build_func"],
+                PROGRESS_BAR=ProgressBar(f"Visualising Track {t}")
+            )
+        VIDEO_PLACEHOLDERS[t].video(video_path)
+        VIDEO_PATHS.append(video_path)
+
+    return VIDEO_PATHS
+
 def UI_NoteVisualiser(TRACKS_NOTES, TRACKS_audio_paths):
     '''
     UI - Note Visualiser
@@ -470,9 +879,9 @@ def UI_NoteVisualiser(TRACKS_NOTES, TRACKS_audio_paths):
     VISUALISATION_SIZE = st.sidebar.number_input("Visualisation Size", min_value=128, max_value=1024, value=512, step=128)
     # Init
     UNIQUE_NOTES = LIBRARIES["MusicGenerator"]["Piano"].AVAILABLE_NOTES
-    TRACKS_NOTES = [[dict(n) for n in TRACKS_NOTES[t]] for t in range(len(TRACKS_NOTES))]
+    TRACKS_NOTES = [LIBRARIES["MusicGenerator"]["Piano"].Note_GetNoteViews(TRACKS_NOTES[t]) for t in range(len(TRACKS_NOTES))]
     # Visualise
-    USERINPUT_VisType = st.selectbox("Select Visualiser", ["Circle Bouncer", "None"])
+    USERINPUT_VisType = st.selectbox("Select Visualiser", ["Circle Bouncer", "Piano Roll", "None"])
     if USERINPUT_VisType == "Circle Bouncer":
         # Params
         USERINPUT_VisMode = st.selectbox("Mode", ["Line Sequence", "Converge Lines"])
@@ -536,20 +945,18 @@ def UI_NoteVisualiser(TRACKS_NOTES, TRACKS_audio_paths):
             subcols = cols[1].columns(2)
             if subcols[0].checkbox("Apply Threshold", value=False):
                 USERINPUT_FadeParams["threshold"] = subcols[1].number_input("Displayed Notes Window", min_value=1, value=5)
-        USERINPUT_CompressSize = st.checkbox("Compress Combined Video Size", value=True)
+        cols = st.columns(2)
+        USERINPUT_CompressSize = cols[0].checkbox("Compress Combined Video Size", value=True)
+        USERINPUT_Proxy = cols[1].checkbox("Proxy Preview", value=True)
         # Process Check
         stream_cols = st.columns(2)
         USERINPUT_Process = stream_cols[0].checkbox("Stream Visualise", value=False)
         if not USERINPUT_Process: USERINPUT_Process = stream_cols[1].button("Visualise")
         if not USERINPUT_Process: st.stop()
         # Visualise
-        TRACKS_DATA = {
-            "video_paths": []
-        }
-        TRACK_COLS = st.columns(len(TRACKS_NOTES))
+        TRACKS_RENDERS = []
         for t in range(len(TRACKS_NOTES)):
-            st_track = TRACK_COLS[t]
-            audio_path = TRACKS_audio_paths[t]
+            audio_path = ARTIFACTFUNC_EncodeAudio([TRACKS_audio_paths[t]])
             NOTES = TRACKS_NOTES[t]
             ## Clean chords (notes with delay 0 causing visualisation jumps)
             NOTES_CLEANED = []
@@ -562,16 +969,15 @@ def UI_NoteVisualiser(TRACKS_NOTES, TRACKS_audio_paths):
                 else:
                     NOTES_CLEANED.append(note)
             NOTES = NOTES_CLEANED
-            ## Progress Bar
-            PROGRESS_BAR = ProgressBar(f"Visualising Track {t}")
-            ## Generate Frames
-            NOTES_FRAMES = LIBRARIES["Visualisers"]["CircleBouncer"].CircleBouncer_VisualiseNotes(
-                NOTES, UNIQUE_NOTES, frame_size=(VISUALISATION_SIZE, VISUALISATION_SIZE),
-                mode=USERINPUT_VisMode,
-                show_text=USERINPUT_ShowText, frames_per_notesec=USERINPUT_FPNS,
-                fade_params=USERINPUT_FadeParams,
-                colors=USERINPUT_Colors,
-                sizes={
+            ## Visualisation params
+            VIS_PARAMS = {
+                "frame_size": (VISUALISATION_SIZE, VISUALISATION_SIZE),
+                "mode": USERINPUT_VisMode,
+                "show_text": USERINPUT_ShowText,
+                "frames_per_notesec": USERINPUT_FPNS,
+                "fade_params": USERINPUT_FadeParams,
+                "colors": USERINPUT_Colors,
+                "sizes": {
                     "gap": 0.1,
                     "circle": {
                         "thickness": 0.0025 if not USERINPUT_FillCircle else -1
@@ -585,22 +991,88 @@ def UI_NoteVisualiser(TRACKS_NOTES, TRACKS_audio_paths):
                     "point": {
                         "radius": 0.01
                     }
+                }
+            }
+            TRACKS_RENDERS.append({
+                "inputs": {
+                    "visualiser": "CircleBouncer",
+                    "notes": NOTES,
+                    "unique_notes": UNIQUE_NOTES,
+                    "audio": audio_path,
+                    "params": VIS_PARAMS
                 },
-                PROGRESS_BAR=PROGRESS_BAR
-            )
-            video_path = PATHS["temp"]["video"].format(track=t)
-            LIBRARIES["Visualisers"]["CircleBouncer"].VideoUtils_SaveVisualisationVideo(
-                NOTES, NOTES_FRAMES, audio_path, video_path
-            )
-            st_track.video(video_path)
-            TRACKS_DATA["video_paths"].append(video_path)
+                "render_kwargs": {"notes": NOTES, "UNIQUE_NOTES": UNIQUE_NOTES, "audio_path": audio_path},
+                "vis_params": VIS_PARAMS,
+                "fps": 24
+            })
+        ## Generate Frames and Videos (only if not in artifact store)
+        VIDEO_PATHS = UI_VisualiseTracks(
+            TRACKS_RENDERS,
+            LIBRARIES["Visualisers"]["CircleBouncer"].CircleBouncer_RenderVideo,
+            LIBRARIES["Visualisers"]["CircleBouncer"].CircleBouncer_GetProxyParams,
+            proxy=USERINPUT_Proxy
+        )
         # Combine Visualisations
-        video_path_combined = PATHS["temp"]["video"].format(track="combined")
-        LIBRARIES["Visualisers"]["CircleBouncer"].VideoUtils_CombineVisualisationVideos(
-            TRACKS_DATA["video_paths"],
-            video_path_combined,
-            compress_size=USERINPUT_CompressSize
+        audio_path_mixed = ARTIFACTFUNC_EncodeAudio(TRACKS_audio_paths)
+        video_path_combined = ARTIFACTFUNC_CombineVisualisationVideos(VIDEO_PATHS, USERINPUT_CompressSize, audio_path=audio_path_mixed)
+        st.video(video_path_combined)
+    elif USERINPUT_VisType == "Piano Roll":
+        # Params
+        cols = st.columns(3)
+        USERINPUT_PixelsPerSec = cols[0].number_input("Scroll Speed (pixels per second)", min_value=1, value=128)
+        USERINPUT_FPS = cols[1].number_input("FPS", min_value=1, value=24)
+        USERINPUT_PlayheadPos = cols[2].slider("Playhead Position", min_value=0.0, max_value=1.0, value=0.8)
+        cols = st.columns(3)
+        USERINPUT_Colors = {
+            "background": cols[0].color_picker("Background Color", "#000000"),
+            "playhead": cols[1].color_picker("Playhead Color", "#FFFFFF"),
+            "note": {
+                "cmap": cols[2].selectbox(
+                    "Notes Colormap", 
+                    LIBRARIES["Visualisers"]["CircleBouncer"].CMAPS, 
+                    index=LIBRARIES["Visualisers"]["CircleBouncer"].CMAPS.index(LIBRARIES["Visualisers"]["PianoRoll"].CMAP_DEFAULT)
+                )
+            }
+        }
+        cols = st.columns(2)
+        USERINPUT_CompressSize = cols[0].checkbox("Compress Combined Video Size", value=True)
+        USERINPUT_Proxy = cols[1].checkbox("Proxy Preview", value=True)
+        # Process Check
+        if not st.button("Visualise"): st.stop()
+        # Visualise
+        TRACKS_RENDERS = []
+        for t in range(len(TRACKS_NOTES)):
+            audio_path = ARTIFACTFUNC_EncodeAudio([TRACKS_audio_paths[t]])
+            ## Visualisation params
+            VIS_PARAMS = {
+                "frame_size": (VISUALISATION_SIZE, VISUALISATION_SIZE),
+                "pixels_per_sec": USERINPUT_PixelsPerSec,
+                "playhead_pos": USERINPUT_PlayheadPos,
+                "colors": USERINPUT_Colors
+            }
+            TRACKS_RENDERS.append({
+                "inputs": {
+                    "visualiser": "PianoRoll",
+                    "notes": TRACKS_NOTES[t],
+                    "unique_notes": UNIQUE_NOTES,
+                    "audio": audio_path,
+                    "params": VIS_PARAMS,
+                    "fps": USERINPUT_FPS
+                },
+                "render_kwargs": {"notes": TRACKS_NOTES[t], "UNIQUE_NOTES": UNIQUE_NOTES, "audio_path": audio_path},
+                "vis_params": VIS_PARAMS,
+                "fps": USERINPUT_FPS
+            })
+        ## Render Rolls and Videos (only if not in artifact store)
+        VIDEO_PATHS = UI_VisualiseTracks(
+            TRACKS_RENDERS,
+            LIBRARIES["Visualisers"]["PianoRoll"].PianoRoll_RenderVideo,
+            LIBRARIES["Visualisers"]["PianoRoll"].PianoRoll_GetProxyParams,
+            proxy=USERINPUT_Proxy
         )
+        # Combine Visualisations
+        audio_path_mixed = ARTIFACTFUNC_EncodeAudio(TRACKS_audio_paths)
+        video_path_combined = ARTIFACTFUNC_CombineVisualisationVideos(VIDEO_PATHS, USERINPUT_CompressSize, fps=USERINPUT_FPS, audio_path=audio_path_mixed)
         st.video(video_path_combined)
     else:
         pass
@@ -620,7 +1092,10 @@ def basic_piano_sequencer():
     UI_PianoInfo()
     st.markdown("## Inputs")
     USERINPUT_InputTracks_Notes = UI_ExtractNotesFromMIDIFile()
-    if DISPLAY_INTERMEDIATE_INFO: st.json(USERINPUT_InputTracks_Notes)
+    if DISPLAY_INTERMEDIATE_INFO:
+        for t in range(len(USERINPUT_InputTracks_Notes)):
+            st.markdown(f"Track {t} Extracted Notes ({len(USERINPUT_InputTracks_Notes[t])})")
+            UI_DisplayNotes(USERINPUT_InputTracks_Notes[t], st, key=f"ExtractedNotes_{t}")
     USERINPUT_Process = st.checkbox("Finalise Input Clip", value=False)
     if not USERINPUT_Process: st.stop()
     ## Load Notes
@@ -632,11 +1107,10 @@ def basic_piano_sequencer():
     if not USERINPUT_Process: USERINPUT_Process = stream_cols[1].button("Process")
     if not USERINPUT_Process: st.stop()
     # Process Inputs
-    TRACKS_DATA = CACHEDFUNC_GenerateAudioTracksFromNotes(USERINPUT_Tracks_Inputs)
+    TRACKS_DATA = UI_GenerateAudioTracksFromNotes(USERINPUT_Tracks_Inputs)
     # Display Outputs
     st.markdown("## Piano Music")
-    audio_path_combined = PATHS["wav_save_path"].format(track="combined")
-    Utils_MIDI2WAV(PATHS["midi_save_path"].format(track="combined"), audio_path_combined)
+    audio_path_combined = ARTIFACTFUNC_MIDI2WAV(TRACKS_DATA["combined_midi_path"], slot="wav_combined")
     st.audio(audio_path_combined)
     # Visualise Outputs
     st.markdown("## Visualisations")
@@ -674,11 +1148,18 @@ def piano_music_generator():
         USERINPUT_EnvUpdateFunc = UI_NoteGenerator_RandomSequence_LoadEnvUpdateFunc(POSSIBLE_NOTES)
         USERINPUT_Seed = st.number_input("Seed", 0, 1000, 1)
         USERINPUT_NoteGenFunc = functools.partial(
-            LIBRARIES["NoteGenerator"]["RandomSequence"].RandomSequence_GenerateNotes,
+            CACHEDFUNC_RandomSequence_GenerateNotes,
             ENV_UPDATE_FUNC=USERINPUT_EnvUpdateFunc,
             MAPS=MAPS,
-            seed=USERINPUT_Seed,
-            PREV_NOTES=[]
+            seed=USERINPUT_Seed
+        )
+    elif USERINPUT_NoteGenType == "Markov":
+        USERINPUT_Model = UI_NoteGenerator_Markov_LoadModel()
+        USERINPUT_Seed = st.number_input("Seed", 0, 1000, 1)
+        USERINPUT_NoteGenFunc = functools.partial(
+            LIBRARIES["NoteGenerator"]["Markov"].Markov_GenerateNotes,
+            MODEL=USERINPUT_Model,
+            seed=USERINPUT_Seed
         )
     else:
         pass
@@ -711,14 +1192,13 @@ def piano_music_generator():
     #     tempo=USERINPUT_Inputs["other_params"]["tempo"]
     # )
     # ## Create audio file
-    # LIBRARIES["MusicGenerator"]["Piano"].AudioGen_SaveMIDI(MIDIAudio, save_path=PATHS["midi_save_path"])
+    # LIBRARIES["MusicGenerator"]["Piano"].AudioGen_SaveMIDI(MIDIAudio, save_path=...)
 
-    TRACKS_DATA = CACHEDFUNC_GenerateAudioTracksFromNotes([USERINPUT_Inputs])
+    TRACKS_DATA = UI_GenerateAudioTracksFromNotes([USERINPUT_Inputs])
 
     # Display Outputs
     st.markdown("## Generated Piano Music")
-    audio_path_combined = PATHS["wav_save_path"].format(track="combined")
-    Utils_MIDI2WAV(PATHS["midi_save_path"].format(track="combined"), audio_path_combined)
+    audio_path_combined = ARTIFACTFUNC_MIDI2WAV(TRACKS_DATA["combined_midi_path"], slot="wav_combined")
     st.audio(audio_path_combined)
     # Visualise Outputs
     st.markdown("## Visualisations")